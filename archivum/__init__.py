@@ -42,5 +42,15 @@ DEFAULT_CONFIG_FILE = "uber-library"
 
 EMPTY_LIBRARY = type('EmptyLibrary', (), {'name': 'No library open', 'is_empty': True})
 
-# avoid circular import errors, import here
-from . library import Library  # noqa
+
+def library_config_paths():
+    """Config files of the available libraries, without importing Library (and pandas)."""
+    return list(BASE_DIR.glob(f'*.{APP_NAME}-config'))
+
+
+def __getattr__(name):
+    """Import Library on first use, it pulls in pandas and pyarrow; keeps CLI startup fast."""
+    if name == 'Library':
+        from . library import Library
+        return Library
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -8,40 +8,25 @@ import re
 import shlex
 import subprocess
 import sys
-import yaml
 
 import click
-from lark import ParseError
-import pandas as pd
-from pendulum import local_timezone
-from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import (
-    FuzzyCompleter, WordCompleter,
-    NestedCompleter, DynamicCompleter
-)
-from prompt_toolkit.formatted_text import HTML
-from prompt_toolkit.document import Document
-from rich.console import Console
-from rich.text import Text
 
-from . reference import Reference
-from . library import Library
-from . import DEFAULT_CONFIG_FILE, BASE_DIR, APP_NAME, EMPTY_LIBRARY
-from . utilities import fGT
-from . document import find_pdfs, Document
-from . library import Library
+from . import DEFAULT_CONFIG_FILE, BASE_DIR, APP_NAME, EMPTY_LIBRARY, library_config_paths
+from . import daemon
+
+# Startup: only click is imported here. pandas (via Library), prompt_toolkit,
+# rich, greater_tables (fGT), pymupdf (document) etc. are imported by the
+# commands that use them, so --help, list-libraries and rg start quickly.
+# See tests/test_startup.py.
 
 
 # local constants
 DEFAULT_NEW_DIR = str(Path.home() / 'Downloads')
-EMPTY_DF = pd.DataFrame([])
 
 # logger
 logger = logging.getLogger(__name__)
 
 
-console = Console()
-
 # ========================================================================================
 # ========================================================================================
 # Library context manager
@@ -52,6 +37,10 @@ class LibraryContext:
 
     current = None
     no_library = EMPTY_LIBRARY
+    # libraries opened in this process by name, reopened instantly (e.g. by the daemon)
+    opened = {}
+    # True: run commands here, never forward them to the daemon (uber, the daemon itself)
+    local = False
 
     @classmethod
     def set(cls, lib):   # noqa
@@ -67,6 +56,7 @@ class LibraryContext:
     @classmethod
     def clear(cls):   # noqa
         logger.debug("Library %s closed.", cls.current)
+        cls.opened = {k: v for k, v in cls.opened.items() if v is not cls.current}
         cls.current = None
 
 
@@ -74,26 +64,87 @@ class LibraryContext:
 # ========================================================================================
 def get_prompt(cmd):
     """Make a prompt for REPL."""
+    from prompt_toolkit.formatted_text import HTML
     lib = LibraryContext.get()
     lib_name = lib.name
+    # progress of a background load, see Library.preload
+    status = getattr(lib, 'preload_status', '')
     return HTML(
         f'<ansigreen>[{lib_name}] > </ansigreen>'
-        f'<ansiyellow>{cmd} > </ansiyellow>'
+        + (f'<ansicyan>({status}) </ansicyan>' if status else '')
+        + f'<ansiyellow>{cmd} > </ansiyellow>'
     )
 
+
+async def run_cancellable(fn, message='Running query'):
+    """
+    Await fn(cancel) run in an executor thread, cancel a threading.Event.
+
+    Ctrl-C sets cancel (fn checks it, see querex_work, and raises
+    QueryCancelled), so a long query stops cleanly and the session goes on.
+    The elapsed time is shown on a terminal while fn runs; the prompt is
+    not active, so no other input is read until fn returns.
+    """
+    import asyncio
+    import signal
+    import threading
+    import time
+
+    cancel = threading.Event()
+    loop = asyncio.get_running_loop()
+    task = loop.run_in_executor(None, fn, cancel)
+
+    def interrupt(signum, frame):
+        cancel.set()
+
+    try:
+        old = signal.signal(signal.SIGINT, interrupt)
+    except ValueError:
+        # not the main thread (e.g. in Jupyter): no Ctrl-C
+        old = None
+    t0 = time.perf_counter()
+    show = sys.stdout.isatty()
+    try:
+        while not task.done():
+            await asyncio.wait([task], timeout=0.25)
+            if show and not task.done():
+                state = 'cancelling' if cancel.is_set() else 'Ctrl-C to cancel'
+                sys.stdout.write(f'\r{message} {time.perf_counter() - t0:.1f}s ({state})')
+                sys.stdout.flush()
+    finally:
+        if old is not None:
+            signal.signal(signal.SIGINT, old)
+        if show and time.perf_counter() - t0 >= 0.25:
+            sys.stdout.write('\r\x1b[K')
+            sys.stdout.flush()
+    return task.result()
+
+
+def run_async(coroutine):
+    """Run coroutine to completion, in a new thread if this one runs an event loop (Jupyter)."""
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coroutine).result()
+
 # ========================================================================================
 # ========================================================================================
 # Completers
 
 
-def make_query_completer_static(df):
-    """Make nested query completer for df (eg ref_df or database)."""
+def make_query_completer_static(columns):
+    """Make nested query completer for columns of a frame (eg ref_df or database)."""
+    from prompt_toolkit.completion import NestedCompleter
     lib = LibraryContext.get()
     if lib.is_empty:
         libs = None
     else:
         libs = {l: None for l in lib.list()}
-    cols = {col: None for col in df.columns}
+    cols = {col: None for col in columns}
     cols_with_values = {
         col: {
             "==": {"__value__": None},
@@ -102,7 +153,7 @@ def make_query_completer_static(df):
             ">": {"__value__": None},
             ">=": {"__value__": None},
         }
-        for col in df.columns
+        for col in columns
     }
 
     # Placeholder - will override 'open' dynamically later
@@ -128,7 +179,20 @@ def make_query_completer_static(df):
 
 # ========================================================================================
 # ========================================================================================
-@click.group()
+class ArchivumGroup(click.Group):
+    """Command group that hands commands to the archivum daemon when it is running."""
+
+    def main(self, args=None, **kwargs):
+        if not LibraryContext.local and daemon.available():
+            code = daemon.forward(sys.argv[1:] if args is None else list(args))
+            if code is not None:
+                if kwargs.get('standalone_mode', True):
+                    sys.exit(code)
+                return code
+        return super().main(args, **kwargs)
+
+
+@click.group(cls=ArchivumGroup)
 def entry():
     """CLI for managing bibliographic entries."""
     if hasattr(sys.stdout, "reconfigure"):
@@ -139,11 +203,30 @@ def entry():
 
 @entry.command()
 @click.argument('lib_name', type=str)
-def open_library(lib_name):
+@click.option(
+    '-b', '--background',
+    is_flag=True,
+    help='Load the frames, database and author trie in a background thread.'
+)
+def open_library(lib_name, background):
     """Open a library by name and set it as current."""
+    from . library import Library
     try:
-        lib = Library(lib_name)
+        lib = LibraryContext.opened.get(lib_name)
+        if lib is None:
+            lib = Library(lib_name)
+            LibraryContext.opened[lib_name] = lib
+        else:
+            # opened before: only catch up with changes made since
+            lib.refresh()
         LibraryContext.set(lib)
+        if background:
+            # return at once, commands wait for the parts they read
+            lib.preload()
+            logger.debug('Opened %s, loading in the background.', lib.name)
+            return
+        # rebuild a stale database cache while the user types
+        lib.warm_cache()
         logger.debug(f"Opened {lib.name}, loaded {len(lib.ref_df):,d} references.")
     except Exception as e:
         logger.error('Open library error: %s', e)
@@ -196,6 +279,7 @@ def merge_library(other_lib_name):
     #     logger.error(e)
     # else:
     #     logger.todo('PERFORM MERGE!!')
+    #     lib.invalidate()
 
 
 # ========================================================================================
@@ -203,6 +287,10 @@ def merge_library(other_lib_name):
 @click.argument('lib_name', type=str)
 def create_library(lib_name):
     """Interactively create a YAML config file for a new library called lib_name."""
+    from pendulum import local_timezone
+    from prompt_toolkit.completion import FuzzyCompleter, WordCompleter
+    import yaml
+    from . library import Library
     lib_file_name = lib_name.replace(' ', '-')
 
     # sort the file out
@@ -262,14 +350,17 @@ def list_libraries(details):
     logger.debug("Listing libraries...")
     # TODO: Implement listing logic
     if details:
+        from . library import Library
+        from . utilities import fGT
         logger.debug("Detailed information.")
         df = Library.list_deets()
         click.echo(fGT(df))
     else:
+        # names only: no need for pandas or the table formatter
         logger.debug("Basic information.")
-        l = Library.list()
-        l.insert(0, 'Library')
-        click.echo(fGT(l))
+        click.echo('Library')
+        for path in library_config_paths():
+            click.echo(f'  {path.name}')
 
 
 # ========================================================================================
@@ -280,10 +371,52 @@ def get_library_stats():
     if lib.is_empty:
         click.echo("No library open. Returning")
         return
+    from . utilities import fGT
     logger.debug("Library stats %s", lib)
     click.echo(fGT(lib.stats().reset_index(drop=False)))
 
 
+# ========================================================================================
+@entry.command()
+def compact_library():
+    """Fold the journal of edits into the library files."""
+    lib = LibraryContext.get()
+    if lib.is_empty:
+        click.echo("No library open. Returning")
+        return
+    n = lib._journal.n_records
+    if lib.compact():
+        click.echo(f'Compacted {n:,d} journaled edits into the library files.')
+    else:
+        click.echo('Nothing to compact.')
+
+
+# ========================================================================================
+@entry.command()
+@click.option(
+    '-w', '--write',
+    is_flag=True,
+    help='Write a fresh snapshot of the warmed library first.'
+)
+def snapshot(write):
+    """Report the age and size of the library snapshot used for instant reopen."""
+    lib = LibraryContext.get()
+    if lib.is_empty:
+        click.echo("No library open. Returning")
+        return
+    if write:
+        try:
+            lib.write_snapshot()
+        except ValueError as e:
+            click.secho(str(e), fg='red')
+    from . utilities import fGT
+    info = lib.snapshot_info()
+    if info.empty:
+        click.echo('No snapshot; write one with snapshot --write.')
+        return
+    click.echo(fGT(info.astype(str).to_frame('value').reset_index(names='item')))
+
+
 # ========================================================================================
 @entry.command()
 @click.option(
@@ -298,6 +431,7 @@ def get_distinct_values(field):
     if lib.is_empty:
         click.echo("No library open...don't know where to look for files. Returning")
         return
+    from . utilities import fGT
     field = field.strip()
     logger.debug("Distinct values for field %s", field)
     if field == '':
@@ -305,7 +439,7 @@ def get_distinct_values(field):
         df.index.name = 'field'
         df = df.sort_values(['distinct'], ascending=[False])
         click.echo(fGT(df))
-    elif field in lib.database:
+    elif field in lib.columns('database'):
         df = lib.distinct_value_counts(field).reset_index(drop=False)
         click.echo(fGT(df))
     else:
@@ -325,18 +459,52 @@ def get_distinct_values(field):
     is_flag=True,
     help='Search ref_df rather than database (default)'
 )
-def query_library(start: str, ref):
+@click.option(
+    '-l', '--libraries',
+    type=str,
+    default='',
+    help='Also query these libraries (comma separated), results have a library column.'
+)
+@click.option(
+    '--once',
+    is_flag=True,
+    help='Run START and return, without the interactive loop (e.g. from the shell).'
+)
+@click.option(
+    '-n', '--page-size',
+    type=int,
+    default=25,
+    show_default=True,
+    help='Result rows a page (n/p/g N to page through them); 0 shows all rows.'
+)
+def query_library(start: str, ref, libraries, once, page_size):
     """Interactive REPL to run multiple queries on the file index with fuzzy completion."""
     lib = LibraryContext.get()
     if lib.is_empty:
         click.echo("No library open...don't what to query. Returning")
         return
-    if ref:
-        df = lib.ref_df
-    else:
-        df = lib.database
-
-    click.echo(df.columns)
+    from lark import ParseError
+    import pandas as pd
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.application.current import get_app
+    from prompt_toolkit.completion import FuzzyCompleter, WordCompleter, DynamicCompleter
+    from prompt_toolkit.filters import Condition
+    from prompt_toolkit.key_binding import KeyBindings
+    from . federated import Federation
+    from . pager import ResultPager
+    from . querex import QueryCancelled
+    frame = 'ref_df' if ref else 'database'
+    # the frame, or its SQL stand in for the sqlite query engine
+    df = lib.query_target(frame)
+    # federated: the open library and the others, opened in parallel
+    federation = None
+    if libraries:
+        federation = Federation([lib] + [n.strip() for n in libraries.split(',') if n.strip()])
+        click.echo(f'Querying {", ".join(federation.names)}')
+    # all columns, including those not loaded yet
+    columns = lib.columns('ref_df' if ref else 'database')
+
+    click.echo(columns)
 
     # click.echo(
     #     "Enter querex expression [verbose] [recent] [top n] [select field[, fields]\n"
@@ -347,8 +515,8 @@ def query_library(start: str, ref):
     # word_completer = FuzzyCompleter(WordCompleter(keywords, sentence=True))
     # session = PromptSession(completer=word_completer)
     # result = None
-    result = EMPTY_DF
-    base_completer = make_query_completer_static(df)
+    result = pd.DataFrame([])
+    base_completer = make_query_completer_static(columns)
 
     def tag_branch():
         tag_values = sorted({str(tag) for tag in result["tag"].dropna().unique()})
@@ -357,81 +525,161 @@ def query_library(start: str, ref):
     # Inject dynamic fuzzy completer into 'open' and 'o'
     base_completer.options["open"] = DynamicCompleter(tag_branch)
     base_completer.options["o"] = DynamicCompleter(tag_branch)
-    session = PromptSession(completer=base_completer)
-
-    while True:
-        try:
-            expr = start or session.prompt(get_prompt('query-library'))
-            start = ''
-            pipe = False
-            if expr.lower() in {"exit", "x", ".."}:
-                break
-            elif expr == "?":
-                click.echo(lib.querex_help())
-                continue
-            elif expr == 'cls':
-                # clear screen
-                os.system('cls')
-                continue
-            elif expr.find(">") >= 0:
-                # contains a pipe
-                expr, pipe = expr.split('>')
-                pipe = pipe.strip()
-            elif expr.startswith('o ') or expr.startswith('open '):
-                # open files
-                if result.empty:
-                    click.echo('No existing query! Run query first')
+    # the last result, shown a page at a time
+    pager = None
+    # PageDown/PageUp at an empty prompt page through it
+    bindings = KeyBindings()
+    paging = Condition(lambda: pager is not None and pager.paged
+                       and not get_app().current_buffer.text)
+
+    @bindings.add('pagedown', filter=paging)
+    def _next_page(event):
+        event.app.exit(result='n')
+
+    @bindings.add('pageup', filter=paging)
+    def _prev_page(event):
+        event.app.exit(result='p')
+
+    # no prompt (nor terminal) needed to run one query
+    session = None if once else PromptSession(completer=base_completer,
+                                              key_bindings=bindings)
+
+    async def repl():
+        # queries run in an executor so the event loop (and Ctrl-C) stays live
+        nonlocal start, result, df, pager
+        while True:
+            try:
+                if once and not start:
+                    break
+                expr = start or await session.prompt_async(get_prompt('query-library'))
+                start = ''
+                pipe = False
+                if pager is not None and pager.command(expr):
+                    click.echo(pager.render())
+                    click.echo(pager.footer())
+                    continue
+                if expr.lower() in {"exit", "x", ".."}:
+                    break
+                elif expr == "?":
+                    click.echo(lib.querex_help())
+                    continue
+                elif expr == 'cls':
+                    # clear screen
+                    os.system('cls')
+                    continue
+                elif expr.find(">") >= 0:
+                    # contains a pipe
+                    expr, pipe = expr.split('>')
+                    pipe = pipe.strip()
+                elif expr.startswith('o ') or expr.startswith('open '):
+                    # open files
+                    if result.empty:
+                        click.echo('No existing query! Run query first')
+                        continue
+                    # open file mode, start with o n
+                    try:
+                        # o or open
+                        if expr.startswith('o '):
+                            expr = expr[1:].strip()
+                        elif expr.startswith('open '):
+                            expr = expr[5:].strip()
+                        logger.info(f'{expr=}')
+                        tags = result.loc[result.tag.str.contains(expr, regex=True), 'tag']
+                        if federation is None:
+                            tags = sorted(set(tags.values))
+                            docs = lib.ref_doc_df.query('tag in @tags').path.values
+                        else:
+                            # tags are looked up in the library of their row
+                            docs = []
+                            for fed_lib, fed_name in zip(federation.libraries, federation.names):
+                                ref_doc = fed_lib.ref_doc_df
+                                lib_tags = set(tags[result.library == fed_name])
+                                docs.extend(ref_doc.loc[ref_doc.tag.isin(lib_tags), 'path'])
+                        logger.info(f'{docs=}')
+                        print(f'Trying to open {docs=}')
+                        logger.info(f'Trying to open {docs=}')
+                        for d in docs:
+                            p = Path(d)
+                            if not p.exists():
+                                logger.info('file %s not found', p.name)
+                                continue
+                            try:
+                                # windows only
+                                os.startfile(p)
+                            except FileNotFoundError:
+                                logger.error("File not found %s", d)
+                            except PermissionError:
+                                logger.error("Permission denied %s", d)
+                            except OSError as e:
+                                logger.error("OS error while opening %s: %s", d, e)
+                            except Exception as e:
+                                logger.error("Unexpected error: %s", e)
+                    except Exception:
+                        raise
                     continue
-                # open file mode, start with o n
+
+                # if here, run query work
                 try:
-                    # o or open
-                    if expr.startswith('o '):
-                        expr = expr[1:].strip()
-                    elif expr.startswith('open '):
-                        expr = expr[5:].strip()
-                    logger.info(f'{expr=}')
-                    tags = result.loc[result.tag.str.contains(expr, regex=True), 'tag']
-                    tags = sorted(set(tags.values))
-                    docs = lib.ref_doc_df.query('tag in @tags').path.values
-                    logger.info(f'{docs=}')
-                    print(f'Trying to open {docs=}')
-                    logger.info(f'Trying to open {docs=}')
-                    for d in docs:
-                        p = Path(d)
-                        if not p.exists():
-                            logger.info('file %s not found', p.name)
-                            continue
-                        try:
-                            # windows only
-                            os.startfile(p)
-                        except FileNotFoundError:
-                            logger.error("File not found %s", d)
-                        except PermissionError:
-                            logger.error("Permission denied %s", d)
-                        except OSError as e:
-                            logger.error("OS error while opening %s: %s", d, e)
-                        except Exception as e:
-                            logger.error("Unexpected error: %s", e)
-                except Exception:
-                    raise
-                continue
-
-            # if here, run query work
-            try:
-                # set as ref_df or database above...
-                result = df.querex(expr)
-            except ParseError as e:
-                logger.error('Parsing error')
-                logger.error(e)
-            else:
-                click.echo(fGT(result))
-                click.echo(
-                    f'{len(result)} of {result.qx_unrestricted_len:,d} results shown.')
-                if pipe:
-                    click.echo(
-                        f'Found pipe clause {pipe=} TODO: deal with this!')
-        except Exception as e:
-            click.echo(f"[Error] {e}")
+                    # pick up edits and compactions made by other processes
+                    if federation is not None:
+                        federation.refresh()
+                        result = await run_cancellable(
+                            lambda cancel: federation.querex(expr, frame, cancel=cancel))
+                    else:
+                        if lib.refresh():
+                            df = lib.query_target(frame)
+                        # set as ref_df or database above...
+                        result = await run_cancellable(
+                            lambda cancel: df.querex(expr, cancel=cancel))
+                except QueryCancelled:
+                    click.echo('Query cancelled.')
+                except ParseError as e:
+                    logger.error('Parsing error')
+                    logger.error(e)
+                else:
+                    # only the rows of the first page are formatted
+                    pager = ResultPager(result, page_size or len(result))
+                    click.echo(pager.render())
+                    click.echo(pager.footer())
+                    if pipe:
+                        click.echo(
+                            f'Found pipe clause {pipe=} TODO: deal with this!')
+            except Exception as e:
+                click.echo(f"[Error] {e}")
+
+    run_async(repl())
+
+
+# ========================================================================================
+@entry.command(name='daemon')
+@click.argument('action', type=click.Choice(['start', 'stop', 'status']), default='status')
+@click.option(
+    '-t', '--idle-timeout',
+    type=int,
+    default=daemon.IDLE_TIMEOUT,
+    show_default=True,
+    help='Seconds without a command before the daemon exits.'
+)
+def daemon_(action, idle_timeout):
+    """Start, stop or report on the daemon keeping libraries warm between shell commands."""
+    if not daemon.available():
+        click.echo('The archivum daemon needs Unix domain sockets; commands run locally.')
+        return
+    if action == 'start':
+        status = daemon.start(idle_timeout=idle_timeout)
+        if status is None:
+            click.secho('archivum daemon did not start.', fg='red')
+            return
+    elif action == 'stop':
+        click.echo('Stopped archivum daemon.' if daemon.stop() else 'No archivum daemon running.')
+        return
+    else:
+        status = daemon.ping()
+    if status is None:
+        click.echo('No archivum daemon running.')
+    else:
+        for k, v in status.items():
+            click.echo(f'{k:<14s}{v}')
 
 
 # ========================================================================================
@@ -461,16 +709,18 @@ def new(directory, meta, recursive):
     Optionally: look for duplicates!
     """
     logger.info("Scanning directory %s", directory)
+    import pandas as pd
+    from . utilities import fGT
     lib = LibraryContext.get()
     if lib.is_empty:
         click.echo('No open library...exiting')
-        LibraryContext.last_new = EMPTY_DF
+        LibraryContext.last_new = pd.DataFrame([])
         return
     try:
         dfs = lib.get_new_documents(directory, meta, recursive)
     except FileNotFoundError:
         click.echo('%s directory not found', directory)
-        LibraryContext.last_new = EMPTY_DF
+        LibraryContext.last_new = pd.DataFrame([])
         return
     else:
         # store it away in the context
@@ -506,6 +756,7 @@ def new(directory, meta, recursive):
 def import_(execute, partial, regex):
     """Import bibliographic entries, optionally filtered and executed."""
     logger.info("Importing documents, partial match = '%s', regex mode %", partial, regex)
+    from . reference import Reference
     df = LibraryContext.last_new
     if df.empty:
         click.echo('No new documents found! Run new.')
@@ -527,6 +778,8 @@ def import_(execute, partial, regex):
 
     if execute:
         logger.info("Execution enabled: changes will be applied.")
+        # imported references change the frames: drop stale query results
+        LibraryContext.get().invalidate()
     else:
         logger.info("Dry run mode: no changes applied.")
 
@@ -546,6 +799,9 @@ def import_(execute, partial, regex):
 @click.argument("args", nargs=-1, type=click.UNPROCESSED)
 def rg(args, n):
     """Run ripgrep (rg) with given pattern and args against text extracts from pdfs."""
+    from rich.console import Console
+    from rich.text import Text
+    console = Console()
     lib = LibraryContext.get()
     if lib.is_empty:
         click.echo("No library open...don't know where to look for text files. Returning")
@@ -664,6 +920,12 @@ def uber(lib_name, start, debug, subcommand_args):
     Arguments
         - argument: argument to pass to the subcommand."
     """
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.completion import FuzzyCompleter, WordCompleter
+    from prompt_toolkit.document import Document
+
+    # uber keeps its libraries open itself
+    LibraryContext.local = True
     if debug:
         logger.setLevel(LogLevel.DEBUG)
         logger.debug("Debug mode enabled.")
@@ -678,6 +940,8 @@ def uber(lib_name, start, debug, subcommand_args):
         'list-libraries',
         'get-library-stats',
         'get-distinct-values',
+        'snapshot',
+        'compact-library',
         'new',
         'import',
         'rg',
@@ -714,7 +978,8 @@ def uber(lib_name, start, debug, subcommand_args):
 
     lib_name = lib_name or DEFAULT_CONFIG_FILE
     logger.info('Opening "%s" and starting interactive loop.', lib_name)
-    entry(args=["open-library", lib_name], standalone_mode=False)
+    # the prompt shows at once, the library loads behind it
+    entry(args=["open-library", "--background", lib_name], standalone_mode=False)
 
     if len(subcommand_args) == 1:
         subcommand_args = list(subcommand_args)
@@ -726,7 +991,9 @@ def uber(lib_name, start, debug, subcommand_args):
     while True:
         try:
             lib = LibraryContext.get()
-            q = start or session.prompt(get_prompt('uber'))
+            # redrawn while a background load shows progress
+            q = start or session.prompt(lambda: get_prompt('uber'), refresh_interval=(
+                0.5 if getattr(lib, 'preload_status', '') else 0))
             start = ''
             # dispatch call
             if q in {'exit', ';', 'x', '..'}:
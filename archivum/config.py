@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import List, Literal
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -7,7 +7,7 @@ class ArchivumConfig(BaseModel):
     name: str = Field(..., description="Human-readable name of the library")
     description: str = Field("", description="Optional longer description")
 
-    ref_columns: List[str] = Field(..., description="List of fields to include in reference output")
+    ref_columns: Optional[List[str]] = Field(None, description="Reference fields loaded by default, others load when a query needs them")
 
     bibtex_file: Path = Field(..., description="Path to BibTeX output file")
     pdf_dir_name: Path = Field(..., description="Path where PDFs are stored")
@@ -30,3 +30,12 @@ class ArchivumConfig(BaseModel):
 
     tablefmt: str = Field("mixed_grid", description="Table format for display (see tabulate)")
     max_table_width: int = Field(80, gt=0, description="Maximum width for table display in characters")
+
+    query_engine: Literal["pandas", "arrow", "sqlite"] = Field("pandas", description="Engine used to filter and sort querex results")
+    database_model: Literal["exploded", "normalized"] = Field("exploded", description="Answer database queries from the exploded frame or the normalized author tables")
+    compact_dtypes: bool = Field(False, description="Categoricals, small nullable ints and real nulls in the library frames (changes how missing values query, see schema)")
+    memory_map: bool = Field(False, description="Memory map the (uncompressed) feather files instead of reading them")
+    restore_snapshot: bool = Field(True, description="Reopen from the snapshot of the warmed library state while it matches the files")
+    journal: bool = Field(True, description="Append edits to a journal replayed on open, rather than rewriting the library files")
+    journal_max_records: int = Field(1000, ge=1, description="Compact the journal into the library files once it holds this many edits")
+    result_cache_mb: float = Field(64, ge=0, description="Memory budget for cached query results in MB")
@@ -0,0 +1,274 @@
+"""
+Optional daemon keeping libraries warm across shell invocations.
+
+Each ``archivum ...`` from the shell is a fresh interpreter that would
+reload the library. ``archivum daemon start`` starts a background process
+that runs the commands instead: it keeps the opened libraries (see
+``LibraryContext``), their caches and the parsed query specs in memory and
+listens on a Unix domain socket in the application folder. While it runs,
+commands that need no terminal (``DAEMON_COMMANDS``) are thin clients: the
+arguments and working directory go to the daemon, which runs the command
+and streams the printed output back. So
+
+    archivum daemon start
+    archivum open-library papers
+    archivum query-library --once "top 10 recent"
+
+opens papers once. The daemon exits after idle_timeout seconds without a
+request, or on ``archivum daemon stop``. Set ARCHIVUM_DAEMON=0 to run
+commands locally anyway. The daemon runs one command at a time.
+
+Protocol: the client sends one JSON line, ``{"args": [...], "cwd": ...}``
+or ``{"control": "status" | "stop"}``; the daemon replies with the output
+text, a NUL byte and a JSON status, ``{"exit": code}``, and closes.
+
+Unix domain sockets are not available on Windows, where commands always
+run locally.
+"""
+
+import codecs
+from contextlib import redirect_stderr, redirect_stdout
+import io
+import json
+import logging
+import os
+from pathlib import Path
+import socket
+import socketserver
+import subprocess
+import sys
+import time
+import traceback
+
+from . import BASE_DIR, APP_NAME
+
+logger = logging.getLogger(__name__)
+
+# seconds without a request before the daemon exits
+IDLE_TIMEOUT = 900
+
+# commands the daemon runs for the shell; query-library only with --once
+DAEMON_COMMANDS = {
+    'open-library', 'save-library', 'close-library', 'merge-library', 'list-libraries',
+    'get-library-stats', 'get-distinct-values', 'snapshot', 'compact-library',
+    'query-library', 'new', 'import', 'rg',
+}
+
+_END = b'\0'
+
+
+def available():
+    """True where Unix domain sockets are supported."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def socket_path():
+    """Path of the daemon socket, ARCHIVUM_DAEMON_SOCKET if set."""
+    return Path(os.environ.get('ARCHIVUM_DAEMON_SOCKET', BASE_DIR / f'{APP_NAME}-daemon.sock'))
+
+
+def run_command(args, out=None):
+    """
+    Run cli args in this process, printing to out; return (printed output,
+    exit code). The output is only collected (else '') if out is None.
+    """
+    import click
+    from . cli import entry, LibraryContext
+
+    LibraryContext.local = True
+    collect = out is None
+    out = io.StringIO() if collect else out
+    code = 0
+    with redirect_stdout(out), redirect_stderr(out):
+        try:
+            ans = entry.main(list(args), prog_name=APP_NAME, standalone_mode=False)
+            code = ans if isinstance(ans, int) else 0
+        except click.exceptions.Exit as e:
+            code = e.exit_code
+        except click.ClickException as e:
+            e.show()
+            code = e.exit_code
+        except click.Abort:
+            code = 1
+        except Exception:
+            traceback.print_exc()
+            code = 1
+    return out.getvalue() if collect else '', code
+
+
+class _StreamWriter(io.TextIOBase):
+    """Text stream writing through to the client socket as the command prints."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        self._wfile.write(s.replace('\0', '').encode('utf-8', 'replace'))
+        return len(s)
+
+    def flush(self):
+        self._wfile.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        server = self.server
+        server.requests += 1
+        status = {'exit': 0}
+        if request.get('control') == 'status':
+            self.wfile.write(json.dumps(server.status()).encode())
+        elif request.get('control') == 'stop':
+            server.stopping = True
+            self.wfile.write(b'archivum daemon stopping\n')
+        else:
+            cwd = os.getcwd()
+            try:
+                os.chdir(request.get('cwd') or cwd)
+                _, status['exit'] = run_command(request['args'], _StreamWriter(self.wfile))
+            finally:
+                os.chdir(cwd)
+        self.wfile.write(_END + json.dumps(status).encode())
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Serves one request at a time until stopped or idle for idle_timeout seconds."""
+
+    def __init__(self, path, idle_timeout=IDLE_TIMEOUT):
+        self.path = Path(path)
+        self.timeout = idle_timeout
+        self.stopping = False
+        self.requests = 0
+        self.started = time.time()
+        if self.path.exists():
+            if ping(self.path) is not None:
+                raise RuntimeError(f'archivum daemon already running on {self.path}')
+            # left by a daemon that was killed
+            self.path.unlink()
+        old = os.umask(0o177)
+        try:
+            super().__init__(str(self.path), _Handler)
+        finally:
+            os.umask(old)
+
+    def handle_timeout(self):
+        logger.info('archivum daemon idle for %s seconds, exiting', self.timeout)
+        self.stopping = True
+
+    def status(self):
+        from . cli import LibraryContext
+        return {'pid': os.getpid(),
+                'uptime': round(time.time() - self.started),
+                'requests': self.requests,
+                'idle_timeout': self.timeout,
+                'current': str(LibraryContext.current) if LibraryContext.current else None,
+                'libraries': sorted(LibraryContext.opened)}
+
+    def serve(self):
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            self.path.unlink(missing_ok=True)
+
+
+def serve(path=None, idle_timeout=IDLE_TIMEOUT):
+    """Run the daemon in this process until stopped or idle."""
+    from . cli import LibraryContext
+    LibraryContext.local = True
+    DaemonServer(path or socket_path(), idle_timeout).serve()
+
+
+def _send(request, path=None, out=None):
+    """
+    Send request to the daemon, writing its output to out as it arrives.
+    Returns the JSON status, or None if no daemon is listening.
+    """
+    path = Path(path or socket_path())
+    if not available() or not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    with sock:
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        out = out or sys.stdout
+        # a chunk may end inside a multibyte character
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        tail = None
+        while chunk := sock.recv(1 << 16):
+            if tail is not None:
+                tail += chunk
+                continue
+            text, end, rest = chunk.partition(_END)
+            out.write(decoder.decode(text, final=bool(end)))
+            if end:
+                tail = rest
+        out.flush()
+    return json.loads(tail) if tail else {'exit': 1}
+
+
+def forward(args, path=None):
+    """
+    Run cli args in the daemon if it is running and takes the command.
+    Returns the exit code, or None to run the command locally.
+    """
+    if os.environ.get('ARCHIVUM_DAEMON', '1') == '0' or not args:
+        return None
+    if args[0] not in DAEMON_COMMANDS:
+        return None
+    if args[0] == 'query-library' and '--once' not in args:
+        # the interactive query loop needs the terminal
+        return None
+    status = _send({'args': list(args), 'cwd': os.getcwd()}, path)
+    return None if status is None else status['exit']
+
+
+def ping(path=None):
+    """Status dictionary of the running daemon, or None."""
+    buffer = io.StringIO()
+    if _send({'control': 'status'}, path, buffer) is None:
+        return None
+    return json.loads(buffer.getvalue())
+
+
+def stop(path=None):
+    """Ask the daemon to exit; True if one was running."""
+    return _send({'control': 'stop'}, path, io.StringIO()) is not None
+
+
+def start(path=None, idle_timeout=IDLE_TIMEOUT, wait=10):
+    """
+    Start the daemon in a background process; returns its status, once it
+    answers, or None if it did not start within wait seconds.
+    """
+    if not available():
+        raise RuntimeError('archivum daemon needs Unix domain sockets')
+    path = Path(path or socket_path())
+    status = ping(path)
+    if status is not None:
+        return status
+    subprocess.Popen([sys.executable, '-m', 'archivum.daemon', str(path), str(idle_timeout)],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+    end = time.time() + wait
+    while time.time() < end:
+        time.sleep(0.05)
+        status = ping(path)
+        if status is not None:
+            return status
+    return None
+
+
+if __name__ == '__main__':
+    # python -m archivum.daemon [socket path] [idle timeout], see start
+    serve(sys.argv[1] if len(sys.argv) > 1 else None,
+          float(sys.argv[2]) if len(sys.argv) > 2 else IDLE_TIMEOUT)
@@ -0,0 +1,199 @@
+"""
+Federated querex: one query over several libraries.
+
+The libraries are opened in parallel threads and each answers the query
+with its own querex (engine, caches and all), so each returns at most top n
+rows, already in query order. The results are merged with a k-way merge
+(``heapq.merge``) on the sort keys, stable so ties keep library order, and
+only the first top n rows of the merge are taken from the per library
+results: the full frames are never concatenated. Without a sort clause the
+libraries' rows follow each other in library order.
+
+A ``library`` column names the library of each row. Sort columns are added
+to the per library selections for the merge and dropped again unless the
+query selects them. A sort column held as numbers in one library and as
+strings in another (year in a compact and a plain library, see schema) is
+compared as numbers, '' missing.
+
+    from archivum.federated import federated_querex
+    federated_querex(['papers', 'books'], 'top 20 ! /Wang/ order -year')
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+from itertools import islice
+
+import pandas as pd
+
+from . library import Library
+from . parser import cached_parser
+from . querex import decorate_result, select_fields
+
+
+class _Descending():
+    """Sort key wrapper reversing the order of value."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _row_keys(df, by, ascending):
+    """
+    Merge keys of the rows of df for sort columns by: per column (missing,
+    value), so missing values sort last in either direction, as in querex.
+    """
+    columns = []
+    for c, asc in zip(by, ascending):
+        if c not in df.columns:
+            columns.append([(True, None)] * len(df))
+            continue
+        values = df[c].tolist()
+        if not asc:
+            values = map(_Descending, values)
+        columns.append([(True, None) if missing else (False, v)
+                        for missing, v in zip(df[c].isna().tolist(), values)])
+    return list(zip(*columns))
+
+
+def _sort_types(results, by):
+    """
+    Sort columns of by whose type differs between results, mapped to True to
+    compare as numbers or False as strings.
+
+    Year, for example, is Int16 in a compact library and str in a plain one
+    (see schema), and ints and strs do not compare. A column is numeric if
+    any library holds it as numbers.
+    """
+    ans = {}
+    for c in dict.fromkeys(by):
+        columns = [df[c] for df in results if c in df.columns]
+        if len({str(s.dtype) for s in columns}) > 1:
+            ans[c] = any(pd.api.types.is_numeric_dtype(s) for s in columns)
+    return ans
+
+
+def _coerce(df, types):
+    """The columns of df in types, as numbers ('' and other text missing) or strings, by name."""
+    return {c: pd.to_numeric(df[c], errors='coerce') if numeric else df[c].astype('str')
+            for c, numeric in types.items() if c in df.columns}
+
+
+class Federation():
+    """
+    Libraries (names or Library objects) queried together, see querex.
+
+    Names are opened in parallel threads, workers at a time.
+    """
+
+    def __init__(self, libraries, workers=8):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            self.libraries = list(pool.map(
+                lambda lib: lib if isinstance(lib, Library) else Library(lib), libraries))
+        self.workers = workers
+
+    def __repr__(self):
+        return f'Federation({", ".join(self.names)})'
+
+    @property
+    def names(self):
+        """Library names, as in the library column of results."""
+        return [lib.config_path.stem for lib in self.libraries]
+
+    def refresh(self):
+        """Refresh each library, see Library.refresh; True if any changed."""
+        return any([lib.refresh() for lib in self.libraries])
+
+    def querex(self, expr, name='database', cancel=None):
+        """
+        Run querex expr on frame name of every library and merge the results
+        in query order, with a library column. Top n applies to the merged
+        rows; qx_unrestricted_len is the total over the libraries. cancel, an
+        optional threading.Event, is passed to each library's querex.
+        """
+        expr = expr.strip()
+        # parse errors are raised before any library runs
+        spec = cached_parser(expr)
+        top_n = spec['top']
+        base_cols, _, recent_field = Library.querex_settings[name]
+        if 'recent' in spec['flags']:
+            by, ascending = [recent_field], [False]
+        else:
+            by, ascending = [c for c, _ in spec['sort']], [a for _, a in spec['sort']]
+        include = spec['select']['include']
+        extra = [] if '*' in include else [c for c in dict.fromkeys(by)
+                                            if c not in base_cols and c not in include]
+        query = f'{expr} select {", ".join(extra)}' if extra else expr
+
+        def run(lib, query=query):
+            return lib.query_target(name).querex(query, cancel=cancel)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(run, self.libraries))
+
+        # (library, row) of the merged rows in order
+        rows = ((i, j) for i, df in enumerate(results) for j in range(len(df)))
+        if by:
+            def sort_columns(i):
+                # a sort column dropped from a result as empty was '' in a
+                # plain library and missing in a compact one
+                df = results[i]
+                if self.libraries[i].compact_dtypes:
+                    return df
+                return df.assign(**{c: '' for c in dict.fromkeys(by) if c not in df.columns})
+
+            frames = [sort_columns(i) for i in range(len(results))]
+            types = _sort_types(frames, by)
+            # text made numeric sorts differently ('' first becomes missing
+            # last), so those results are put back in order, with all their
+            # rows if top n cut them short
+            resort = {i for i, df in enumerate(frames)
+                      if any(numeric and c in df.columns
+                             and not pd.api.types.is_numeric_dtype(df[c])
+                             for c, numeric in types.items())}
+            for i in resort:
+                if len(results[i]) < getattr(results[i], 'qx_unrestricted_len', 0):
+                    # the last top clause counts and top 0 is all rows
+                    results[i] = run(self.libraries[i], f'{query} top 0')
+                    frames[i] = sort_columns(i)
+            keyed = []
+            for i, df in enumerate(frames):
+                keys = df.assign(**_coerce(df, types)) if types else df
+                keys = [(key, i, j) for j, key in enumerate(_row_keys(keys, by, ascending))]
+                keyed.append(sorted(keys, key=lambda t: t[0]) if i in resort else keys)
+            rows = ((i, j) for _, i, j in heapq.merge(*keyed, key=lambda t: t[0]))
+        if top_n > 0:
+            rows = islice(rows, top_n)
+        rows = list(rows)
+
+        # only the selected rows of each result, then put in merged order
+        parts = []
+        for i, (lib_name, df) in enumerate(zip(self.names, results)):
+            positions = [j for k, j in rows if k == i]
+            if positions:
+                part = df.iloc[positions].drop(columns=extra, errors='ignore')
+                parts.append(part.reset_index(drop=True).assign(
+                    library=lib_name, _order=[n for n, (k, _) in enumerate(rows) if k == i]))
+        if parts:
+            df = pd.concat(parts, ignore_index=True).sort_values('_order').drop(columns='_order')
+        else:
+            df = pd.DataFrame(columns=['library'])
+        fields = [c for c in select_fields(df.columns, spec, ['library'] + base_cols, recent_field)
+                  if c in df.columns]
+        df = df[fields + [c for c in df.columns if c not in fields]].reset_index(drop=True)
+        unrestricted = sum(getattr(r, 'qx_unrestricted_len', len(r)) for r in results)
+        # titles were tidied by each library's querex
+        return decorate_result(df, expr, top_n, unrestricted, strip_braces=False,
+                               null_is_empty=any(lib.compact_dtypes for lib in self.libraries))
+
+
+def federated_querex(libraries, expr, name='database', workers=8):
+    """Run querex expr against frame name of several libraries, see Federation.querex."""
+    return Federation(libraries, workers).querex(expr, name)
@@ -0,0 +1,124 @@
+"""
+Append-only journal of library edits.
+
+Each edit (``Library.add_references``, ``link`` etc.) is appended as one
+JSON line naming the method and its arguments, so making an edit durable
+costs one small write and fsync rather than rewriting the feathers. The
+first line records the fingerprint of the feathers the edits apply to.
+Opening the library replays the journal; ``Library.compact`` folds it into
+fresh feathers and removes it.
+
+A process killed mid-append leaves at most a partial last line, which has
+no newline: it is ignored when reading and cut off before the next append.
+Timestamps are written as ``{"$ts": iso}``, missing values as null.
+"""
+
+from datetime import date, datetime
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_VERSION = 1
+
+
+def _default(obj):
+    """JSON for values json does not know: timestamps, numpy scalars, collections."""
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    if isinstance(obj, (set, frozenset, pd.Series, pd.Index, np.ndarray)):
+        return list(obj)
+    if isinstance(obj, (datetime, date, np.datetime64)) and not pd.isna(obj):
+        return {'$ts': pd.Timestamp(obj).isoformat()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if pd.isna(obj):
+        return None
+    raise TypeError(f'Cannot journal {type(obj).__name__} value {obj!r}')
+
+
+def fsync_file(path):
+    """Flush file path to disk."""
+    with open(path, 'rb') as f:
+        os.fsync(f.fileno())
+
+
+def _hook(d):
+    if len(d) == 1 and '$ts' in d:
+        return pd.Timestamp(d['$ts'])
+    return d
+
+
+def dumps(record):
+    """record as one JSON line, without the newline."""
+    return json.dumps(record, default=_default, ensure_ascii=False)
+
+
+def loads(line):
+    return json.loads(line, object_hook=_hook)
+
+
+class Journal():
+    """JSON lines journal file at path; created with its header on first append."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        # complete records in the file, set by read
+        self.n_records = 0
+        # bytes of complete lines; a longer file ends in a partial line
+        self._good = None
+
+    def exists(self):
+        return self.path.exists()
+
+    def read(self):
+        """(header, records) of the journal, (None, []) if there is none."""
+        if not self.path.exists():
+            self.n_records, self._good = 0, 0
+            return None, []
+        data = self.path.read_bytes()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            logger.warning('Ignoring partial last record of %s', self.path)
+        self._good = end
+        lines = data[:end].decode().splitlines()
+        if not lines:
+            self.n_records = 0
+            return None, []
+        header = loads(lines[0])
+        records = [loads(line) for line in lines[1:]]
+        self.n_records = len(records)
+        return header, records
+
+    def append(self, record, base):
+        """
+        Append record (a dict) and fsync; base is the feather fingerprint
+        written in the header of a new journal.
+        """
+        if self._good is None:
+            self.read()
+        with self.path.open('ab') as f:
+            if f.tell() > self._good:
+                # cut off a partial record left by a killed process
+                f.truncate(self._good)
+            lines = []
+            if self._good == 0:
+                lines.append(dumps({'journal': JOURNAL_VERSION, 'base': base}))
+            lines.append(dumps(record))
+            data = ('\n'.join(lines) + '\n').encode()
+            # one write, so a kill leaves at most a partial last line
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._good += len(data)
+        self.n_records += 1
+
+    def remove(self):
+        """Delete the journal file, e.g. after compaction."""
+        self.path.unlink(missing_ok=True)
+        self.n_records, self._good = 0, 0
@@ -6,34 +6,129 @@ Equivalent to and based on manager module in file_database.
 Querying uses a file-database project-like combo regex-sql (querex) querier.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from functools import partial
+from functools import partial, wraps
+import hashlib
 import json
 import logging 
+import os
 from pathlib import Path
 import re
 import subprocess
+import threading
 import time
 from types import MethodType
 
 import yaml
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
 
-from . import BASE_DIR, APP_NAME
-from . trie import Trie
-from . querex import querex_work, querex_help as querex_help_work
+from . import BASE_DIR, APP_NAME, library_config_paths
+from . trie import Trie, front_code, front_decode
+from . querex import (querex_work, querex_help as querex_help_work, ResultCache,
+                      factorize_strings, sort_permutation, spec_columns)
+from . parser import spec_cache_info
+from . snapshot import SNAPSHOT_VERSION, Snapshot, read_header, write_snapshot, snapshot_info
+from . schema import compact_column, compact_frame, conform, is_compact, plain_frame, write_compact
+from . trigram import TrigramIndex
 from . hasher import hash_many
+from . journal import Journal, fsync_file
+from . locking import LibraryLock, tmp_path
 from . utilities import TagAllocator, make_fGT
-from . document import Document
 
 logger = logging.getLogger(__name__)
 
+# the frames stored in feather files, and the suffix of each file
+FRAMES = ('ref_df', 'doc_df', 'ref_doc_df')
+FEATHER_SUFFIXES = {'ref_df': 'ref', 'doc_df': 'doc', 'ref_doc_df': 'ref-doc'}
+# libyaml's loader where installed, several times faster
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# keep the feathers open so later reads see the generation first opened;
+# Windows cannot replace open files
+PIN_FILES = os.name != 'nt'
+
+# the parts Library.preload loads, in order
+PRELOAD_PARTS = ('ref_df', 'doc_df', 'ref_doc_df', 'database', 'author_trie')
+
+# edit methods appended to the journal, and the only ones replayed from it
+JOURNALED_EDITS = set()
+
+
+def _journaled(method):
+    """
+    Append each successful call of edit method to the library journal, see
+    journal. Holds the write lock, catching up with other processes first.
+    """
+    JOURNALED_EDITS.add(method.__name__)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._replaying:
+            return method(self, *args, **kwargs)
+        self.wait_preload()
+        with self._lock.writer():
+            self._sync()
+            ans = method(self, *args, **kwargs)
+            self._log_edit(method.__name__, args, kwargs)
+        return ans
+    return wrapper
+
+
+# frame name -> its row count in library_details
+ROW_COUNT_COLUMNS = {'ref_df': 'references', 'doc_df': 'documents', 'ref_doc_df': 'links'}
+
+
+def library_details(config_path):
+    """
+    Config and the row counts, total size and last modification of the
+    feathers of the library with config_path, without opening it.
+
+    Rows are counted from the Arrow IPC footers and batch headers; no column
+    is read. Missing or unreadable files give missing counts.
+    """
+    config_path = Path(config_path)
+    with config_path.open() as f:
+        ans = yaml.load(f, Loader=YamlLoader) or {}
+    size = 0
+    modified = None
+    for name in FRAMES:
+        path = config_path.with_suffix(f'.{APP_NAME}-{FEATHER_SUFFIXES[name]}-feather')
+        try:
+            stat = path.stat()
+            with pa.memory_map(str(path)) as source:
+                ans[ROW_COUNT_COLUMNS[name]] = pa.ipc.open_file(source).count_rows()
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.debug('Cannot read %s: %s', path, e)
+            continue
+        size += stat.st_size
+        modified = max(modified or 0, stat.st_mtime)
+    ans['size_mb'] = size / (1 << 20)
+    ans['modified'] = pd.Timestamp(modified, unit='s').floor('s') if modified else pd.NaT
+    return ans
+
+
 class Library():
     """Library specified by config yaml (archivum-config) file."""
 
     # base columns used by the app for quick output displays
     base_cols = ['tag', 'type', 'author', 'title', 'year', 'journal', 'file']
 
+    # querex base columns, bang field and recent field for each frame
+    querex_settings = {
+        'doc_df': (['name', 'create', 'size', 'tpath'], 'name', 'mod'),
+        'ref_df': (['tag', 'author', 'title', 'journal'], 'author', 'year'),
+        'ref_doc_df': (['tag', 'path'], 'path', 'tag'),
+        'database': (['tag', 'author', 'title', 'journal', 'create'], 'author', 'mod'),
+    }
+
+    # columns with a trigram index to prefilter regex queries, used once they
+    # have trigram_min_values distinct values (scanning fewer is faster)
+    trigram_fields = ['title', 'author', 'journal', 'path']
+    trigram_min_values = 10_000
+
     def __init__(self, config_file, debug=False):
         """
         Load YAML config from file.
@@ -49,7 +144,7 @@ class Library():
         logger.debug('config_path = %s', self.config_path)
         assert self.config_path.exists()
         with self.config_path.open() as f:
-            self._config = yaml.safe_load(f)
+            self._config = yaml.load(f, Loader=YamlLoader)
         make_fGT(max_table_width=self.max_table_width)
         self._last_query = None
         self._last_unrestricted = 0
@@ -61,12 +156,68 @@ class Library():
         self._ref_doc_df = pd.DataFrame([])
         # fully blown up docs x refs x authors
         self._database = pd.DataFrame([])
+        # database row -> ref_df and doc_df positions and the exploded author
+        self._database_rows = {}
+        # frame name -> all columns, see columns
+        self._columns = {}
+        # of the feathers, stamped on the database and tpath caches
+        self._fingerprint = None
+        self._cache_thread = None
+        # threads of this process: held handing off _cache_thread, adding
+        # columns to the frames and by preload loading a part
+        self._frame_lock = threading.RLock()
+        # background load of the frames etc., see preload
+        self._preload_thread = None
+        self._preload_events = {}
         self._trie = None
         self._tag_allocator = None
+        # querex results, invalidated by bumping the generation when frames change
+        self._result_cache = ResultCache(
+            max_bytes=int(self._config.get('result_cache_mb', 64) * (1 << 20)))
+        # pandas, arrow (see querex_arrow) or sqlite (see sqlite_backend)
+        self.query_engine = self._config.get('query_engine', 'pandas')
+        # exploded or normalized (see normalized): what answers database querex
+        self.database_model = self._config.get('database_model', 'exploded')
+        self._normalized = None
+        # categoricals, small ints and nulls, see schema
+        self.compact_dtypes = self._config.get('compact_dtypes', False)
+        # memory map feather files rather than reading them, see _read_feather
+        self.memory_map = self._config.get('memory_map', False)
+        self._arrow_tables = {}
+        # (frame name, column) -> factorize_strings result, for regex filters
+        self._value_codes = {}
+        # (frame name, column) -> TrigramIndex of the distinct values, or None
+        self._trigram_indexes = {}
+        # frame name -> positions of all rows, most recent first
+        self._recent_orders = {}
+        self._sqlite = None
+        # frames edited in memory (add_references etc.) since they were read
         self.is_dirty = False
         self.is_empty = False
         self.text_dir_path = self.BASE_DIR / self.text_dir_name
         self.text_dir_full_name = str(self.text_dir_path)
+        # edits are appended to the journal and replayed on open, see compact
+        self.journal = self._config.get('journal', True)
+        self.journal_max_records = self._config.get('journal_max_records', 1000)
+        self._journal = Journal(self.config_path.with_suffix(f'.{APP_NAME}-journal'))
+        self._replaying = False
+        # journal records read with the feathers, replayed up to _journal_applied
+        self._journal_header = None
+        self._journal_records = []
+        self._journal_applied = 0
+        # other processes may share the library, see locking
+        self._lock = LibraryLock(self.config_path)
+        # name -> (open feather, stat, schema) of one generation, see _pin
+        self._pinned = None
+        self._file_generation = None
+        self._finish_compaction()
+        # restored snapshot: its trie and tags are decoded on first use
+        self._snapshot = None
+        # reopen from the snapshot written by write_snapshot while it is current
+        self.restore_snapshot = self._config.get('restore_snapshot', True)
+        if self.restore_snapshot:
+            self._restore_snapshot()
+        self._open()
 
     def close(self):
         """Close library."""
@@ -77,82 +228,652 @@ class Library():
         """Save library if necessary."""
         logger.todo('Library.save()')
 
+    def preload(self, parts=PRELOAD_PARTS):
+        """
+        Load parts (see PRELOAD_PARTS), in order, in a background thread and return at once.
+
+        Reading a part waits only until the thread has loaded that part;
+        edits, refresh and invalidate wait for the whole preload. See
+        preload_status for progress. Also rebuilds stale caches, like warm_cache.
+        """
+        self.wait_preload()
+        self._preload_events = {part: threading.Event() for part in parts}
+        self._preload_thread = threading.Thread(
+            target=self._preload, args=(parts,), name='archivum-preload', daemon=True)
+        self._preload_thread.start()
+
+    def _preload(self, parts):
+        for part in parts:
+            try:
+                # not while load_columns adds columns to a frame
+                with self._frame_lock:
+                    getattr(self, part)
+            except Exception as e:
+                # the part is left unloaded: reading it raises in the caller
+                logger.warning('Preloading %s failed: %s', part, e)
+            finally:
+                self._preload_events[part].set()
+
+    def wait_preload(self, part=None):
+        """Wait until the preload thread has loaded part, or finished if part is None."""
+        thread = self._preload_thread
+        if thread is None or thread is threading.current_thread():
+            return
+        if part is None:
+            thread.join()
+        elif part in self._preload_events:
+            self._preload_events[part].wait()
+
+    @property
+    def preload_status(self):
+        """Progress of preload, e.g. 'loading database 4/5', or '' when done."""
+        loading = [p for p, e in self._preload_events.items() if not e.is_set()]
+        if not loading:
+            return ''
+        n = len(self._preload_events)
+        return f'loading {loading[0]} {n - len(loading) + 1}/{n}'
+
     @property
     def doc_df(self):
-        """Return the document df, loading if needed."""
+        """Return the document df, loading the resident columns if needed."""
+        self.wait_preload('doc_df')
         if self._doc_df.empty:
-
-            self._doc_df = pd.read_feather(self.config_path.with_suffix(f'.{APP_NAME}-doc-feather'))
-            pdf_dir = Path(self.pdf_dir_name)
-            self._doc_df['tpath'] = [
-                str(Path(i).relative_to(pdf_dir).parent)
-                for i in self._doc_df.path]
-            # set base cols
-            base_cols = ['name', 'create', 'size', 'tpath']
-            querex = partial(querex_work,
-                             base_cols=base_cols,
-                             bang_field='name',
-                             recent_field='mod',
-                             debug=self.debug)
-            self._doc_df.querex = MethodType(querex, self._doc_df)
+            self._doc_df = self._read_feather(
+                'doc_df',
+                columns=[c for c in self.resident_columns('doc_df') if c != 'tpath'])
+            if 'tpath' in self.resident_columns('doc_df'):
+                self._doc_df['tpath'] = self._cached('tpath')['tpath']
+            self._attach_querex('doc_df', self._doc_df)
         return self._doc_df
 
     @property
     def ref_df(self):
-        """Return the document df, loading if needed."""
+        """Return the reference df, loading the resident columns if needed."""
+        self.wait_preload('ref_df')
         if self._ref_df.empty:
-            self._ref_df = pd.read_feather(self.config_path.with_suffix(f'.{APP_NAME}-ref-feather'))
-            # set base cols
-            base_cols = ['tag', 'author', 'title', 'journal']
-            querex = partial(querex_work,
-                             base_cols=base_cols,
-                             bang_field='author',
-                             recent_field='year',
-                             debug=self.debug)
-            self._ref_df.querex = MethodType(querex, self._ref_df)
+            self._ref_df = self._read_feather('ref_df', columns=self.resident_columns('ref_df'))
+            self._attach_querex('ref_df', self._ref_df)
         return self._ref_df
 
     @property
     def ref_doc_df(self):
         """Return the document df, loading if needed."""
+        self.wait_preload('ref_doc_df')
         if self._ref_doc_df.empty:
-            self._ref_doc_df = pd.read_feather(self.config_path.with_suffix(f'.{APP_NAME}-ref-doc-feather'))
-            # set base cols
-            base_cols = ['tag', 'path']
-            querex = partial(querex_work,
-                             base_cols=base_cols,
-                             bang_field='path',
-                             recent_field='tag',
-                             debug=self.debug)
-            self._ref_doc_df.querex = MethodType(querex, self._ref_doc_df)
+            self._ref_doc_df = self._read_feather('ref_doc_df')
+            self._attach_querex('ref_doc_df', self._ref_doc_df)
         return self._ref_doc_df
 
     @property
     def database(self):
-        """Merged database, with exploded authors."""
+        """
+        Merged database, with exploded authors.
+
+        ref_doc_df right merged with the exploded ref_df on tag, then left merged
+        with doc_df on path. Only the row mapping is merged; columns are taken
+        from the source frames, so non-resident columns can be added later.
+        The mapping is cached on disk, see warm_cache.
+        """
+        self.wait_preload('database')
         if self._database.empty:
-            exploded_authors = (
-                self.ref_df.assign(author=self.ref_df.author.str.split(" and "))
-                .explode("author", ignore_index=True)
-            )
-            self._database = (((
-                self.ref_doc_df
-                .merge(exploded_authors, on="tag", how='right'))
-                .merge(self.doc_df, on='path', how='left'))
-            )
-            for c in ['node', 'links', 'size']:
-                self._database[c] = self._database[c].fillna(0)
-            self._database.fillna('')
-            # set base cols
-            base_cols = ['tag', 'author', 'title', 'journal', 'create']
-            querex = partial(querex_work,
-                             base_cols=base_cols,
-                             bang_field='author',
-                             recent_field='mod',
-                             debug=self.debug)
-            self._database.querex = MethodType(querex, self._database)
+            if self.is_dirty:
+                # edited in memory: the cached mapping is for the files
+                rows = self._database_row_map(self.ref_df, self.ref_doc_df, self.doc_df)
+            else:
+                rows = self._cached('database')
+            self._set_database(rows)
         return self._database
 
+    def _set_database(self, rows, columns=None):
+        """
+        Make the database from row mapping rows (see _database_row_map).
+
+        Takes columns (default all whose source column is resident) from the
+        source frames.
+        """
+        self._database_rows = {
+            'ref_df': rows['_ref'].to_numpy(),
+            'doc_df': rows['_doc'].to_numpy(),
+            'author': rows['author'],
+        }
+        self._database = rows[['tag', 'path']]
+        layout = self._database_layout()
+        for c in self.columns('database'):
+            frame, column = layout[c]
+            if columns is not None and c not in columns:
+                continue
+            if c not in self._database and column in getattr(self, frame):
+                self._database[c] = self._database_column(c)
+        self._attach_querex('database', self._database)
+
+    @staticmethod
+    def _database_row_map(ref, ref_doc, doc):
+        """
+        Rows of the database merge: tag, path, exploded author and the ref_df
+        and doc_df position of each row (-1 for no document).
+
+        Only needs the tag and author columns of ref, tag and path of ref_doc
+        and path of doc. ref may be a subset of the rows of ref_df (index
+        labels are its positions), see _patch_database.
+        """
+        exploded_authors = ref.author.str.split(" and ").explode()
+        rows = (
+            ref_doc[['tag', 'path']]
+            .merge(pd.DataFrame({
+                'tag': ref.tag.loc[exploded_authors.index].reset_index(drop=True),
+                '_author': np.arange(len(exploded_authors))}), on='tag', how='right')
+            .merge(pd.DataFrame({
+                'path': doc.path,
+                '_doc': np.arange(len(doc))}), on='path', how='left')
+        )
+        author_rows = rows['_author'].to_numpy()
+        return pd.DataFrame({
+            'tag': rows['tag'],
+            'path': rows['path'],
+            'author': exploded_authors.iloc[author_rows].reset_index(drop=True),
+            '_ref': exploded_authors.index.to_numpy()[author_rows],
+            '_doc': rows['_doc'].fillna(-1).to_numpy(dtype=np.int64),
+        })
+
+    def fingerprint(self):
+        """
+        Fingerprint of the ref, doc and ref-doc feathers: size, mtime and schema of each.
+
+        Stamped on the cache files; a cache is used only if its stamp matches.
+        """
+        if self._fingerprint is None:
+            h = hashlib.sha256()
+            self._pin()
+            for name in FRAMES:
+                _, stat, schema = self._pinned[name]
+                h.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns}:'.encode())
+                h.update(schema.remove_metadata().to_string().encode())
+            # tpath depends on it
+            h.update(str(self.pdf_dir_name).encode())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def _cache_path(self, kind):
+        """Cache file for kind, database or tpath."""
+        return self.config_path.with_suffix(f'.{APP_NAME}-{kind}-cache')
+
+    def _read_cache(self, kind):
+        """Frame cached for kind, or None if missing or stale."""
+        path = self._cache_path(kind)
+        if not path.exists():
+            return None
+        with (pa.memory_map(str(path)) if self.memory_map else pa.OSFile(str(path))) as source:
+            reader = pa.ipc.open_file(source)
+            stamp = (reader.schema.metadata or {}).get(b'archivum-fingerprint', b'')
+            if stamp.decode() != self.fingerprint():
+                return None
+            return reader.read_all().to_pandas(split_blocks=True)
+
+    def _write_cache(self, kind, df, fingerprint):
+        """Write df as the cache for kind, stamped with fingerprint; written beside and moved over."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**table.schema.metadata, b'archivum-fingerprint': fingerprint.encode()})
+        path = self._cache_path(kind)
+        # other processes may be writing it too
+        tmp = tmp_path(path)
+        try:
+            feather.write_feather(table, tmp, compression='uncompressed')
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning('Cannot write %s cache: %s', kind, e)
+
+    def _build_caches(self, kinds=('database', 'tpath')):
+        """Compute and write the caches from the feathers, without touching loaded frames."""
+        fingerprint = self.fingerprint()
+        doc = self._read_feather('doc_df', columns=['path'])
+        ans = {}
+        if 'database' in kinds:
+            ans['database'] = self._database_row_map(
+                self._read_feather('ref_df', columns=['tag', 'author']),
+                self._read_feather('ref_doc_df', columns=['tag', 'path']),
+                doc)
+        if 'tpath' in kinds:
+            ans['tpath'] = pd.DataFrame({'tpath': self._tpath(doc.path)}, dtype='str')
+        for kind, df in ans.items():
+            self._write_cache(kind, df, fingerprint)
+        return ans
+
+    def _cached(self, kind):
+        """Cached frame for kind, waiting for a background rebuild or rebuilding if stale."""
+        with self._frame_lock:
+            if self._cache_thread is not None:
+                self._cache_thread.join()
+                self._cache_thread = None
+        df = self._read_cache(kind)
+        if df is None:
+            logger.info('Rebuilding %s cache', kind)
+            df = self._build_caches((kind,))[kind]
+        return df
+
+    def warm_cache(self, background=True):
+        """
+        Rebuild stale database and tpath caches, in a background thread by default.
+
+        Call after opening a library; the first access to the database (or
+        tpath) waits for the thread.
+        """
+        kinds = tuple(k for k in ('database', 'tpath') if self._read_cache(k) is None)
+        if not kinds:
+            return
+        if background:
+            self._cache_thread = threading.Thread(
+                target=self._build_caches, args=(kinds,), name='archivum-cache', daemon=True)
+            self._cache_thread.start()
+        else:
+            self._build_caches(kinds)
+
+    def _snapshot_path(self):
+        return self.config_path.with_suffix(f'.{APP_NAME}-snapshot')
+
+    def _is_current_snapshot(self, header):
+        """True if snapshot header matches the snapshot version, the feathers and compact_dtypes."""
+        try:
+            return (header['version'] == SNAPSHOT_VERSION
+                    and header['fingerprint'] == self.fingerprint()
+                    and header['compact_dtypes'] == self.compact_dtypes)
+        except (KeyError, OSError):
+            return False
+
+    def write_snapshot(self):
+        """
+        Write the warmed state to the snapshot file, see snapshot: the resident
+        frames, the database and its row mapping, the author trie and the tag
+        index, building any that are not loaded.
+
+        Library(name) restores from it while the feathers are unchanged. Not
+        allowed with unsaved edits. Returns snapshot_info.
+        """
+        if self.is_dirty:
+            raise ValueError('Library has unsaved edits; save before writing a snapshot.')
+        database = self.database.assign(_ref=self._database_rows['ref_df'],
+                                        _doc=self._database_rows['doc_df'])
+        frames = {'ref_df': self.ref_df, 'doc_df': self.doc_df,
+                  'ref_doc_df': self.ref_doc_df, 'database': database}
+        blobs = {'trie': self.author_trie.to_bytes(),
+                 'tags': front_code(sorted(self.ref_df.tag))}
+        write_snapshot(self._snapshot_path(), frames, blobs,
+                       fingerprint=self.fingerprint(), compact_dtypes=self.compact_dtypes)
+        logger.info('Wrote snapshot %s', self._snapshot_path())
+        return self.snapshot_info()
+
+    def _restore_snapshot(self):
+        """Take the frames from the snapshot file if it is current; True if restored."""
+        path = self._snapshot_path()
+        if not path.exists():
+            return False
+        try:
+            snapshot = Snapshot(path)
+            if not self._is_current_snapshot(snapshot.header):
+                logger.info('Snapshot %s is stale, not used', path)
+                return False
+            frames = {name: snapshot.frame(name) for name in snapshot.frames}
+        except (OSError, ValueError, KeyError, pa.ArrowInvalid) as e:
+            logger.warning('Cannot read snapshot %s: %s', path, e)
+            return False
+        database = frames.pop('database')
+        for name, df in frames.items():
+            self._set_frame(name, df)
+        self._database_rows = {
+            'ref_df': database.pop('_ref').to_numpy(),
+            'doc_df': database.pop('_doc').to_numpy(),
+            'author': database['author'],
+        }
+        self._database = database
+        self._attach_querex('database', database)
+        self._snapshot = snapshot
+        logger.debug('Restored snapshot %s', path)
+        return True
+
+    def snapshot_info(self):
+        """
+        The snapshot's creation time, age and size by section (see
+        snapshot.snapshot_info), whether it is current and whether this
+        library was restored from it.
+        """
+        info = snapshot_info(self._snapshot_path())
+        if len(info):
+            info['current'] = self._is_current_snapshot(read_header(self._snapshot_path()) or {})
+            info['restored'] = self._snapshot is not None
+        return info
+
+    def _feather_path(self, name):
+        """Feather file holding frame name (ref_df, doc_df or ref_doc_df)."""
+        return self.config_path.with_suffix(f'.{APP_NAME}-{FEATHER_SUFFIXES[name]}-feather')
+
+    def _pin(self):
+        """
+        Open the feathers and read the journal, all of one generation.
+
+        Done under the shared swap lock, so no writer is moving files
+        meanwhile (see locking). Later reads go through the open files, so
+        they see this generation even after a writer replaces the files.
+        Dropped by invalidate.
+        """
+        if self._pinned is not None:
+            return
+        with self._lock.reading():
+            pinned = {}
+            for name in FRAMES:
+                path = self._feather_path(name)
+                if PIN_FILES:
+                    source = pa.memory_map(str(path)) if self.memory_map else pa.OSFile(str(path))
+                    schema = pa.ipc.open_file(source).schema
+                else:
+                    source = str(path)
+                    with pa.memory_map(source) as f:
+                        schema = pa.ipc.open_file(f).schema
+                pinned[name] = (source, path.stat(), schema)
+            self._journal_header, self._journal_records = self._journal.read()
+            self._file_generation = self._lock.generation()
+        self._pinned = pinned
+        self._journal_applied = 0
+
+    def _unpin(self):
+        # not closed: the cache thread may be reading; frames may hold views
+        self._pinned = None
+        self._journal_header = None
+        self._journal_records = []
+
+    @property
+    def stale(self):
+        """True if another process has replaced the library files since they were opened."""
+        return self._pinned is not None and self._lock.generation() != self._file_generation
+
+    def refresh(self):
+        """
+        Catch up with other processes: reopen if they replaced the files,
+        replay edits they journaled since. True if anything changed.
+        """
+        if self._pinned is None:
+            return False
+        if self.stale:
+            # reopening replays the whole journal
+            self.invalidate()
+            return True
+        _, records = self._journal.read()
+        if len(records) <= self._journal_applied:
+            return False
+        # edits change the frames the preload thread may be reading
+        self.wait_preload()
+        self._apply_records(records[self._journal_applied:])
+        return True
+
+    def _read_feather(self, name, columns=None):
+        """
+        Read columns (default all) of frame name from its feather file.
+
+        With the ``memory_map`` config option the file is memory mapped and
+        the frame's string and non-null numeric columns are zero-copy views of
+        it, so memory is the OS page cache, shared between processes. Needs
+        uncompressed files (see rewrite_feathers); compressed files still
+        load, decompressed into memory.
+        """
+        self._pin()
+        source = self._pinned[name][0]
+        if not self.memory_map:
+            df = feather.read_table(source, columns=columns, memory_map=False).to_pandas()
+        else:
+            # select after reading: read_table(columns=...) copies the columns
+            table = feather.read_table(source, memory_map=True)
+            if columns is not None:
+                table = table.select(columns)
+            # one block per column, so columns are not copied to consolidate them
+            df = table.to_pandas(split_blocks=True)
+        if self.compact_dtypes and not self._is_compact_file(name):
+            df = compact_frame(df)
+        elif not self.compact_dtypes and self._is_compact_file(name):
+            df = plain_frame(df)
+        return df
+
+    def _is_compact_file(self, name):
+        """True if the feather file of frame name was written with the compact schema."""
+        self._pin()
+        return is_compact(self._pinned[name][2])
+
+    def rewrite_feathers(self, compression='uncompressed', compact=None):
+        """
+        Rewrite the library's feather files with compression, e.g. uncompressed for memory_map.
+
+        With compact (default the ``compact_dtypes`` config option) the files
+        are converted to the compact schema, see schema. The files are written
+        beside the originals and then moved over them together, see locking.
+        Frames are dropped first, releasing any memory maps of the old files.
+        """
+        if compact is None:
+            compact = self.compact_dtypes
+        with self._lock.writer():
+            # the journal applies to the current files
+            self.compact(compression=compression)
+            self.invalidate()
+            for name in FRAMES:
+                path = self._feather_path(name)
+                tmp = path.with_name(path.name + '-tmp')
+                table = feather.read_table(path, memory_map=False)
+                if compact:
+                    write_compact(table.to_pandas(), tmp, compression=compression)
+                elif is_compact(table.schema):
+                    feather.write_feather(plain_frame(table.to_pandas()), tmp,
+                                          compression=compression)
+                else:
+                    feather.write_feather(table, tmp, compression=compression)
+            with self._lock.swapping():
+                for name in FRAMES:
+                    path = self._feather_path(name)
+                    os.replace(path.with_name(path.name + '-tmp'), path)
+            self.invalidate()
+
+    def _tpath(self, paths):
+        """Directory of each path relative to the pdf directory."""
+        pdf_dir = Path(self.pdf_dir_name)
+        # few distinct directories: make each relative once
+        relative = {}
+        ans = []
+        for d in map(os.path.dirname, paths):
+            if d not in relative:
+                relative[d] = str(Path(d).relative_to(pdf_dir))
+            ans.append(relative[d])
+        return ans
+
+    def columns(self, name):
+        """
+        All columns of frame name, resident or not, in frame order.
+
+        Read from the feather schema, so no data is loaded.
+        """
+        if name not in self._columns:
+            if name == 'database':
+                self._columns[name] = list(self._database_layout())
+            else:
+                self._pin()
+                cols = self._pinned[name][2].names
+                self._columns[name] = cols + (['tpath'] if name == 'doc_df' else [])
+        return self._columns[name]
+
+    def resident_columns(self, name):
+        """
+        Columns of frame name loaded by default; others load on demand (see load_columns).
+
+        For ref_df the ``ref_columns`` config entry if set, otherwise the
+        columns querex uses by default; plus the keys (and author) needed to
+        build the database.
+        """
+        if name == 'ref_doc_df':
+            return self.columns(name)
+        wanted = {'tag', 'path', 'author'}
+        if name == 'ref_df' and 'ref_columns' in self._config:
+            wanted.update(self._config['ref_columns'])
+        else:
+            for base_cols, bang_field, recent_field in self.querex_settings.values():
+                wanted.update(base_cols + [bang_field, recent_field])
+        return [c for c in self.columns(name) if c in wanted]
+
+    def load_columns(self, name, columns=None):
+        """
+        Make columns (default all) of frame name resident and return the frame.
+
+        Missing columns are read from the feather file (or taken from the
+        source frames for database) and inserted in frame order; unknown
+        names are ignored. Safe to call while preload runs: frames are
+        changed holding _frame_lock.
+        """
+        # waits for preload to load the frame, so before taking the lock
+        df = getattr(self, name)
+        with self._frame_lock:
+            full = self.columns(name)
+            wanted = full if columns is None else set(columns)
+            missing = [c for c in full if c in wanted and c not in df.columns]
+            if not missing:
+                return df
+            if name == 'database':
+                layout = self._database_layout()
+                for frame in ('ref_df', 'doc_df'):
+                    self.load_columns(frame, [layout[c][1] for c in missing
+                                              if layout[c][0] == frame])
+                values = {c: self._database_column(c) for c in missing}
+            elif name == 'doc_df':
+                values = self._read_feather(name, columns=[c for c in missing if c != 'tpath'])
+                if 'tpath' in missing:
+                    values['tpath'] = self._cached('tpath')['tpath']
+            else:
+                values = self._read_feather(name, columns=missing)
+            for c in missing:
+                df.insert(sum(i in df.columns for i in full[:full.index(c)]), c, values[c])
+            # the arrow copy lacks the new columns
+            self._arrow_tables.pop(name, None)
+            logger.debug('Loaded columns %s of %s', missing, name)
+            return df
+
+    def _database_layout(self):
+        """Map each database column to (source frame, source column), in merge order."""
+        ref_cols = [c for c in self.columns('ref_df') if c != 'tag']
+        doc_cols = [c for c in self.columns('doc_df') if c != 'path']
+        left = ['tag', 'path'] + ref_cols
+        layout = {'tag': ('ref_df', 'tag'), 'path': ('ref_doc_df', 'path')}
+        for c in ref_cols:
+            layout[f'{c}_x' if c in doc_cols else c] = ('ref_df', c)
+        for c in doc_cols:
+            layout[f'{c}_y' if c in left else c] = ('doc_df', c)
+        return layout
+
+    def _database_column(self, c):
+        """Values of database column c from its source frame, via the merge row mapping."""
+        frame, column = self._database_layout()[c]
+        if frame == 'ref_df' and column == 'author':
+            return self._database_rows['author']
+        values = getattr(self, frame)[column]
+        if frame == 'ref_df':
+            return values.iloc[self._database_rows['ref_df']].reset_index(drop=True)
+        # unmatched rows (-1) are missing, as in a left merge
+        values = values.reindex(self._database_rows['doc_df']).reset_index(drop=True)
+        if column in ['node', 'links', 'size']:
+            values = values.fillna(0)
+        return values
+
+    def _attach_querex(self, name, df):
+        """Attach a querex method to frame df, configured by querex_settings[name]."""
+        base_cols, bang_field, recent_field = self.querex_settings[name]
+        querex = partial(querex_work,
+                         base_cols=base_cols,
+                         bang_field=bang_field,
+                         recent_field=recent_field,
+                         debug=self.debug,
+                         result_cache=self._result_cache,
+                         cache_name=name,
+                         engine=self.query_engine,
+                         arrow_table=partial(self.arrow_table, name),
+                         value_codes=partial(self.value_codes, name),
+                         trigram_index=partial(self.trigram_index, name),
+                         recent_order=partial(self.recent_order, name),
+                         load_columns=partial(self._load_spec_columns, name),
+                         null_is_empty=self.compact_dtypes)
+        df.querex = MethodType(querex, df)
+
+    def _load_spec_columns(self, name, spec):
+        """Load the columns of frame name that query spec needs."""
+        base_cols, bang_field, recent_field = self.querex_settings[name]
+        self.load_columns(name, spec_columns(spec, self.columns(name),
+                                             base_cols, bang_field, recent_field))
+
+    def arrow_table(self, name):
+        """Return frame name (eg database, ref_df) as a pyarrow Table, converting on first use."""
+        if name not in self._arrow_tables:
+            self._arrow_tables[name] = pa.Table.from_pandas(
+                getattr(self, name), preserve_index=False)
+        return self._arrow_tables[name]
+
+    def value_codes(self, name, field):
+        """Return (codes, distinct values) of string column field of frame name, or None."""
+        key = (name, field)
+        if key not in self._value_codes:
+            self._value_codes[key] = factorize_strings(getattr(self, name)[field])
+        return self._value_codes[key]
+
+    def trigram_index(self, name, field):
+        """Return a TrigramIndex of the distinct values of field of frame name, or None."""
+        key = (name, field)
+        if key not in self._trigram_indexes:
+            factorized = self.value_codes(name, field) if field in self.trigram_fields else None
+            if factorized is None or len(factorized[1]) < self.trigram_min_values:
+                self._trigram_indexes[key] = None
+            else:
+                self._trigram_indexes[key] = TrigramIndex(factorized[1])
+        return self._trigram_indexes[key]
+
+    def recent_order(self, name):
+        """Return positions of the rows of frame name, most recent first, sorting on first use."""
+        if name not in self._recent_orders:
+            recent_field = self.querex_settings[name][2]
+            self._recent_orders[name] = sort_permutation(
+                getattr(self, name), [recent_field], [False])
+        return self._recent_orders[name]
+
+    @property
+    def sqlite(self):
+        """SQLite backend holding the library frames, see sqlite_backend."""
+        if self._sqlite is None:
+            from . sqlite_backend import SqliteBackend
+            self._sqlite = SqliteBackend(self)
+        return self._sqlite
+
+    def query_target(self, name='database'):
+        """
+        Return the object that answers querex for frame name (database, ref_df, ...).
+
+        The frame itself, or a SqlTarget with the same ``columns`` and ``querex``
+        when the library uses the sqlite query engine and has no unsaved edits.
+        """
+        if self.query_engine == 'sqlite' and not self.is_dirty:
+            return self.sqlite.target(name)
+        if name == 'database' and self.database_model == 'normalized':
+            return self.normalized
+        return getattr(self, name)
+
+    @property
+    def normalized(self):
+        """
+        The database as integer keyed refs, authors, paths and docs tables,
+        see NormalizedDatabase; answers querex without exploding columns.
+        """
+        if self._normalized is None:
+            if not self._database.empty:
+                rows = self._database[['tag', 'path']].assign(
+                    author=self._database_rows['author'],
+                    _ref=self._database_rows['ref_df'],
+                    _doc=self._database_rows['doc_df'])
+            elif self.is_dirty:
+                rows = self._database_row_map(self.ref_df, self.ref_doc_df, self.doc_df)
+            else:
+                rows = self._cached('database')
+            from . normalized import NormalizedDatabase
+            self._normalized = NormalizedDatabase(self, rows)
+        return self._normalized
+
     def save(self):
         """Save dictionary to yaml."""
         backup = self.config_path.with_suffix(f'.{APP_NAME}-config-bak')
@@ -167,9 +888,394 @@ class Library():
                            width=100,
                            indent=2
                            )
-        self._ref_df = pd.read_feather(self.config_path.with_suffix(f'.{APP_NAME}-ref-feather'))
-        self._doc_df = pd.read_feather(self.config_path.with_suffix(f'.{APP_NAME}-doc-feather'))
-        self._ref_doc_df = pd.read_feather(self.config_path.with_suffix(f'.{APP_NAME}-ref-doc-feather'))
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Discard loaded frames and cached querex results after the library changes.
+
+        Call after save, import or merge. Bumps ``generation``; frames are
+        re-read (with querex attached) on next access.
+        """
+        self.wait_preload()
+        self._ref_df = pd.DataFrame([])
+        self._doc_df = pd.DataFrame([])
+        self._ref_doc_df = pd.DataFrame([])
+        self._database = pd.DataFrame([])
+        self._database_rows = {}
+        self._columns = {}
+        self._fingerprint = None
+        self._unpin()
+        self.is_dirty = False
+        if self._sqlite is not None:
+            self._sqlite.close()
+        self._drop_derived()
+        self._open()
+
+    def _drop_derived(self):
+        """Drop everything derived from the frame contents and bump ``generation``."""
+        self._trie = None
+        self._tag_allocator = None
+        self._arrow_tables = {}
+        self._value_codes = {}
+        self._trigram_indexes = {}
+        self._recent_orders = {}
+        self._normalized = None
+        self._snapshot = None
+        self._result_cache.bump()
+
+    # incremental edits: change the frames in memory and patch the database
+    # rows of the references affected, rather than invalidate and rebuild.
+    # Each is journaled, so it is durable without rewriting the feathers
+
+    def _log_edit(self, op, args, kwargs):
+        """Append edit op to the journal, compacting once it has journal_max_records."""
+        if not self.journal or self._replaying:
+            return
+        self._journal.append({'op': op, 'args': list(args), 'kwargs': kwargs},
+                             base=self.fingerprint())
+        self._journal_applied += 1
+        if self._journal.n_records >= self.journal_max_records:
+            self.compact()
+
+    def _open(self):
+        """Open the feathers (see _pin) and replay the journal read with them."""
+        if not self._feather_path('ref_df').exists():
+            # a new library, not written yet
+            return
+        self._pin()
+        self._replay_journal()
+
+    def _replay_journal(self):
+        """Apply the journaled edits read with the feathers, see _pin."""
+        records = self._journal_records
+        if not records:
+            return
+        header = self._journal_header
+        if header is None or header.get('base') != self.fingerprint():
+            # the files were replaced without compacting: keep the edits, but not here
+            stale = self._journal.path.with_name(self._journal.path.name + '-stale')
+            logger.warning('Journal %s is for other library files, moved to %s',
+                           self._journal.path, stale)
+            with self._lock.writer():
+                os.replace(self._journal.path, stale)
+            self._journal.read()
+            self._journal_records = []
+            return
+        self._apply_records(records)
+        logger.info('Replayed %d journaled edits', len(records))
+
+    def _apply_records(self, records):
+        self._replaying = True
+        try:
+            for record in records:
+                self._journal_applied += 1
+                if record.get('op') not in JOURNALED_EDITS:
+                    logger.warning('Unknown journal edit %s ignored', record.get('op'))
+                    continue
+                try:
+                    getattr(self, record['op'])(*record['args'], **record['kwargs'])
+                except (KeyError, ValueError) as e:
+                    logger.warning('Cannot replay %s: %s', record['op'], e)
+        finally:
+            self._replaying = False
+
+    def _sync(self):
+        """Catch up with other processes before writing, under the write lock; see refresh."""
+        if self.journal:
+            self.refresh()
+
+    def _compaction_marker(self):
+        return self.config_path.with_suffix(f'.{APP_NAME}-compacting')
+
+    def compact(self, compression=None):
+        """
+        Fold the journal (and any unjournaled edits) into fresh feathers.
+
+        Under the write lock the edited frames, with every column, are
+        written beside the feathers; a marker file then records that they
+        are complete and, under the swap lock, they are moved over the
+        feathers and the journal and marker are removed. A compaction
+        interrupted after the marker is finished on the next open, before
+        that the journal is still replayed, so a kill at any point loses
+        nothing. Compression defaults to lz4, uncompressed with memory_map.
+        Returns True if anything was written.
+        """
+        with self._lock.writer():
+            self._sync()
+            if not self.is_dirty and not self._journal.exists():
+                return False
+            if compression is None:
+                compression = 'uncompressed' if self.memory_map else 'lz4'
+            for name in FRAMES:
+                df = self.load_columns(name)
+                if name == 'doc_df':
+                    # computed from path on load
+                    df = df.drop(columns='tpath', errors='ignore')
+                path = self._feather_path(name)
+                tmp = path.with_name(path.name + '-tmp')
+                if self.compact_dtypes:
+                    write_compact(df, tmp, compression=compression)
+                else:
+                    feather.write_feather(df, tmp, compression=compression)
+                fsync_file(tmp)
+            marker = self._compaction_marker()
+            tmp = marker.with_name(marker.name + '-tmp')
+            tmp.write_text(json.dumps({'frames': list(FRAMES)}))
+            fsync_file(tmp)
+            os.replace(tmp, marker)
+            self._finish_compaction()
+            logger.info('Compacted %s', self.config_path.stem)
+            self.invalidate()
+        return True
+
+    def _finish_compaction(self):
+        """Move compacted feathers into place and drop the journal, if a compaction was interrupted."""
+        marker = self._compaction_marker()
+        if not marker.exists():
+            return
+        # another process may be compacting: wait, then look again
+        with self._lock.writer():
+            if not marker.exists():
+                return
+            with self._lock.swapping():
+                for name in json.loads(marker.read_text())['frames']:
+                    path = self._feather_path(name)
+                    tmp = path.with_name(path.name + '-tmp')
+                    if tmp.exists():
+                        os.replace(tmp, path)
+                self._journal.remove()
+                marker.unlink()
+
+    def _editable(self, name):
+        """Frame name with every column resident, as edits replace whole rows."""
+        return self.load_columns(name)
+
+    def _set_frame(self, name, df):
+        df = df.reset_index(drop=True)
+        setattr(self, f'_{name}', df)
+        self._attach_querex(name, df)
+
+    def _new_rows(self, name, rows):
+        """
+        rows (a DataFrame, dict or list of dicts) as a frame with the columns
+        and dtypes of frame name.
+
+        Missing columns, and the values rows leave out of a column others
+        give, are filled with '', 0, False or NaT by dtype, or null for
+        compact columns (see schema); tpath is computed from path. Unknown
+        columns raise ValueError.
+        """
+        df = self._editable(name)
+        new = pd.DataFrame([rows] if isinstance(rows, dict) else rows)
+        unknown = set(new.columns) - set(df.columns)
+        if unknown:
+            raise ValueError(f'Unknown {name} columns {sorted(unknown)}')
+        n = len(new)
+        out = {}
+        for c in df.columns:
+            dtype = df[c].dtype
+            if isinstance(dtype, (pd.CategoricalDtype, pd.api.extensions.ExtensionDtype)) \
+                    and not isinstance(dtype, pd.StringDtype):
+                missing = None
+            elif pd.api.types.is_bool_dtype(dtype):
+                missing = False
+            elif pd.api.types.is_numeric_dtype(dtype):
+                missing = 0
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                missing = pd.NaT
+            else:
+                missing = ''
+            if c in new:
+                values = new[c]
+                if missing is not None:
+                    values = values.astype(object).where(values.notna(), missing)
+                values = values.to_numpy()
+            elif c == 'tpath' and 'path' in new:
+                values = self._tpath(new['path'])
+            else:
+                values = [missing] * n
+            if self.compact_dtypes:
+                values = compact_column(c, pd.Series(values))
+            out[c] = conform(values, dtype)
+            if out[c].dtype != dtype:
+                # new categories
+                df[c] = df[c].astype(out[c].dtype)
+        return pd.DataFrame(out)
+
+    def _linked_tags(self, paths):
+        """Tags of the references linked to any of paths."""
+        ref_doc = self.ref_doc_df
+        return set(ref_doc.tag[ref_doc.path.isin(paths)])
+
+    def _patch_database(self, tags, ref_map=None, doc_map=None):
+        """
+        Update the database after an edit of the source frames.
+
+        The rows of references with tags are recomputed, exploding and
+        merging just those references. Other rows are kept; ref_map and
+        doc_map give the new position of each old ref_df and doc_df row (-1
+        if removed, None if positions are unchanged). Rows stay in ref_df
+        order, so the result equals a full rebuild.
+        """
+        self.is_dirty = True
+        self._drop_derived()
+        if self._database.empty:
+            # built from the edited frames on next access
+            return
+        rows = self._database_rows
+        ref_pos = rows['ref_df'] if ref_map is None else ref_map[rows['ref_df']]
+        doc_pos = rows['doc_df'] if doc_map is None else np.append(doc_map, -1)[rows['doc_df']]
+        ref = self.ref_df
+        changed = np.flatnonzero(ref.tag.isin(tags).to_numpy())
+        keep = np.flatnonzero((ref_pos >= 0) & ~np.isin(ref_pos, changed))
+        new = self._database_row_map(ref.iloc[changed], self.ref_doc_df, self.doc_df)
+        old = pd.DataFrame({
+            'tag': self._database['tag'].iloc[keep].reset_index(drop=True),
+            'path': self._database['path'].iloc[keep].reset_index(drop=True),
+            'author': rows['author'].iloc[keep].reset_index(drop=True),
+            '_ref': ref_pos[keep],
+            '_doc': doc_pos[keep],
+        })
+        both = pd.concat([old, new], ignore_index=True) if len(new) else old
+        # references occupy contiguous blocks of rows, in ref_df order
+        order = np.argsort(both['_ref'].to_numpy(), kind='stable')
+        self._set_database(both.iloc[order].reset_index(drop=True),
+                           columns=list(self._database.columns))
+        logger.debug('Patched database: %d rows kept, %d recomputed', len(keep), len(new))
+
+    @_journaled
+    def add_references(self, refs):
+        """
+        Add references (a DataFrame, dict or list of dicts of ref_df columns).
+
+        Tags must be new. The edit is made in memory (see is_dirty) and
+        journaled; compact writes it to the feathers.
+        """
+        ref = self._editable('ref_df')
+        new = self._new_rows('ref_df', refs)
+        # isin is slow for many values: look the few new tags up in ref
+        clash = set(new.tag[new.tag.duplicated()]) | set(ref.tag[ref.tag.isin(new.tag)])
+        if clash:
+            raise ValueError(f'Duplicate tags {sorted(set(clash))}')
+        self._set_frame('ref_df', pd.concat([ref, new], ignore_index=True))
+        self._patch_database(set(new.tag))
+
+    @_journaled
+    def update_reference(self, tag, /, **values):
+        """Set columns of reference tag; renaming the tag moves its links too."""
+        ref = self._editable('ref_df')
+        pos = np.flatnonzero((ref.tag == tag).to_numpy())
+        if len(pos) == 0:
+            raise KeyError(tag)
+        new_tag = values.get('tag', tag)
+        if new_tag != tag and (ref.tag == new_tag).any():
+            raise ValueError(f'Duplicate tag {new_tag}')
+        row = ref.iloc[pos[0]].to_dict()
+        row.update(values)
+        new = self._new_rows('ref_df', row)
+        ref = ref.copy()
+        ref.iloc[pos[0]] = new.iloc[0]
+        self._set_frame('ref_df', ref)
+        if new_tag != tag:
+            ref_doc = self.ref_doc_df.copy()
+            ref_doc.loc[ref_doc.tag == tag, 'tag'] = new_tag
+            self._set_frame('ref_doc_df', ref_doc)
+        self._patch_database({tag, new_tag})
+
+    @_journaled
+    def remove_references(self, tags):
+        """Remove references with tags and their links; documents are kept."""
+        ref = self._editable('ref_df')
+        drop = ref.tag.isin(tags).to_numpy()
+        ref_map = np.where(drop, -1, np.cumsum(~drop) - 1)
+        self._set_frame('ref_df', ref[~drop])
+        ref_doc = self.ref_doc_df
+        self._set_frame('ref_doc_df', ref_doc[~ref_doc.tag.isin(tags)])
+        self._patch_database(set(), ref_map=ref_map)
+
+    @_journaled
+    def add_documents(self, docs):
+        """Add documents (a DataFrame, dict or list of dicts of doc_df columns)."""
+        doc = self._editable('doc_df')
+        new = self._new_rows('doc_df', docs)
+        self._set_frame('doc_df', pd.concat([doc, new], ignore_index=True))
+        # links may already name the new paths
+        self._patch_database(self._linked_tags(new.path))
+
+    @_journaled
+    def update_document(self, path, /, **values):
+        """Set columns of the document at path; a new path moves its links too."""
+        doc = self._editable('doc_df')
+        pos = np.flatnonzero((doc.path == path).to_numpy())
+        if len(pos) == 0:
+            raise KeyError(path)
+        new_path = values.get('path', path)
+        row = doc.iloc[pos[0]].to_dict()
+        row.update(values)
+        if new_path != path and 'tpath' not in values:
+            row['tpath'] = self._tpath([new_path])[0]
+        new = self._new_rows('doc_df', row)
+        doc = doc.copy()
+        doc.iloc[pos[0]] = new.iloc[0]
+        self._set_frame('doc_df', doc)
+        tags = self._linked_tags([path, new_path])
+        if new_path != path:
+            ref_doc = self.ref_doc_df.copy()
+            ref_doc.loc[ref_doc.path == path, 'path'] = new_path
+            self._set_frame('ref_doc_df', ref_doc)
+        self._patch_database(tags)
+
+    @_journaled
+    def remove_documents(self, paths):
+        """Remove documents at paths and their links."""
+        doc = self._editable('doc_df')
+        drop = doc.path.isin(paths).to_numpy()
+        doc_map = np.where(drop, -1, np.cumsum(~drop) - 1)
+        tags = self._linked_tags(paths)
+        self._set_frame('doc_df', doc[~drop])
+        ref_doc = self.ref_doc_df
+        self._set_frame('ref_doc_df', ref_doc[~ref_doc.path.isin(paths)])
+        self._patch_database(tags, doc_map=doc_map)
+
+    @_journaled
+    def link(self, tag, path):
+        """Link reference tag to the document at path."""
+        ref_doc = self.ref_doc_df
+        new = pd.DataFrame({'tag': [tag], 'path': [path]}).astype(ref_doc.dtypes.to_dict())
+        self._set_frame('ref_doc_df', pd.concat([ref_doc, new], ignore_index=True))
+        self._patch_database({tag})
+
+    @_journaled
+    def unlink(self, tag, path):
+        """Remove the links between reference tag and the document at path."""
+        ref_doc = self.ref_doc_df
+        self._set_frame('ref_doc_df', ref_doc[~((ref_doc.tag == tag) & (ref_doc.path == path))])
+        self._patch_database({tag})
+
+    def rebuilt_database(self):
+        """
+        The database rebuilt in full from the frames in memory, with the
+        columns of the current database; to check the incremental edits.
+        """
+        columns = list(self.database.columns)
+        rows = self._database_row_map(self.ref_df, self.ref_doc_df, self.doc_df)
+        saved = self._database, self._database_rows
+        try:
+            self._set_database(rows, columns=columns)
+            return self._database
+        finally:
+            self._database, self._database_rows = saved
+
+    @property
+    def generation(self):
+        """Counter bumped whenever the underlying frames change."""
+        return self._result_cache.generation
+
+    @property
+    def result_cache_info(self):
+        """Statistics for the querex result cache."""
+        return self._result_cache.info()
 
     def __getattr__(self, name):
         """Provide access to config yaml dictionary."""
@@ -207,12 +1313,17 @@ class Library():
         """Run ``expr`` through the querier."""
         self._last_query_expr = expr
         try:
-            self._last_query = self.database.querex(expr)
-            self._last_unrestricted = getattr(self.database, "qx_unrestricted_len", -1)
+            self._last_query = self.query_target('database').querex(expr)
+            self._last_unrestricted = getattr(self._last_query, "qx_unrestricted_len", -1)
         except ValueError:
             return None
         return self._last_query
 
+    @property
+    def spec_cache_info(self):
+        """Hit and miss counters of the (process-wide) parsed query spec cache."""
+        return spec_cache_info()
+
     @staticmethod
     def querex_help():
         """Print help for query syntax."""
@@ -221,7 +1332,7 @@ class Library():
     def distinct(self, c):
         """Return distinct occurrences of col c."""
         # database is fully exploded so this is OK:
-        return sorted(set([i for i in self.database[c] if i != '']))
+        return sorted(set([i for i in self.load_columns('database', [c])[c].dropna() if i != '']))
         # if c == 'author':
         #     return sorted(
         #         set(author.strip() for s in self.database.author.dropna() for author in s.split(" and "))
@@ -236,7 +1347,7 @@ class Library():
     @staticmethod
     def get_library_path_list():
         """Get a list of available libraries (no suffix) as list of Paths (see also ``list``)."""
-        return list(BASE_DIR.glob(f'*.{APP_NAME}-config'))
+        return library_config_paths()
 
     @staticmethod
     def list():
@@ -245,27 +1356,42 @@ class Library():
         return [f.name for f in Library.get_library_path_list()]
 
     @staticmethod
-    def list_deets():
-        """Dataframe of all projects in default location."""
-        # not sure what the best "way around" is for this...
-        df = pd.concat(
-            [Library(p).config_df for p in Library.get_library_path_list()],
-            axis=1).T.fillna('')
-        df = df[['name', 'description', 'bibtex_file', 'pdf_dir_name', 'text_dir_name', 'extractor', ]]
-        df = df.reset_index(drop=True)
+    def list_deets(workers=8):
+        """
+        Dataframe of all projects in default location: config details, row
+        counts and file sizes, see library_details. Libraries are not opened;
+        workers threads scan them in parallel.
+        """
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(library_details, Library.get_library_path_list()))
+        config_cols = ['name', 'description', 'bibtex_file', 'pdf_dir_name', 'text_dir_name',
+                       'extractor']
+        counts = list(ROW_COUNT_COLUMNS.values())
+        df = pd.DataFrame(rows).reindex(columns=config_cols + counts + ['size_mb', 'modified'])
+        df[config_cols] = df[config_cols].fillna('')
+        df[counts] = df[counts].astype('Int64')
         return df
 
+    @property
+    def author_trie(self):
+        """Trie of the distinct authors, from the snapshot if restored, for to_name_ex."""
+        self.wait_preload('author_trie')
+        if self._trie is None:
+            if self._snapshot is not None:
+                self._trie = Trie.from_bytes(self._snapshot.blob('trie'))
+            else:
+                self._trie = Trie()
+                for a in self.distinct('author'):
+                    self._trie.insert(a)
+        return self._trie
+
     def to_name_ex(self, name, strict=False):
         """Extend name to longest match using a Trie; in strict mode adds as key if missing."""
-        if self._trie is None:
-            authors = self.distinct('author')
-            self._trie = Trie()
-            for a in authors:
-                self._trie.insert(a)
-        if not self._trie.has_key(name) and strict:
+        trie = self.author_trie
+        if not trie.has_key(name) and strict:
             # print(f'{name} is not a key...adding')
-            self._trie.insert(name)
-        name_ex = self._trie.longest_unique_completion(name, strict)
+            trie.insert(name)
+        name_ex = trie.longest_unique_completion(name, strict)
         return name_ex
 
     def stats(self):
@@ -298,12 +1424,15 @@ class Library():
     def distinct_values_by_field(self):
         """Statistics on distinct values by field."""
         ans = {}
-        for c in self.ref_df.columns:
-            vc = self.ref_df[c].value_counts()
+        ref_df = self.load_columns('ref_df')
+        for c in ref_df.columns:
+            vc = ref_df[c].value_counts()
+            # compact frames hold nulls rather than ''
+            nulls = int(ref_df[c].isna().sum())
             if c == 'arc-citations':
-                ans[c] = [len(vc), vc.get(0, 0)]
+                ans[c] = [len(vc) + (nulls > 0), vc.get(0, 0) + nulls]
             else:
-                ans[c] = [len(vc), vc.get('', 0)]
+                ans[c] = [len(vc) + (nulls > 0), vc.get('', 0) + nulls]
 
         stats = pd.DataFrame(ans.values(),
                              columns=[ 'distinct', 'missing'],
@@ -315,8 +1444,8 @@ class Library():
     def distinct_value_counts(self, field):
         """Return the top 20 distinct value counts for field."""
         return (None
-                if field not in self.database else
-                    self.database[field]
+                if field not in self.columns('database') else
+                    self.load_columns('database', [field])[field]
                         .value_counts()
                         .to_frame('count')
                         .sort_values('count', ascending=False)
@@ -343,13 +1472,12 @@ class Library():
 
     @property
     def tag_allocator(self):
-        """Return the loaded key allocator for tag generation."""
+        """Return the loaded key allocator for tag generation, seeded with the existing tags."""
+        if self._tag_allocator is None and self._snapshot is not None:
+            self._tag_allocator = TagAllocator(front_decode(self._snapshot.blob('tags')))
         if self._tag_allocator is None:
-            # force build of database
-            # TODO: should database normalize on editor too??
-            d = self.database
-            names = set(d.author)
-            self._tag_allocator = TagAllocator(names)
+            # new tags must not collide with those of the references
+            self._tag_allocator = TagAllocator(set(self.ref_df.tag))
         return self._tag_allocator
 
     def get_new_documents(self, directory, meta, recursive):
@@ -370,6 +1498,8 @@ class Library():
         else:
             pdfs = directory.glob('*.pdf')
         pdfs = sorted(pdfs)
+        # pymupdf and pypdf are slow to import and only needed here
+        from . document import Document
         dfs = pd.DataFrame({
             'Document': [Document(p, self) for p in pdfs],
             'file_name': [d.name for d in pdfs],
@@ -0,0 +1,127 @@
+"""
+Locks and generation number coordinating processes sharing a library.
+
+Feathers are only ever replaced whole: written beside and moved over with
+``os.replace``. Two advisory locks, on files next to the config, order the
+replacing:
+
+    write lock  exclusive, held by a writer for a whole edit or compaction
+                so writers take turns
+    swap lock   exclusive while a writer moves new feathers into place and
+                removes the journal; shared while a reader opens the
+                feathers and reads the journal
+
+Each swap bumps the generation number. A reader holds the shared lock only
+while opening the files (see ``Library._pin``) and then reads through its
+open handles, which keep the files it opened, so readers never wait on a
+long-running reader and see one generation however late they read a column.
+Writers compare the generation with the one they opened to notice changes
+by other processes.
+
+On POSIX the locks are ``flock`` locks; on Windows ``msvcrt`` byte locks,
+where shared locks are exclusive. Locks are reentrant within a LibraryLock.
+"""
+
+from contextlib import contextmanager
+import os
+from pathlib import Path
+import threading
+
+try:
+    import fcntl
+except ImportError:                                  # Windows
+    fcntl = None
+    import msvcrt
+
+from . import APP_NAME
+
+
+def tmp_path(path):
+    """Temporary file beside path, for writing and then moving over it; unique per process and thread."""
+    path = Path(path)
+    return path.with_name(f'{path.name}-{os.getpid()}-{threading.get_ident()}-tmp')
+
+
+class _FileLock():
+    """Reentrant advisory lock on file path, shared or exclusive."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+        self._depth = 0
+        self._exclusive = False
+        # the same lock object may be used from the cache thread
+        self._mutex = threading.RLock()
+
+    def _acquire(self, exclusive):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _release(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def hold(self, exclusive):
+        with self._mutex:
+            if self._depth == 0:
+                self._file = self.path.open('a+b')
+                self._acquire(exclusive)
+                self._exclusive = exclusive
+            elif exclusive and not self._exclusive:
+                raise RuntimeError(f'Cannot upgrade shared lock on {self.path}')
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+                    self._file.close()
+                    self._file = None
+
+
+class LibraryLock():
+    """Write and swap locks and the generation number of the library with config_path."""
+
+    def __init__(self, config_path):
+        config_path = Path(config_path)
+        self._write = _FileLock(config_path.with_suffix(f'.{APP_NAME}-write-lock'))
+        self._swap = _FileLock(config_path.with_suffix(f'.{APP_NAME}-lock'))
+        self.generation_path = config_path.with_suffix(f'.{APP_NAME}-generation')
+
+    def writer(self):
+        """Context: the exclusive write lock, held for a whole edit or compaction."""
+        return self._write.hold(True)
+
+    def reading(self):
+        """Context: the shared swap lock, held while opening the files of one generation."""
+        return self._swap.hold(False)
+
+    @contextmanager
+    def swapping(self):
+        """Context: the exclusive swap lock, for replacing files; bumps the generation."""
+        with self._swap.hold(True):
+            try:
+                yield
+            finally:
+                # also if interrupted: some files may have moved
+                self._bump()
+
+    def generation(self):
+        """Generation number: how many times the library files have been swapped."""
+        try:
+            return int(self.generation_path.read_text() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _bump(self):
+        tmp = self.generation_path.with_name(self.generation_path.name + '-tmp')
+        tmp.write_text(str(self.generation() + 1))
+        os.replace(tmp, self.generation_path)
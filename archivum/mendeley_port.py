@@ -14,6 +14,7 @@ import numpy as np
 import pandas as pd
 
 from . import BASE_DIR
+from . schema import write_compact
 from . trie import Trie
 from . utilities import remove_accents, accent_mapper_dict, safe_int, TagAllocator
 
@@ -792,10 +793,13 @@ class Bib2df():
             ans[str(Path(p).relative_to('c:').as_posix())] = h
         self._doc_df['hash'] = self.doc_df['path'].replace(ans)
 
-    def create_library(self, lib_name=''):
-        """Save the files to the Lirbary."""
+    def create_library(self, lib_name='', compact=False):
+        """Save the files to the Lirbary, in the compact schema if compact (see schema)."""
         if lib_name == '':
             lib_name = 'uber-library'
-        self.ref_df.to_feather(BASE_DIR / (lib_name + '.archivum-ref-feather'))
-        self.doc_df.to_feather(BASE_DIR / (lib_name + '.archivum-doc-feather'))
-        self.ref_doc_df.to_feather(BASE_DIR / (lib_name + '.archivum-ref-doc-feather'))
+        for df, suffix in ((self.ref_df, 'ref'), (self.doc_df, 'doc'), (self.ref_doc_df, 'ref-doc')):
+            path = BASE_DIR / f'{lib_name}.archivum-{suffix}-feather'
+            if compact:
+                write_compact(df, path)
+            else:
+                df.to_feather(path)
@@ -0,0 +1,276 @@
+"""
+Normalized, integer keyed model of the library database.
+
+The exploded ``database`` frame repeats every reference and document column
+once per author (and link). Here the same rows are kept as integer keys into
+small tables:
+
+    refs        ref_df, one row per reference
+    authors     distinct author names
+    ref_author  bridge, one row per (reference, author) pair of ids
+    paths       distinct linked paths
+    docs        doc_df, one row per document
+
+Database row i is ref_author row pair[i], paths[path[i]] and docs[doc[i]];
+its reference and author are refs and authors at the ids in that bridge row.
+-1 stands for no author, link or document.
+
+Querex is answered from the tables: each regex, and each term of a plain
+``column op literal`` where clause, is evaluated once per table row. Reference
+and author hits are joined on ids through the bridge (author ids or ref ids
+to bridge rows) and then to database rows through pair; path and document
+hits through path and doc; only the sort columns of the surviving rows and the
+selected columns of the returned rows are gathered. Where clauses that are not
+plain terms (``mod.dt.day == 13``, ``or``) materialize just the columns they
+name over all rows. Results are identical to ``database.querex``.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from . parser import cached_parser, normalize_query, split_where
+from . querex import (select_fields, where_columns, where_mask, decorate_result,
+                      factorize_strings, _sorted_positions, contains, check_cancel)
+from . trigram import TrigramIndex
+
+# key of the table each database column comes from, by source frame
+_TABLES = {'ref_df': 'ref', 'ref_doc_df': 'path', 'doc_df': 'doc'}
+
+
+class NormalizedDatabase():
+    """Integer keyed refs, authors, paths and docs tables answering database querex."""
+
+    # columns the database fills with 0 for rows without a document
+    fill_zero = ['node', 'links', 'size']
+
+    def __init__(self, lib, rows):
+        """
+        Build from library lib and its database row mapping rows (see
+        ``Library._database_row_map``).
+        """
+        self.lib = lib
+        self.doc = rows['_doc'].to_numpy(dtype=np.int32)
+        author, uniques = pd.factorize(rows['author'])
+        self.authors = pd.Series(uniques, dtype=rows['author'].dtype, name='author')
+        codes, uniques = pd.factorize(rows['path'])
+        self.path = codes.astype(np.int32)
+        self.paths = pd.Series(uniques, dtype=rows['path'].dtype, name='path')
+        # distinct (ref, author) pairs, author -1 for none, in row order
+        n = len(self.authors) + 1
+        pair, keys = pd.factorize(rows['_ref'].to_numpy(dtype=np.int64) * n + author + 1)
+        self.pair = pair.astype(np.int32)
+        self.ref_author = pd.DataFrame({'ref': (keys // n).astype(np.int32),
+                                        'author': (keys % n - 1).astype(np.int32)})
+        self.layout = lib._database_layout()
+        # (table, frame with the null row if needed) and factorized columns
+        self._frames = {}
+        self._codes = {}
+        self._trigrams = {}
+
+    def __len__(self):
+        return len(self.pair)
+
+    @property
+    def columns(self):
+        return pd.Index(self.lib.columns('database'))
+
+    @property
+    def nbytes(self):
+        """Memory used by the keys, the authors and paths tables and the bridge."""
+        return (self.pair.nbytes + self.doc.nbytes + self.path.nbytes
+                + int(self.authors.memory_usage(deep=True))
+                + int(self.paths.memory_usage(deep=True))
+                + int(self.ref_author.memory_usage(deep=True).sum()))
+
+    def _source(self, c):
+        """(table, source column) of database column c."""
+        frame, column = self.layout[c]
+        if frame == 'ref_df' and column == 'author':
+            return 'author', column
+        return _TABLES[frame], column
+
+    def _key(self, table):
+        """Table row of each database row (ref and author via the bridge) or bridge row."""
+        if table in ('ref', 'author'):
+            return self.ref_author[table].to_numpy()
+        return getattr(self, table)
+
+    def _table(self, table, columns):
+        """
+        Frame of the database columns (all from table) with one row per table
+        row, plus a missing row (key -1) if any database row lacks one, so the
+        values and dtypes are those of the exploded database.
+        """
+        if table == 'ref':
+            src = self.lib.load_columns('ref_df', [self.layout[c][1] for c in columns])
+        elif table == 'doc':
+            src = self.lib.load_columns('doc_df', [self.layout[c][1] for c in columns])
+        else:
+            src = pd.DataFrame({table: getattr(self, f'{table}s')})
+        positions = np.arange(len(src))
+        if (self._key(table) < 0).any():
+            positions = np.append(positions, -1)
+        out = {}
+        for c in columns:
+            values = src[self.layout[c][1] if table in ('ref', 'doc') else table]
+            values = values.reindex(positions).reset_index(drop=True)
+            if table == 'doc' and self.layout[c][1] in self.fill_zero:
+                values = values.fillna(0)
+            out[c] = values
+        return pd.DataFrame(out, index=pd.RangeIndex(len(positions)))
+
+    def _table_column(self, c):
+        if c not in self._frames:
+            table, _ = self._source(c)
+            self._frames[c] = self._table(table, [c])[c]
+        return self._frames[c]
+
+    def _table_rows(self, table):
+        """Table row of each path or doc key, or bridge row for ref and author; -1 is the missing row."""
+        key = self._key(table)
+        n = len(self.refs if table == 'ref' else self.docs if table == 'doc'
+                else getattr(self, f'{table}s'))
+        return np.where(key < 0, n, key)
+
+    def _lookup(self, table, pos=None):
+        """Table row of database rows pos (default all), the missing row for -1."""
+        rows = self._table_rows(table)
+        if table in ('ref', 'author'):
+            # join through the bridge
+            return rows[self.pair if pos is None else self.pair[pos]]
+        return rows if pos is None else rows[pos]
+
+    def _hit_rows(self, table, hit, pos=None):
+        """
+        Database rows pos (default all) whose table row passes hit, one per
+        table row and the missing row. Reference and author hits go to
+        bridge rows first, so each is looked up once per pair.
+        """
+        if table in ('ref', 'author'):
+            hit = hit[self._table_rows(table)]
+            return hit[self.pair if pos is None else self.pair[pos]]
+        return hit[self._lookup(table, pos)]
+
+    @property
+    def refs(self):
+        return self.lib.ref_df
+
+    @property
+    def docs(self):
+        return self.lib.doc_df
+
+    def column(self, c, pos=None):
+        """Database column c at row positions pos (default all), as in the exploded database."""
+        if c not in self.layout:
+            raise KeyError(c)
+        table, _ = self._source(c)
+        values = self._table_column(c)
+        return values.iloc[self._lookup(table, pos)].reset_index(drop=True)
+
+    def frame(self, columns, pos=None):
+        """Database columns at row positions pos, indexed by position."""
+        index = np.arange(len(self)) if pos is None else pos
+        df = pd.DataFrame({c: self.column(c, pos) for c in columns})
+        df.index = index
+        return df
+
+    def _where_mask(self, where, cancel=None):
+        """Boolean mask of all database rows passing where; cancel as in where_mask."""
+        try:
+            terms = split_where(where)
+        except ValueError:
+            terms = None
+        columns = where_columns(where, self.columns)
+        if terms is None or any(ident not in self.layout for ident, _, _ in terms):
+            # materialize just the named columns of the exploded view
+            return where_mask(self.frame(columns), where, cancel)
+        mask = np.ones(len(self), dtype=bool)
+        for ident, op, value in terms:
+            table, _ = self._source(ident)
+            hit = where_mask(self._table(table, [ident]), f'{ident} {op} {value}', cancel)
+            mask &= self._hit_rows(table, hit)
+        return mask
+
+    def _regex_hit(self, field, pattern, cancel=None):
+        """Boolean hit for each row of field's table (and the missing row)."""
+        values = self._table_column(field)
+        if field not in self._codes:
+            self._codes[field] = factorize_strings(values)
+        factorized = self._codes[field]
+        if factorized is None:
+            return contains(values.astype(str), pattern, cancel) & values.notna().to_numpy()
+        codes, uniques = factorized
+        if field not in self._trigrams:
+            self._trigrams[field] = (
+                TrigramIndex(uniques) if field in self.lib.trigram_fields
+                and len(uniques) >= self.lib.trigram_min_values else None)
+        index = self._trigrams[field]
+        cand = index.candidates(pattern) if index is not None else None
+        if cand is None:
+            hit = contains(pd.Series(uniques), pattern, cancel)
+        else:
+            hit = np.zeros(len(uniques), dtype=bool)
+            hit[cand] = contains(pd.Series(uniques[cand]), pattern, cancel)
+        return np.append(hit, False)[codes]
+
+    def positions(self, spec, bang_field, recent_field, cancel=None):
+        """
+        (Ordered positions of the database rows selected by spec, unrestricted count).
+
+        The positions are truncated to top n when set. cancel is an optional
+        threading.Event, see querex_work.
+        """
+        if spec['where']:
+            pos = np.flatnonzero(self._where_mask(spec['where'], cancel))
+        else:
+            pos = np.arange(len(self))
+        for field, pattern in spec['regex']:
+            if field == 'BANG':
+                field = bang_field
+            if field not in self.layout:
+                raise ValueError(f"Unknown field for regex filtering: '{field}'")
+            check_cancel(cancel)
+            try:
+                hit = self._regex_hit(field, pattern, cancel)
+            except re.error:
+                print(f'Regular expression error with {pattern}...ignoring.')
+                continue
+            table, _ = self._source(field)
+            pos = pos[self._hit_rows(table, hit, pos)]
+        unrestricted = len(pos)
+        check_cancel(cancel)
+
+        top_n = spec['top']
+        if 'recent' in spec['flags']:
+            by, ascending = [recent_field], [False]
+        else:
+            by, ascending = [i[0] for i in spec['sort']], [i[1] for i in spec['sort']]
+        if by:
+            for c in by:
+                if c not in self.layout:
+                    raise KeyError(c)
+            keys = self.frame(list(dict.fromkeys(by)), pos)
+            keys.index = pd.RangeIndex(len(pos))
+            pos = pos[_sorted_positions(keys, np.arange(len(pos)), by, ascending, top_n)]
+        if top_n > 0:
+            pos = pos[:top_n]
+        return pos, unrestricted
+
+    def querex(self, expr, cancel=None):
+        """Querex expr, with the same result as ``lib.database.querex(expr)``."""
+        expr = expr.strip()
+        cache = self.lib._result_cache
+        key = ('database', cache.generation, normalize_query(expr))
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        spec = cached_parser(expr)
+        base_cols, bang_field, recent_field = self.lib.querex_settings['database']
+        pos, unrestricted = self.positions(spec, bang_field, recent_field, cancel)
+        fields = select_fields(self.columns, spec, base_cols, recent_field)
+        df = decorate_result(self.frame(fields, pos), expr, spec['top'], unrestricted,
+                             null_is_empty=self.lib.compact_dtypes)
+        cache.put(key, df)
+        return df
@@ -0,0 +1,121 @@
+"""
+Paged view of query results in the REPL.
+
+fGT formats every row it is given, so printing an unrestricted query over
+the database takes seconds and scrolls the terminal for minutes. A
+ResultPager keeps the result frame and the row positions of the view (no
+formatted copy) and formats one page of rows, through fGT, only when that
+page is shown. Time to the first screen depends on the page size, not on the
+size of the result.
+
+In ``query-library``, after a result longer than a page:
+
+    n or PageDown     next page
+    p or PageUp       previous page
+    g N               page with row N (1 based); g end for the last page
+"""
+
+import numpy as np
+
+# rows formatted a page
+PAGE_SIZE = 25
+
+
+class ResultPager():
+    """
+    Window of page_size rows over result frame df, formatted on demand.
+
+    The rows are held as positions into df, in display order.
+    """
+
+    def __init__(self, df, page_size=PAGE_SIZE):
+        self.df = df
+        self.positions = np.arange(len(df))
+        self.page_size = max(1, int(page_size))
+        self.start = 0
+        self.caption = getattr(df, 'gt_caption', '')
+        # rows matching before top n cut the result
+        self.matches = getattr(df, 'qx_unrestricted_len', len(df))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __repr__(self):
+        return f'ResultPager({len(self)} rows, page {self.page + 1} of {self.pages})'
+
+    @property
+    def pages(self):
+        """Number of pages, at least 1."""
+        return max(1, -(-len(self) // self.page_size))
+
+    @property
+    def page(self):
+        """Current page, 0 based."""
+        return self.start // self.page_size
+
+    @property
+    def paged(self):
+        """True if the rows do not fit on one page."""
+        return len(self) > self.page_size
+
+    def window(self):
+        """Rows of the current page as a frame: only these are formatted."""
+        return self.df.iloc[self.positions[self.start:self.start + self.page_size]]
+
+    def goto(self, page):
+        """Move to page (0 based, clipped to the pages); return the page."""
+        self.start = min(max(0, page), self.pages - 1) * self.page_size
+        return self.page
+
+    def next(self):
+        """Move to the next page; False if already on the last."""
+        return self.page != self.goto(self.page + 1)
+
+    def prev(self):
+        """Move to the previous page; False if already on the first."""
+        return self.page != self.goto(self.page - 1)
+
+    def jump(self, row):
+        """Move to the page containing row (0 based)."""
+        return self.goto(row // self.page_size)
+
+    def footer(self):
+        """
+        Which rows are shown, the matches if top n cut the result, and the
+        paging keys if there are other pages.
+        """
+        end = min(self.start + self.page_size, len(self))
+        ans = f'Rows {min(self.start + 1, end):,d}-{end:,d} of {len(self):,d}'
+        if self.matches > len(self):
+            ans += f' ({self.matches:,d} matches)'
+        if self.paged:
+            ans += (f', page {self.page + 1:,d} of {self.pages:,d}. '
+                    'n/PageDown next, p/PageUp previous, g N row N, g end.')
+        return ans
+
+    def render(self, formatter=None):
+        """The current page formatted by formatter (default fGT), with the result caption."""
+        if formatter is None:
+            from . utilities import fGT as formatter
+        return formatter(self.window(), caption=self.caption)
+
+    def command(self, expr):
+        """
+        Apply paging command expr (n, p, g N, g end); return True if expr is
+        one, else False (so it is a query).
+        """
+        words = expr.strip().lower().split()
+        if words in (['n'], ['next']):
+            self.next()
+        elif words in (['p'], ['prev']):
+            self.prev()
+        elif len(words) == 2 and words[0] == 'g':
+            if words[1] == 'end':
+                self.goto(self.pages - 1)
+            elif words[1].isdigit():
+                self.jump(int(words[1]) - 1)
+            else:
+                return False
+        else:
+            return False
+        return True
@@ -1,53 +1,76 @@
 """My version of Gemini's version of lark parser."""
 
+from functools import lru_cache
 from pathlib import Path
 from pprint import pprint
 import re
+from types import MappingProxyType
 
 from lark import Lark, Transformer, v_args, Tree
 
-# choice has minimal impact on speed for test cases
-PARSER = 'lalr'
+# lalr is built once from a serialized cache, earley kept for comparison;
+# the grammar's terminal priorities make the two agree on the test cases
 PARSER = 'earley'
+PARSER = 'lalr'
 GRAMMAR_FILE = Path(__file__).parent / "arc_grammar.lark"
+# lark only caches lalr parsers; the file embeds a hash of the grammar
+# and options and is rebuilt automatically when either changes
+GRAMMAR_CACHE_FILE = Path(__file__).parent / "arc_grammar.lark-cache"
+
+QUEREX_TEST_CASES = [
+    '',
+    'top 4',
+    'recent',
+    'recent top 3',
+    'verbose recent top 17',
+    'select *',
+    'top 10 select *',
+    'where year == 2024',
+    'where year == "2024"',
+    'where type == "book"',
+    '! Delbaen',
+    '! /Wang, R/ and journal ~ Annals',
+    'recent top 3 author ~ /Wang, R/',
+    'verbose top 5 recent select journal author ~ /Wang, R/',
+    'top 5 select journal author ~ /Wang, R/',
+    'top 6 order author',
+    'top 7 order journal',
+    'top 8 select journal where year == 2024 order author',
+    'verbose top 9 select journal where year == 2024 order -journal, author',
+    'recent top 10  verbose select *, -c ! /Wang, R/ and journal ~ [A-J]+ where year == 2024 and publisher ==  "Springer" and mod > 2024-05',
+    'top 10 select c, d, -a, e recent ! /Wang, R/ and journal ~ [A-J]+ where year == 2024 and publisher ==  "Springer" and mod > 2024 order name, year',
+    'error',
+]
+
+# process-wide parsers, one per parser type, see get_parser
+_parsers = {}
+
+# number of distinct normalized query expressions whose specs are kept
+SPEC_CACHE_SIZE = 256
+# keywords are case insensitive, see arc_grammar.lark
+KEYWORDS = {'top', 'select', 'where', 'order', 'sort', 'and', 'recent', 'verbose'}
+# quoted strings and /regexes/ starting a token are kept verbatim by normalize_query
+_VERBATIM = re.compile(r"""(?<![^\s~!=<>,])("[^"\\]*(?:\\.[^"\\]*)*"|'[^'\\]*(?:\\.[^'\\]*)*'|/[^/\\]*(?:\\.[^/\\]*)*/)""")
+_OPERATOR_CHARS = '=<>~!,-'
+# one where clause as written by ArcTransformer for a plain column, see split_where
+_WHERE_TERM = re.compile(
+    r'''(?P<ident>[A-Za-z_]\w*) (?P<op>==|<=|<|>=|>) '''
+    r'''(?P<value>"[^"\\]*"|'[^'\\]*'|-?inf|-?\d+(?:\.\d*)?(?:[eE][+-]?\d+)?)'''
+    r'''(?: and |$)''')
 
 
 def parse_test(qno, text, debug=False, show_tokens=False):
     """
     Convenience to test the grammar, run with a test text.
 
-    Test cases::
-
-        querex_test_cases = [
-            '',
-            'top 4',
-            'recent',
-            'recent top 3',
-            'verbose recent top 17',
-            'select *',
-            'top 10 select *',
-            'where year == 2024',
-            'where year == "2024"',
-            'where type == "book"',
-            '! Delbaen',
-            '! /Wang, R/ and journal ~ Annals',
-            'recent top 3 author ~ /Wang, R/',
-            'verbose top 5 recent select journal author ~ /Wang, R/',
-            'top 5 select journal author ~ /Wang, R/',
-            'top 6 order author',
-            'top 7 order journal',
-            'top 8 select journal where year == 2024 order author',
-            'verbose top 9 select journal where year == 2024 order -journal, author',
-            'recent top 10  verbose select *, -c ! /Wang, R/ and journal ~ [A-J]+ where year == 2024 and publisher ==  "Springer" and mod > 2024-05',
-            'top 10 select c, d, -a, e recent ! /Wang, R/ and journal ~ [A-J]+ where year == 2024 and publisher ==  "Springer" and mod > 2024 order name, year',
-            'error',
-        ]
+    Test cases are in ``QUEREX_TEST_CASES``::
+
         import archivum.parser as arcp
         import archivum.library as arcl
         from archivum.utilities import fGT
         lib = arcl.Library('uber-library')
 
-        for q in querex_test_cases[-1:]:
+        for q in arcp.QUEREX_TEST_CASES[-1:]:
             print(repr(q))
             try:
                 r = lib.ref_df.querex(q)
@@ -69,7 +92,7 @@ def parse_test(qno, text, debug=False, show_tokens=False):
         tree = parser.parse(text)
         if show_tokens:
             print("Tokens\n======")
-            for token in Lark(ArcParser.grammar, start='query', parser=PARSER, lexer='auto', debug=True).lex(text):
+            for token in Lark.open(GRAMMAR_FILE, start='query', parser=PARSER, lexer='basic', debug=True).lex(text):
                 print(f"  {token.type:<15} {token.value!r}")
             # print('-' * 80)
         result = ArcTransformer().transform(tree)
@@ -88,8 +111,8 @@ def parse_test(qno, text, debug=False, show_tokens=False):
 
 
 def parser(text, debug=False):
-    """One stop shop parsing."""
-    parser = ArcParser(debug=debug)
+    """One stop shop parsing, using the shared process-wide parser."""
+    parser = ArcParser(debug=debug) if debug else get_parser()
     result = None
     try:
         tree = parser.parse(text)
@@ -99,17 +122,119 @@ def parser(text, debug=False):
     return result
 
 
+def get_parser(parser_type=PARSER):
+    """
+    Return the process-wide ArcParser for parser_type, building it on first use.
+
+    Building the Lark parser dominates the cost of parsing a short query,
+    so it is done once per process (and, for lalr, once per grammar change
+    thanks to ``GRAMMAR_CACHE_FILE``).
+    """
+    if parser_type not in _parsers:
+        _parsers[parser_type] = ArcParser(parser_type=parser_type)
+    return _parsers[parser_type]
+
+
+def normalize_query(text):
+    """
+    Normalize query text to a cache key: collapse whitespace and lowercase keywords.
+
+    Quoted strings and /regexes/ are left untouched. A word spelling a keyword
+    is only lowercased in keyword position: not next to an operator and not
+    straight after select, order or sort, where the lexer reads it as a column
+    name or value and case matters.
+    """
+    chunks = []
+    for i, part in enumerate(_VERBATIM.split(text.strip())):
+        if i % 2:
+            chunks.append(part)
+        else:
+            chunks.extend(part.split())
+    for i, chunk in enumerate(chunks):
+        if chunk.lower() not in KEYWORDS:
+            continue
+        prev = chunks[i - 1] if i else ''
+        nxt = chunks[i + 1] if i + 1 < len(chunks) else ''
+        if (prev[-1:] and prev[-1] in _OPERATOR_CHARS) or (nxt[:1] and nxt[0] in _OPERATOR_CHARS):
+            continue
+        if prev.lower() in ('select', 'order', 'sort'):
+            continue
+        chunks[i] = chunk.lower()
+    return ' '.join(chunks)
+
+
+def split_where(where):
+    """
+    Split a spec's where string into a list of (column, operator, value) terms.
+
+    Values keep their quotes: a quoted value is a string literal, otherwise a
+    number. Raises ValueError for anything other than plain ``column op literal``
+    terms joined by and (such as ``mod.dt.day == 13``), which only pandas query
+    can evaluate.
+    """
+    terms = []
+    pos = 0
+    while pos < len(where):
+        m = _WHERE_TERM.match(where, pos)
+        if m is None:
+            raise ValueError(f'cannot split where clause {where[pos:]!r}')
+        pos = m.end()
+        terms.append((m['ident'], m['op'], m['value']))
+    return terms
+
+
+def freeze_spec(spec):
+    """Return a read-only copy of a query spec dictionary from ArcTransformer."""
+    return MappingProxyType({
+        'select': MappingProxyType({
+            'include': tuple(spec['select']['include']),
+            'exclude': tuple(spec['select']['exclude'])}),
+        'sort': tuple(tuple(i) for i in spec['sort']),
+        'regex': tuple(tuple(i) for i in spec['regex']),
+        'where': spec['where'],
+        'top': spec['top'],
+        'flags': tuple(spec['flags'])
+    })
+
+
+@lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _cached_spec(key):
+    """Parse a normalized query; lru_cache does not store the ValueError on failure."""
+    return freeze_spec(parser(key))
+
+
+def cached_parser(text):
+    """
+    Parse text using the process-wide LRU cache of frozen query specs.
+
+    Specs are keyed on ``normalize_query(text)`` and are read-only, because
+    ArcTransformer builds them by mutating ``self.spec``, a cached dictionary
+    could otherwise be corrupted by a caller.
+    """
+    return _cached_spec(normalize_query(text))
+
+
+def spec_cache_info():
+    """Return hits, misses, maxsize and currsize of the query spec cache."""
+    return _cached_spec.cache_info()
+
+
 class ArcParser:
     """Parser for file database query language."""
 
     # EBNF grammar definition for Lark in arc_grammar.lark
-    def __init__(self, debug=False):   # noqa
+    def __init__(self, debug=False, parser_type=PARSER):   # noqa
         self.debug = debug
+        self.parser_type = parser_type
+        if parser_type == 'lalr':
+            options = {'lexer': 'contextual', 'cache': str(GRAMMAR_CACHE_FILE)}
+        else:
+            options = {'lexer': 'auto'}
         self.lark_parser = Lark.open(GRAMMAR_FILE,
                                      start='query',
-                                     parser=PARSER,
-                                     lexer='auto',
-                                     debug=debug)
+                                     parser=parser_type,
+                                     debug=debug,
+                                     **options)
 
     def parse(self, text):   # noqa
         return self.lark_parser.parse(text)
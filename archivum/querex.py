@@ -5,11 +5,101 @@ Query with pandas query-regex-SQL syntax
 Derived from file-database query.py.
 """
 
+from collections import OrderedDict
 import re
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
-from . parser import parser
+from . parser import cached_parser, normalize_query
+from . querex_arrow import arrow_positions, ArrowUnsupported
+
+# rows a where or values a regex filter evaluates per step, between checks for cancellation
+CHUNK_SIZE = 1 << 16
+
+
+class QueryCancelled(Exception):
+    """Raised by a query whose cancel event was set."""
+
+
+def check_cancel(cancel):
+    """Raise QueryCancelled if cancel, a threading.Event or None, is set."""
+    if cancel is not None and cancel.is_set():
+        raise QueryCancelled('Query cancelled')
+
+
+def contains(values, pattern, cancel=None):
+    """
+    Case insensitive regex search of pattern in the strings of Series values
+    as a bool array, missing values False. With a cancel event the values
+    are matched in chunks of CHUNK_SIZE, checking cancel between them.
+    """
+    # a bad pattern raises re.error, whatever the string storage (Arrow raises ArrowInvalid)
+    re.compile(pattern)
+    if cancel is None or len(values) <= CHUNK_SIZE:
+        check_cancel(cancel)
+        return values.str.contains(pattern, regex=True, case=False, na=False).to_numpy(dtype=bool)
+    parts = []
+    for start in range(0, len(values), CHUNK_SIZE):
+        check_cancel(cancel)
+        parts.append(values.iloc[start:start + CHUNK_SIZE].str.contains(
+            pattern, regex=True, case=False, na=False).to_numpy(dtype=bool))
+    return np.concatenate(parts)
+
+
+class ResultCache():
+    """
+    LRU cache of querex results with a memory budget and a generation counter.
+
+    Entries are keyed by (target frame name, normalized query). Results are
+    shared with the caller and must be treated as read-only. Call ``bump``
+    whenever the underlying frames change: it advances ``generation`` and drops
+    every cached result.
+    """
+
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+        try:
+            df, nbytes = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return df
+
+    def put(self, key, df):
+        """Store df, evicting least recently used results to stay within budget."""
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        while self._entries and self.nbytes + nbytes > self.max_bytes:
+            self.nbytes -= self._entries.popitem(last=False)[1][1]
+        self._entries[key] = (df, nbytes)
+        self.nbytes += nbytes
+
+    def bump(self):
+        """Advance the generation, invalidating all cached results."""
+        self.generation += 1
+        self._entries.clear()
+        self.nbytes = 0
+
+    def info(self):
+        """Cache statistics as a dictionary."""
+        return {'generation': self.generation, 'hits': self.hits, 'misses': self.misses,
+                'entries': len(self._entries), 'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes}
 
 
 def querex_work(df: pd.DataFrame,
@@ -17,7 +107,17 @@ def querex_work(df: pd.DataFrame,
                 base_cols: list,
                 bang_field: str,
                 recent_field: str,
-                debug=False) -> pd.DataFrame:
+                debug=False,
+                result_cache=None,
+                cache_name='',
+                engine='pandas',
+                arrow_table=None,
+                value_codes=None,
+                trigram_index=None,
+                recent_order=None,
+                load_columns=None,
+                cancel=None,
+                null_is_empty=False) -> pd.DataFrame:
     """
     Run extended query parser.
 
@@ -35,6 +135,23 @@ def querex_work(df: pd.DataFrame,
     :param base_cols: list of columns to return by default, use select a, -b to adjust
     :bang_field: column that ! expands to in regex queries
     :recent_field: date column to use for recent queries
+    :result_cache: optional ResultCache; repeated queries return the cached result
+    :cache_name: name of df in result_cache keys, eg database or ref_df
+    :engine: 'pandas' or 'arrow', the engine that selects and orders rows
+    :arrow_table: callable returning df as a pyarrow.Table, needed for the arrow engine
+    :value_codes: optional callable mapping a column name to ``factorize_strings(df[name])``,
+      regex filters on string columns are then evaluated once per distinct value
+    :trigram_index: optional callable mapping a column name to a ``trigram.TrigramIndex``
+      of its distinct values (or None); the regex then only runs on candidate values
+    :recent_order: optional callable returning ``sort_permutation(df, [recent_field], [False])``,
+      cached by the caller, so recent queries need no sort
+    :load_columns: optional callable taking the query spec and adding the columns it
+      needs (see ``spec_columns``) to df, for frames that load columns on demand
+    :cancel: optional threading.Event; once set the query raises QueryCancelled at
+      its next check (where and regex filters check every CHUNK_SIZE rows or values;
+      the sort is not interrupted)
+    :null_is_empty: df is in the compact schema (see schema), where nulls stand for '';
+      columns of nulls are dropped like columns of ''
 
 
     Supports optional 'top N' prefix, regex with '~', and pandas query().
@@ -56,6 +173,9 @@ def querex_work(df: pd.DataFrame,
 
     Drops empty columns.
 
+    The input frame is never copied: clauses narrow an array of row positions
+    and only the projected columns of the returned rows are materialized.
+
     Ordering
         verbose: turns on verbose mode to debug how query is parsed
         recent : automatically sort by mod date
@@ -79,57 +199,48 @@ def querex_work(df: pd.DataFrame,
     Always case insenstive...TODO: !!
 
     """
-    df = df.copy()
     expr = expr.strip()
+    key = None
+    if result_cache is not None:
+        key = (cache_name, result_cache.generation, normalize_query(expr))
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
     # specification dictionary from query string
     try:
-        spec = parser(expr, debug=False)
+        spec = cached_parser(expr)
     except ValueError as e:
         print(e)
         raise e
 
     if debug:
         print(spec)
+    if load_columns is not None:
+        load_columns(spec)
 
     # default values
     flags = spec['flags']
-    recent = 'recent' in flags
     verbose = 'verbose' in flags
-
     top_n = spec['top']
-    regex_filters = spec['regex']
-    query_expr = spec['where']
-    include_cols = spec['select'].get('include', [])
-    if include_cols and include_cols[0] == '*':
-        include_cols = list(df.columns)
-    exclude_cols = spec['select'].get('exclude', [])
-
-    # sort spec
-    sort_cols = [i[0] for i in spec['sort']]
-    sort_order = [i[1] for i in spec['sort']]
 
-    # TODO - catch errors!!
-    if query_expr:
-        df = df.query(query_expr)
-
-    # Apply regex filters
-    for field, pattern in regex_filters:
-        if field == 'BANG':
-            field = bang_field
-        if field in df.columns:
-            try:
-                df = df.loc[df[field].astype(str).str.contains(
-                    pattern, regex=True, case=False, na=False)]
-            except re.error:
-                print(f'Regular expression error with {pattern}...ignoring.')
-        else:
-            raise ValueError(f"Unknown field for regex filtering: '{field}'")
-
-    # Sort
-    if recent:
-        df = df.sort_values(by=recent_field, ascending=False)
-    elif sort_cols:
-        df = df.sort_values(by=sort_cols, ascending=sort_order)
+    # Rows are tracked as positions into df: the where and regex clauses
+    # narrow one position array and only the final rows and projected
+    # columns are materialized, no intermediate frames are copied.
+    pos = None
+    if engine == 'arrow' and arrow_table is not None:
+        try:
+            pos = arrow_positions(arrow_table(), spec, bang_field, recent_field)
+            qx_unrestricted_len = len(pos)
+        except (ArrowUnsupported, pa.ArrowException) as e:
+            if verbose or debug:
+                print(f'Arrow engine: {e}...using pandas.')
+    if pos is None:
+        pos = _filtered_positions(df, spec, bang_field, value_codes, trigram_index, cancel)
+        qx_unrestricted_len = len(pos)
+        check_cancel(cancel)
+        # with top n only the first n rows are put in order
+        pos = _ordered_positions(df, pos, spec, recent_field, top_n, recent_order)
+    check_cancel(cancel)
 
     # if duplicates:
     #     df = df.loc[df.duplicated("hash", keep=False)]
@@ -139,24 +250,70 @@ def querex_work(df: pd.DataFrame,
     #     df['n'] = df['node'].map(df['node'].value_counts().get)
 
     # Top N and GT caption support, note df changes if top n...
-    qx_unrestricted_len = len(df)
     if top_n > 0:
         # -1 is all rows, the default
-        df = df.head(top_n)
+        pos = pos[:top_n]
+    fields = select_fields(df.columns, spec, base_cols, recent_field)
+    df = decorate_result(df.iloc[pos, df.columns.get_indexer(fields)],
+                         expr, top_n, qx_unrestricted_len, null_is_empty=null_is_empty)
+    if key is not None:
+        result_cache.put(key, df)
+    return df
+
+
+def select_fields(columns, spec, base_cols, recent_field):
+    """Columns returned by a query: base_cols plus selected, less excluded, recent_field first if recent."""
+    include_cols = spec['select'].get('include', [])
+    if include_cols and include_cols[0] == '*':
+        include_cols = list(columns)
+    exclude_cols = spec['select'].get('exclude', [])
     # prune fields
     # base cols plus select
     # do in two steps to avoid duplicating fields
-    fields = [i for i in base_cols if i in df.columns]
+    fields = [i for i in base_cols if i in columns]
     fields = fields + [
-        i for i in include_cols if i in df.columns and i not in fields]
+        i for i in include_cols if i in columns and i not in fields]
     # drop out the drop cols
     if exclude_cols:
         fields = [i for i in fields if i not in exclude_cols]
-    if recent and recent_field not in fields:
+    if 'recent' in spec['flags'] and recent_field not in fields:
         fields.insert(0, recent_field)
-    df = df[fields]
-    if 'title' in fields:
-        df['title'] = df['title'].replace(r'\{|\}', '', regex=True)
+    return fields
+
+
+def spec_columns(spec, columns, base_cols, bang_field, recent_field):
+    """
+    Columns (of all columns) that a query spec reads or returns.
+
+    Where clauses are pandas expressions, so any column named in one counts.
+    """
+    include_cols = spec['select'].get('include', [])
+    if include_cols and include_cols[0] == '*':
+        return list(columns)
+    needed = set(base_cols) | set(include_cols) | {c for c, _ in spec['sort']}
+    needed.update(bang_field if field == 'BANG' else field for field, _ in spec['regex'])
+    if 'recent' in spec['flags']:
+        needed.add(recent_field)
+    if spec['where']:
+        needed.update(where_columns(spec['where'], columns))
+    return [c for c in columns if c in needed]
+
+
+def where_columns(where, columns):
+    """Columns (of columns) named in a where clause."""
+    return [c for c in columns if re.search(rf'(?<![\w-]){re.escape(c)}(?![\w-])', where)]
+
+
+def decorate_result(df, expr, top_n, qx_unrestricted_len, strip_braces=True,
+                    null_is_empty=False):
+    """
+    Tidy the projected result rows and add the qx_unrestricted_len and gt_caption attributes.
+
+    strip_braces=False skips removing {} from titles, for rows already tidied.
+    null_is_empty=True also drops columns of nulls, for compact frames.
+    """
+    if strip_braces and 'title' in df.columns:
+        df = df.assign(title=df['title'].replace(r'\{|\}', '', regex=True))
     # if 'tag' in fields:
     #     df = df.set_index('tag')
     # drop empty columns. which means value '' in every column
@@ -166,7 +323,11 @@ def querex_work(df: pd.DataFrame,
     # .all()           → For each column, check if all values are True (i.e., all are '')
     # ~(...)           → Invert the boolean Series: True becomes False (keep these columns)
     # df.loc[:, ...]   → Select only the columns that are not all empty strings
-    df = df.loc[:, ~(df == '').all()]
+    empty = df == ''
+    if null_is_empty:
+        # compact frames use nulls for ''
+        empty |= df.isna()
+    df = df.loc[:, ~empty.all()]
 
     # apply decorations last thing before returning
     df.qx_unrestricted_len = qx_unrestricted_len
@@ -178,6 +339,188 @@ def querex_work(df: pd.DataFrame,
     return df
 
 
+def factorize_strings(s):
+    """
+    Factorize string column s into (codes, uniques) for regex filtering, or None.
+
+    Missing values get code -1. Only string dtype columns qualify: for object
+    columns ``astype(str)`` turns None into 'None', which a regex can match.
+    Categoricals of strings are already factorized.
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype) and isinstance(
+            s.dtype.categories.dtype, pd.StringDtype):
+        return s.cat.codes.to_numpy(), s.cat.categories.to_numpy()
+    if not isinstance(s.dtype, pd.StringDtype):
+        return None
+    codes, uniques = pd.factorize(s)
+    return codes, uniques
+
+
+def where_mask(df, where, cancel=None):
+    """
+    Boolean mask of the rows of df passing where, evaluated by df.eval.
+
+    Quoted integers compared with integer columns (``year == "2024"``, from
+    when years were strings) are unquoted, and missing comparisons are False.
+    With a cancel event the rows are evaluated in chunks of CHUNK_SIZE,
+    checking cancel between them (where terms compare row by row).
+    """
+    def unquote(m):
+        c = m['ident']
+        if c in df.columns and pd.api.types.is_integer_dtype(df[c].dtype):
+            return f"{c} {m['op']} {m['int']}"
+        return m[0]
+
+    where = _QUOTED_INT.sub(unquote, where)
+    if cancel is None or len(df) <= CHUNK_SIZE:
+        check_cancel(cancel)
+        return np.asarray(df.eval(where).to_numpy(dtype=bool, na_value=False))
+    parts = []
+    for start in range(0, len(df), CHUNK_SIZE):
+        check_cancel(cancel)
+        parts.append(df.iloc[start:start + CHUNK_SIZE].eval(where).to_numpy(
+            dtype=bool, na_value=False))
+    return np.concatenate(parts)
+
+
+_QUOTED_INT = re.compile(r"""(?<![\w.-])(?P<ident>[A-Za-z_][\w]*)\s*(?P<op>==|!=|<=|>=|<|>)\s*"""
+                         r"""(?P<q>['"])(?P<int>-?\d+)(?P=q)""")
+
+
+def _pandas_positions(df, spec, bang_field, recent_field):
+    """Row positions of df selected and ordered by spec, using pandas."""
+    pos = _filtered_positions(df, spec, bang_field)
+    return _ordered_positions(df, pos, spec, recent_field)
+
+
+def _filtered_positions(df, spec, bang_field, value_codes=None, trigram_index=None,
+                        cancel=None):
+    """
+    Ascending positions of the rows of df that pass the where and regex clauses of spec.
+
+    cancel, an optional threading.Event, is checked between clauses and chunks.
+    """
+    pos = np.arange(len(df))
+
+    # TODO - catch errors!!
+    if spec['where']:
+        pos = np.flatnonzero(where_mask(df, spec['where'], cancel))
+
+    # Apply regex filters, evaluated only on the surviving rows
+    for field, pattern in spec['regex']:
+        check_cancel(cancel)
+        if field == 'BANG':
+            field = bang_field
+        if field in df.columns:
+            factorized = value_codes(field) if value_codes is not None else None
+            try:
+                if factorized is None:
+                    values = df[field].iloc[pos]
+                    # missing values never match (astype(str) would make them 'nan')
+                    keep = contains(values.astype(str), pattern, cancel)
+                    keep = keep & values.notna().to_numpy()
+                else:
+                    # match each distinct value once and look rows up by code,
+                    # the appended False is for missing values (code -1)
+                    codes, uniques = factorized
+                    index = trigram_index(field) if trigram_index is not None else None
+                    cand = index.candidates(pattern) if index is not None else None
+                    if cand is None:
+                        hit = contains(pd.Series(uniques), pattern, cancel)
+                    else:
+                        # only values with all the pattern's literal trigrams can match
+                        hit = np.zeros(len(uniques), dtype=bool)
+                        hit[cand] = contains(pd.Series(uniques[cand]), pattern, cancel)
+                    keep = np.append(hit, False)[codes[pos]]
+            except re.error:
+                print(f'Regular expression error with {pattern}...ignoring.')
+            else:
+                pos = pos[keep]
+        else:
+            raise ValueError(f"Unknown field for regex filtering: '{field}'")
+
+    return pos
+
+
+def _ordered_positions(df, pos, spec, recent_field, top_n=-1, recent_order=None):
+    """
+    Order ascending row positions pos of df by the sort (or recent) clause of spec.
+
+    If top_n > 0 only the first top_n positions are returned. recent_order is
+    an optional callable returning the full frame's recent permutation: a
+    stable sort restricted to pos gives the same order, so no sort is needed.
+    """
+    if 'recent' in spec['flags']:
+        if recent_order is not None:
+            perm = recent_order()
+            if len(pos) < len(df):
+                keep = np.zeros(len(df), dtype=bool)
+                keep[pos] = True
+                perm = perm[keep[perm]]
+            return perm[:top_n] if top_n > 0 else perm
+        return _sorted_positions(df, pos, [recent_field], [False], top_n)
+    elif spec['sort']:
+        return _sorted_positions(df, pos, [i[0] for i in spec['sort']],
+                                 [i[1] for i in spec['sort']], top_n)
+    return pos
+
+
+def sort_permutation(df, by, ascending):
+    """Positions of all rows of df in (stable) sort order by columns by."""
+    return _sorted_positions(df, np.arange(len(df)), by, ascending)
+
+
+def _sorted_positions(df, pos, by, ascending, top_n=-1):
+    """
+    Reorder row positions pos of df by columns by, like df.iloc[pos].sort_values.
+
+    Only the sort columns of the selected rows are copied; sorting them with
+    sort_values gives the same permutation as sorting the full frame. With
+    top_n > 0 the first top_n positions are returned, selected without a full
+    sort when the first key is numeric or a date.
+    """
+    for c in by:
+        if c not in df.columns:
+            raise KeyError(c)
+    if 0 < top_n < len(pos):
+        pos = _top_candidates(df[by[0]], pos, ascending[0], top_n)
+    keys = df.iloc[pos, df.columns.get_indexer(by)]
+    keys.index = pd.RangeIndex(len(keys))
+    # stable, so ties keep library order (and match the arrow engine)
+    order = keys.sort_values(by=by, ascending=ascending, kind='stable').index.to_numpy()
+    if top_n > 0:
+        order = order[:top_n]
+    return pos[order]
+
+
+def _top_candidates(s, pos, ascending, top_n):
+    """
+    Subset of ascending positions pos that contains the first top_n in order of column s.
+
+    Selects (np.partition, linear time) the top_n-th best value and keeps
+    every row at least as good, including all ties, so sorting the subset
+    with any further keys gives the same first top_n rows as a full sort.
+    Missing values sort last. Returns pos unchanged for other dtypes.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        values = s.array[pos]
+        key = values.asi8
+    elif pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+        values = s.iloc[pos]
+        key = values.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        return pos
+    valid = ~np.asarray(values.isna())
+    if valid.sum() < top_n:
+        # missing values needed to fill top_n
+        return pos
+    key = key[valid]
+    if not ascending:
+        key = -key
+    kth = np.partition(key, top_n - 1)[top_n - 1]
+    return pos[valid][key <= kth]
+
+
 def _parse_sort_fields(spec: str):
     """Parse comma sep list of field names with optional -|! prefix into list and list of ascending."""
     fields = []
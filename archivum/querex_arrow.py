@@ -0,0 +1,126 @@
+"""
+Arrow-native querex engine using pyarrow.compute kernels.
+
+Evaluates the where, regex, sort and top clauses of a querex spec against a
+``pyarrow.Table`` and returns the selected row positions; ``querex_work``
+then materializes the projected columns exactly as the pandas engine does.
+Arrow kernels release the GIL and run multi-threaded.
+
+Anything that cannot be translated faithfully (pandas expressions such as
+``mod.dt.day == 13``, regex features that differ between Python ``re`` and
+RE2, non-string regex columns, type mismatches) raises ``ArrowUnsupported``
+and the caller falls back to the pandas engine, so results never differ.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from . parser import split_where
+
+
+class ArrowUnsupported(Exception):
+    """Query spec cannot be evaluated faithfully by the Arrow engine."""
+
+
+_COMPARE = {'==': pc.equal, '<=': pc.less_equal, '<': pc.less,
+            '>=': pc.greater_equal, '>': pc.greater}
+
+# RE2 (Arrow) treats these classes as ASCII only, Python re as Unicode
+_UNICODE_CLASSES = re.compile(r'\\[wWbB]')
+
+
+def _is_string(typ):
+    """True for string columns, including dictionary encoded strings."""
+    if pa.types.is_dictionary(typ):
+        typ = typ.value_type
+    return pa.types.is_string(typ) or pa.types.is_large_string(typ)
+
+
+def _where_mask(table, where):
+    """Boolean mask for a where clause string, following pandas query semantics."""
+    mask = None
+    try:
+        terms = split_where(where)
+    except ValueError as e:
+        raise ArrowUnsupported(str(e))
+    for ident, op, value in terms:
+        if ident not in table.column_names:
+            raise ArrowUnsupported(f'unknown column {ident!r}')
+        col = table[ident]
+        typ = col.type
+        quoted = value[0] in '"\''
+        if _is_string(typ) and quoted:
+            scalar = pa.scalar(value[1:-1])
+        elif (pa.types.is_integer(typ) or pa.types.is_floating(typ)) and not quoted:
+            scalar = pa.scalar(float(value))
+        elif pa.types.is_timestamp(typ) and typ.tz is None and quoted:
+            # query reads the string as a naive Timestamp (and raises for
+            # tz-aware columns, so those are left to pandas)
+            try:
+                ts = pd.Timestamp(value[1:-1])
+            except ValueError:
+                raise ArrowUnsupported(f'cannot read {value} as a timestamp')
+            scalar = pa.scalar(ts, type=typ)
+        else:
+            raise ArrowUnsupported(f'cannot compare {ident} ({typ}) with {value}')
+        clause = pc.fill_null(_COMPARE[op](col, scalar), False)
+        mask = clause if mask is None else pc.and_(mask, clause)
+    return mask
+
+
+def arrow_positions(table, spec, bang_field, recent_field):
+    """
+    Return row positions of table selected and ordered by spec.
+
+    Mirrors the pandas engine: where, then regex filters (nulls never match),
+    then a stable sort, most recent first if the recent flag is set. The
+    result is not truncated to top n, because the caller needs the full
+    count for captions.
+    """
+    if spec['where']:
+        idx = pc.indices_nonzero(_where_mask(table, spec['where']))
+    else:
+        idx = pa.array(np.arange(table.num_rows))
+
+    for field, pattern in spec['regex']:
+        if field == 'BANG':
+            field = bang_field
+        if field not in table.column_names or not _is_string(table[field].type):
+            raise ArrowUnsupported(f'cannot regex filter {field!r}')
+        try:
+            re.compile(pattern)
+        except re.error:
+            raise ArrowUnsupported(f'invalid regular expression {pattern!r}')
+        if _UNICODE_CLASSES.search(pattern):
+            raise ArrowUnsupported(f'unicode character classes in {pattern!r}')
+        values = pc.take(table[field], idx).combine_chunks()
+        if not pa.types.is_dictionary(values.type):
+            values = values.dictionary_encode()
+        # match each distinct value once, then look rows up by dictionary index
+        try:
+            hit = pc.match_substring_regex(values.dictionary, pattern, ignore_case=True)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ArrowUnsupported(str(e))
+        keep = pc.take(hit, values.indices)
+        idx = pc.filter(idx, pc.fill_null(keep, False))
+
+    # (column, order, null placement): sort_indices is stable and, with nulls
+    # (and NaN) last in either order, sorts like pandas
+    if 'recent' in spec['flags']:
+        sort_keys = [(recent_field, 'descending', 'at_end')]
+    else:
+        sort_keys = [(c, 'ascending' if asc else 'descending', 'at_end')
+                     for c, asc in spec['sort']]
+    if sort_keys:
+        cols = [c for c, *_ in sort_keys]
+        if any(c not in table.column_names for c in cols):
+            raise ArrowUnsupported(f'unknown sort column in {cols}')
+        keys = table.select(cols).take(idx)
+        order = pc.sort_indices(keys, sort_keys=sort_keys)
+        idx = pc.take(idx, order)
+
+    return idx.to_numpy(zero_copy_only=False).astype(np.int64, copy=False)
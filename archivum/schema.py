@@ -0,0 +1,152 @@
+"""
+Compact column types for the library frames.
+
+Frames come from Mendeley as strings with '' for missing. The compact schema
+stores the few-valued columns (type, journal, ...) as categoricals, year,
+volume and arc-citations as nullable small integers, free text as (Arrow
+backed) strings and missing values as real nulls. Keys (tag, path, author)
+are left alone; an integer column keeps its strings unless every value
+converts exactly.
+
+Used when the ``compact_dtypes`` config option is on (it is off by
+default): applied on load to files written before the schema (see
+``Library._read_feather``) and on save; saved files are stamped so loading
+them needs no conversion. With the option off, stamped files are converted
+back on load (see plain_frame) and saved plain.
+
+Missing values are nulls in compact frames, which changes querex results:
+``where journal == ""`` and ``journal ~ /^$/`` match nothing, so missing
+values cannot be selected, ``where year < 2000`` compares numbers and drops
+missing years, and missing values sort last. To migrate a library set
+``compact_dtypes: true`` in its config and run ``Library.rewrite_feathers``;
+setting it back to false and rewriting undoes the change.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+# join keys: never null or categorical
+KEY_COLUMNS = ['tag', 'path', 'author']
+CATEGORY_COLUMNS = ['type', 'journal', 'publisher', 'arc-source', 'mendeley-tags', 'suffix']
+INT_COLUMNS = {'year': 'Int16', 'volume': 'Int32', 'arc-citations': 'Int32'}
+# the integer columns Mendeley gives as strings
+TEXT_INT_COLUMNS = ['year', 'volume']
+# feather schema metadata stamp of compact files
+SCHEMA_KEY = b'archivum-schema'
+SCHEMA_VERSION = b'compact-1'
+
+
+def is_compact(schema):
+    """True if the pyarrow schema is stamped as written with the compact schema."""
+    return (schema.metadata or {}).get(SCHEMA_KEY) == SCHEMA_VERSION
+
+
+def _is_text(s):
+    return isinstance(s.dtype, pd.StringDtype) or (
+        s.dtype == object and s.map(lambda v: isinstance(v, str) or v is None).all())
+
+
+def _small_int(s, dtype):
+    """s as nullable integer dtype, or unchanged if any value would not convert exactly."""
+    info = np.iinfo(dtype.lower())
+    if _is_text(s):
+        text = s.where(s != '')
+        n = pd.to_numeric(text, errors='coerce')
+        if (n.isna() != text.isna()).any():
+            return s
+        # also rejects '1e3', ' 12' or '012', which would not round trip
+        if (n.dropna().astype('int64').astype(str) != text.dropna()).any():
+            return s
+    elif pd.api.types.is_integer_dtype(s.dtype):
+        n = s
+    else:
+        return s
+    if n.notna().any() and (n.min() < info.min or n.max() > info.max):
+        return s
+    return n.astype(dtype)
+
+
+def compact_column(c, s):
+    """Column c, a Series, in the compact schema."""
+    if c in KEY_COLUMNS:
+        return s
+    if c in INT_COLUMNS:
+        s = _small_int(s, INT_COLUMNS[c])
+    if _is_text(s):
+        s = s.where(s != '')
+        if c in CATEGORY_COLUMNS:
+            s = s.astype('category')
+    return s
+
+
+def compact_frame(df):
+    """Copy of df in the compact schema."""
+    return pd.DataFrame({c: compact_column(c, df[c]) for c in df.columns}, index=df.index)
+
+
+def memory_report(df):
+    """
+    Bytes per column of df (deep) before and after compact_frame.
+
+    Indexed by column, with the index as 'Index' and a final 'total' row;
+    columns dtype, compact_dtype, before, after and ratio (after / before).
+    """
+    compact = compact_frame(df)
+    ans = pd.DataFrame({
+        'dtype': ['', *map(str, df.dtypes)],
+        'compact_dtype': ['', *map(str, compact.dtypes)],
+        'before': df.memory_usage(deep=True),
+        'after': compact.memory_usage(deep=True)})
+    ans.loc['total'] = ['', '', ans.before.sum(), ans.after.sum()]
+    ans['ratio'] = ans.after / ans.before
+    return ans
+
+
+def plain_column(c, s):
+    """Column c, a Series in the compact schema, as imported: strings with '' for missing."""
+    if c in KEY_COLUMNS:
+        return s
+    if isinstance(s.dtype, pd.CategoricalDtype) or (c in TEXT_INT_COLUMNS and s.dtype.kind in 'iu'):
+        return s.astype(object).where(s.notna(), '').astype('str')
+    if c in INT_COLUMNS and s.dtype.kind in 'iu':
+        return s.astype('int64') if s.notna().all() else s
+    if _is_text(s):
+        return s.fillna('')
+    return s
+
+
+def plain_frame(df):
+    """Copy of df, in the compact schema, back as imported; see plain_column."""
+    return pd.DataFrame({c: plain_column(c, df[c]) for c in df.columns}, index=df.index)
+
+
+def write_compact(df, path, compression='lz4'):
+    """Write frame df to feather file path in the compact schema, stamped as such."""
+    table = pa.Table.from_pandas(compact_frame(df), preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), SCHEMA_KEY: SCHEMA_VERSION})
+    feather.write_feather(table, path, compression=compression)
+
+
+def conform(values, dtype):
+    """
+    values (a sequence) as a Series of dtype, for new rows of a frame.
+
+    Categories are extended with any new values, so check the returned
+    dtype. Strings convert to nullable integers, naive timestamps (and NaT)
+    are taken to be in the time zone of dtype.
+    """
+    s = pd.Series(values)
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        s = pd.to_datetime(s)
+        return (s.dt.tz_localize(dtype.tz) if s.dt.tz is None else s).astype(dtype)
+    if isinstance(dtype, pd.CategoricalDtype):
+        new = pd.Index(s.dropna().unique()).difference(dtype.categories)
+        if len(new):
+            dtype = pd.CategoricalDtype(dtype.categories.append(new).sort_values())
+        return s.astype(dtype)
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'iu':
+        return pd.to_numeric(s.where(s != '')).astype(dtype)
+    return pd.Series(values, dtype=dtype)
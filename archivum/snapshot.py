@@ -0,0 +1,150 @@
+"""
+Snapshot of the warmed library state for instant reopen.
+
+Opening a library re-reads the feathers, rebuilds the database, the author
+Trie (see ``Library.to_name_ex``) and the TagAllocator. A snapshot holds all
+of that in one file:
+
+    header      magic, header length, JSON header (version, fingerprint, ...)
+    frames      ref_df, doc_df, ref_doc_df and database, each an Arrow IPC file
+    trie        Trie.to_bytes, the sorted authors front coded
+    tags        the reference tags (the TagAllocator's existing tags), front coded
+
+Sections start on 64 byte boundaries. The file is memory mapped, so
+restoring only reads the header: frame columns are zero-copy views of the
+mapping and the trie and tags are decoded on first use. A snapshot is used
+only if its version, the feather fingerprint and the compact dtypes setting
+match, see ``Library.write_snapshot``.
+"""
+
+import json
+import os
+from pathlib import Path
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from . locking import tmp_path
+
+MAGIC = b'ARCSNAP\0'
+# bump when the layout or the meaning of a section changes
+SNAPSHOT_VERSION = 2
+_ALIGN = 64
+
+
+def _ipc_bytes(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _padding(n):
+    return -n % _ALIGN
+
+
+def write_snapshot(path, frames, blobs, **header):
+    """
+    Write a snapshot to path: frames, a dict of name to DataFrame; blobs, a
+    dict of name to bytes; header, extra JSON values (fingerprint etc.).
+
+    Written beside path and moved over it, so readers never see a partial
+    file and existing memory maps stay valid.
+    """
+    sections = {name: _ipc_bytes(pa.Table.from_pandas(df, preserve_index=False))
+                for name, df in frames.items()}
+    sections.update(blobs)
+    header = {'version': SNAPSHOT_VERSION, 'created': time.time(), **header,
+              'frames': list(frames), 'sections': {}}
+    # offsets are from the first section, which starts after the header
+    offsets = {}
+    position = 0
+    for name, data in sections.items():
+        offsets[name] = [position, len(data)]
+        position += len(data) + _padding(len(data))
+    header['sections'] = offsets
+    text = json.dumps(header).encode()
+    start = len(MAGIC) + 8 + len(text)
+    start += _padding(start)
+    path = Path(path)
+    tmp = tmp_path(path)
+    with tmp.open('wb') as f:
+        f.write(MAGIC)
+        f.write(len(text).to_bytes(8, 'little'))
+        f.write(text)
+        f.write(b'\0' * (start - len(MAGIC) - 8 - len(text)))
+        for data in sections.values():
+            f.write(data)
+            f.write(b'\0' * _padding(len(data)))
+    os.replace(tmp, path)
+
+
+def _read_header(path):
+    """(JSON header, start of the first section) of the snapshot at path, or (None, 0)."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None, 0
+        n = int.from_bytes(f.read(8), 'little')
+        start = len(MAGIC) + 8 + n
+        return json.loads(f.read(n)), start + _padding(start)
+
+
+def read_header(path):
+    """JSON header of the snapshot at path, or None if it is not a snapshot."""
+    return _read_header(path)[0]
+
+
+class Snapshot():
+    """Memory mapped snapshot file; frames and blobs are views of the mapping."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.header, self._start = _read_header(self.path)
+        if self.header is None:
+            raise ValueError(f'{self.path} is not a snapshot')
+        with pa.memory_map(str(self.path)) as source:
+            # the buffer keeps the mapping alive after the file is closed
+            self._buffer = source.read_buffer()
+
+    def _section(self, name):
+        offset, length = self.header['sections'][name]
+        return self._buffer.slice(self._start + offset, length)
+
+    @property
+    def frames(self):
+        return self.header['frames']
+
+    def frame(self, name):
+        """Frame name, its columns zero-copy where the dtype allows."""
+        table = pa.ipc.open_file(pa.BufferReader(self._section(name))).read_all()
+        return table.to_pandas(split_blocks=True)
+
+    def blob(self, name):
+        """Section name as a memoryview of the mapping."""
+        return memoryview(self._section(name))
+
+
+def snapshot_info(path):
+    """
+    Series describing the snapshot at path: created, age, size and, by
+    section, the MB stored. Empty if there is no snapshot.
+    """
+    path = Path(path)
+    if not path.exists():
+        return pd.Series(dtype=object)
+    header = read_header(path)
+    if header is None:
+        return pd.Series({'path': str(path), 'version': None})
+    mb = 1 << 20
+    ans = {
+        'path': str(path),
+        'version': header['version'],
+        'created': pd.Timestamp(header['created'], unit='s').floor('s'),
+        'age': pd.Timedelta(seconds=round(time.time() - header['created'])),
+        'size_mb': path.stat().st_size / mb,
+        'fingerprint': header.get('fingerprint', '')[:12],
+    }
+    for name, (_, length) in header['sections'].items():
+        ans[f'{name}_mb'] = length / mb
+    return pd.Series(ans)
@@ -0,0 +1,408 @@
+"""
+Embedded SQLite storage and query backend for querex.
+
+Loads the ref, doc and ref-doc frames into a local SQLite file beside the
+library feathers and compiles each querex spec (select, where, regex,
+order, top) into one SELECT statement with the top n pushed down as LIMIT.
+The exploded author x ref-doc x doc ``database`` is joined once, when the
+file is built, into a table in pandas row order, so it is never
+materialized in pandas. It is a table, not a view: ``_row`` is a window
+over the whole join, so a view recomputes the join for every query, even
+``top 5`` (20-80 times slower at 50,000 references), for about 2.5 times
+the file size. Every table has a ``_row`` column, the position of the row
+in its pandas frame, which becomes the index of results, as in the pandas
+engine. Timestamps are stored as integer nanoseconds and read back
+as text, so nulls do not turn them into (inexact) floats.
+
+Regex filters use a REGEXP function backed by Python ``re`` (case
+insensitive), so patterns behave exactly as in the pandas engine. Where
+terms that SQLite cannot evaluate with pandas query semantics raise
+``SqlUnsupported`` and the query runs on the pandas frame instead.
+
+Select with ``query_engine: sqlite`` in the library config; the file is
+rebuilt automatically when any feather is newer.
+"""
+
+from functools import lru_cache
+import json
+import logging
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from . import APP_NAME
+from . parser import cached_parser, normalize_query, split_where
+from . querex import select_fields, decorate_result, QueryCancelled
+from . locking import tmp_path
+from . schema import SCHEMA_VERSION
+
+logger = logging.getLogger(__name__)
+
+# SQLite virtual machine steps between checks of a query's cancel event
+PROGRESS_STEPS = 10000
+
+# layout of the SQLite file; older files are rebuilt
+LAYOUT_VERSION = 2
+
+
+class SqlUnsupported(Exception):
+    """Query spec cannot be evaluated faithfully in SQL."""
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@lru_cache(maxsize=1 << 16)
+def _regexp(pattern, value):
+    """
+    SQLite REGEXP: ``value REGEXP pattern`` calls regexp(pattern, value).
+
+    Cached, so repeated values (authors, journals) are matched once per pattern.
+    """
+    if value is None:
+        return False
+    return _compile(pattern).search(str(value)) is not None
+
+
+def _q(name):
+    """Quote an SQL identifier (column names such as arc-citations need it)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteBackend():
+    """SQLite copy of a Library's frames with querex compiled to SQL."""
+
+    # frame name -> table name
+    tables = {'ref_df': 'ref', 'doc_df': 'doc', 'ref_doc_df': 'ref_doc', 'database': 'database'}
+    # columns the pandas database fills with 0 after the merge
+    fill_zero = ['node', 'links', 'size']
+
+    def __init__(self, lib):
+        self.lib = lib
+        self.path = lib.config_path.with_suffix(f'.{APP_NAME}-sqlite')
+        self._con = None
+        self._dtypes = None
+        self._categories = None
+
+    def feather_paths(self):
+        """The library's ref, doc and ref-doc feather files."""
+        return [self.lib.config_path.with_suffix(f'.{APP_NAME}-{s}-feather')
+                for s in ('ref', 'doc', 'ref-doc')]
+
+    @property
+    def is_stale(self):
+        """True if the SQLite file is missing or older than any feather."""
+        if not self.path.exists():
+            return True
+        mtime = self.path.stat().st_mtime_ns
+        return any(p.stat().st_mtime_ns > mtime for p in self.feather_paths() if p.exists())
+
+    @property
+    def schema(self):
+        """Column types of the frames the file is built from (see schema) and file layout."""
+        types = SCHEMA_VERSION.decode() if self.lib.compact_dtypes else 'plain'
+        return f'{types}-{LAYOUT_VERSION}'
+
+    @property
+    def con(self):
+        """Open connection, (re)building the database file first if stale."""
+        if self._con is None:
+            if self.is_stale:
+                self.build()
+            meta = self._open()
+            if meta.get('schema') != self.schema:
+                self.build()
+                meta = self._open()
+            self._dtypes = json.loads(meta['dtypes'])
+            self._categories = json.loads(meta['categories'])
+        return self._con
+
+    def _open(self):
+        """Connect to the file and return its _meta entries."""
+        self.close()
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.create_function('regexp', 2, _regexp, deterministic=True)
+        return dict(self._con.execute('select key, value from _meta').fetchall())
+
+    def close(self):
+        """Close the connection; the next query re-checks staleness."""
+        if self._con is not None:
+            self._con.close()
+        self._con = None
+        self._dtypes = None
+        self._categories = None
+
+    @staticmethod
+    def _to_sql(df, table, con, categories):
+        """
+        Write df with a _row position column; timestamps as UTC nanoseconds,
+        categoricals as their values (the categories are added to categories).
+        """
+        out = {'_row': np.arange(len(df))}
+        for c in df.columns:
+            s = df[c]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                categories[c] = s.cat.categories.tolist()
+                s = s.astype(object)
+            elif isinstance(s.dtype, pd.api.extensions.ExtensionDtype) and s.dtype.kind in 'iu':
+                s = s.astype(object).where(s.notna(), None)
+            if isinstance(s.dtype, pd.DatetimeTZDtype):
+                s = s.dt.tz_convert('UTC').dt.tz_localize(None)
+            if pd.api.types.is_datetime64_dtype(s.dtype):
+                s = pd.Series(np.where(s.isna(), None, s.dt.as_unit('ns').array.asi8),
+                              dtype=object)
+            out[c] = s.to_numpy()
+        pd.DataFrame(out).to_sql(table, con, index=False)
+        return {c: str(df[c].dtype) for c in df.columns}
+
+    def build(self):
+        """Write the frames, exploded authors and database table to a new SQLite file."""
+        logger.info('Building %s', self.path)
+        self.close()
+        ref, doc, ref_doc = (self.lib.load_columns(name)
+                             for name in ('ref_df', 'doc_df', 'ref_doc_df'))
+        tmp = tmp_path(self.path)
+        tmp.unlink(missing_ok=True)
+        con = sqlite3.connect(tmp)
+        categories = {'ref': {}, 'doc': {}, 'ref_doc': {}}
+        dtypes = {'ref': self._to_sql(ref, 'ref', con, categories['ref']),
+                  'doc': self._to_sql(doc, 'doc', con, categories['doc']),
+                  'ref_doc': self._to_sql(ref_doc, 'ref_doc', con, categories['ref_doc'])}
+        db_categories = {}
+        authors = ref['author'].str.split(' and ').explode()
+        pd.DataFrame({'_row': np.arange(len(authors)),
+                      'ref_row': authors.index.to_numpy(),
+                      'author': authors.to_numpy()}).to_sql('ref_author', con, index=False)
+        con.executescript('''
+            create index ref_row on ref(_row);
+            create index ref_author_ref_row on ref_author(ref_row);
+            create index ref_doc_tag on ref_doc(tag);
+            create index doc_path on doc(path);
+            ''')
+        # same columns (and _x/_y suffixes) as ref_doc.merge(exploded refs).merge(doc)
+        left = ['path'] + [c for c in ref.columns if c != 'tag']
+        right = [c for c in doc.columns if c != 'path']
+        both = set(left) & set(right)
+        select = ['r."tag" as "tag"', 'rd."path" as "path"']
+        db_dtypes = {'tag': dtypes['ref']['tag'], 'path': dtypes['ref_doc']['path']}
+        for c in ref.columns:
+            if c in ('tag', 'path'):
+                continue
+            alias = f'{c}_x' if c in both else c
+            source = 'ra."author"' if c == 'author' else f'r.{_q(c)}'
+            select.append(f'{source} as {_q(alias)}')
+            db_dtypes[alias] = dtypes['ref'][c]
+            if c in categories['ref']:
+                db_categories[alias] = categories['ref'][c]
+        for c in right:
+            alias = f'{c}_y' if c in both else c
+            source = f'd.{_q(c)}'
+            if c in self.fill_zero:
+                source = f'coalesce({source}, 0)'
+            select.append(f'{source} as {_q(alias)}')
+            db_dtypes[alias] = dtypes['doc'][c]
+            if c in categories['doc']:
+                db_categories[alias] = categories['doc'][c]
+        select.append('ra._row as _ra, rd._row as _rd, d._row as _d')
+        con.execute(f'''
+            create temp view joined as select {', '.join(select)}
+            from ref_author ra
+            join ref r on r._row = ra.ref_row
+            left join ref_doc rd on rd.tag = r.tag
+            left join doc d on d.path = rd.path''')
+        # the merge in Library._database_row_map orders rows by exploded
+        # author then ref-doc row; each has at most one doc. A table, as
+        # _row needs the whole join (see the module docstring)
+        columns = ', '.join(_q(c) for c in db_dtypes)
+        con.execute(f'''
+            create table database as select
+            row_number() over (order by _ra, _rd, _d) - 1 as _row, {columns}
+            from joined order by _row''')
+        # pandas fills unmatched rows with NaN before fillna(0), making them float
+        if con.execute('select exists(select 1 from joined where _d is null)').fetchone()[0]:
+            for c in self.fill_zero:
+                alias = f'{c}_y' if c in both else c
+                if alias in db_dtypes and db_dtypes[alias].startswith('int'):
+                    db_dtypes[alias] = 'float64'
+        dtypes['database'] = db_dtypes
+        categories['database'] = db_categories
+        con.execute('create table _meta (key text primary key, value text)')
+        con.execute("insert into _meta values ('dtypes', ?)", (json.dumps(dtypes),))
+        con.execute("insert into _meta values ('categories', ?)", (json.dumps(categories),))
+        con.execute("insert into _meta values ('schema', ?)", (self.schema,))
+        con.commit()
+        con.close()
+        os.replace(tmp, self.path)
+
+    def columns(self, name):
+        """Public columns of frame name, in pandas order."""
+        return pd.Index(list(self._dtypes_for(name)))
+
+    def _dtypes_for(self, name):
+        self.con
+        return self._dtypes[self.tables[name]]
+
+    def compile(self, name, spec, fields, bang_field, recent_field):
+        """
+        Compile spec into (select sql, count sql, params).
+
+        Raises SqlUnsupported for where terms with no faithful SQL translation.
+        """
+        dtypes = self._dtypes_for(name)
+        table = self.tables[name]
+        conditions = []
+        params = []
+        if spec['where']:
+            try:
+                terms = split_where(spec['where'])
+            except ValueError as e:
+                raise SqlUnsupported(str(e))
+            for ident, op, value in terms:
+                if ident not in dtypes:
+                    raise SqlUnsupported(f'unknown column {ident!r}')
+                quoted = value[0] in '"\''
+                number = dtypes[ident].lower().startswith(('int', 'uint', 'float'))
+                if dtypes[ident] in ('object', 'str', 'string', 'category') and quoted:
+                    params.append(value[1:-1])
+                elif number and not quoted:
+                    params.append(float(value))
+                elif number and 'int' in dtypes[ident].lower() and re.fullmatch(r'-?\d+', value[1:-1]):
+                    # quoted integers compare as numbers, see querex.where_mask
+                    params.append(float(value[1:-1]))
+                else:
+                    raise SqlUnsupported(f'cannot compare {ident} ({dtypes[ident]}) with {value}')
+                conditions.append(f'{_q(ident)} {"=" if op == "==" else op} ?')
+        for field, pattern in spec['regex']:
+            if field == 'BANG':
+                field = bang_field
+            if field not in dtypes:
+                raise ValueError(f"Unknown field for regex filtering: '{field}'")
+            if dtypes[field].startswith('datetime'):
+                raise SqlUnsupported(f'cannot regex filter timestamp {field!r}')
+            try:
+                _compile(pattern)
+            except re.error:
+                print(f'Regular expression error with {pattern}...ignoring.')
+                continue
+            conditions.append(f'{_q(field)} regexp ?')
+            params.append(pattern)
+        where = f' where {" and ".join(conditions)}' if conditions else ''
+
+        if 'recent' in spec['flags']:
+            sort = [(recent_field, False)]
+        else:
+            sort = list(spec['sort'])
+        for c, _ in sort:
+            if c not in dtypes:
+                raise KeyError(c)
+        order = [f'{_q(c)} {"asc" if asc else "desc"} nulls last' for c, asc in sort] + ['_row']
+        # nanoseconds as text: read as numbers, those with nulls would be floats
+        columns = [f'cast({_q(c)} as text) as {_q(c)}' if dtypes[c].startswith('datetime')
+                   else _q(c) for c in fields]
+        select = f'select {", ".join(columns)}, _row'
+        sql = f'{select} from {table}{where} order by {", ".join(order)}'
+        if spec['top'] > 0:
+            sql += f' limit {int(spec["top"])}'
+        count_sql = f'select count(*) from {table}{where}'
+        return sql, count_sql, params
+
+    def _restore_dtypes(self, df, dtypes, categories):
+        """
+        Restore source dtypes: timestamps (unit and time zone) from Int64
+        nanoseconds, categoricals, nullable integers and number widths.
+        """
+        for c in df.columns:
+            dtype = dtypes.get(c, '')
+            if c in categories:
+                df[c] = df[c].astype(pd.CategoricalDtype(categories[c]))
+                continue
+            if dtype.startswith(('Int', 'UInt')):
+                df[c] = df[c].astype(dtype)
+                continue
+            if dtype.startswith('datetime64'):
+                dtype = pd.api.types.pandas_dtype(dtype)
+                ts = pd.to_datetime(df[c], unit='ns', utc=True)
+                ts = (ts.dt.tz_convert(dtype.tz) if isinstance(dtype, pd.DatetimeTZDtype)
+                      else ts.dt.tz_localize(None))
+                df[c] = ts.dt.as_unit(dtype.unit)
+            elif dtype.startswith(('int', 'float')) and str(df[c].dtype) != dtype:
+                df[c] = df[c].astype(dtype)
+        return df
+
+    def querex(self, name, expr, base_cols, bang_field, recent_field, result_cache=None,
+               cancel=None):
+        """
+        Run querex expr against frame name in SQL, falling back to pandas if needed.
+
+        Setting cancel, an optional threading.Event, interrupts the statement
+        (checked every PROGRESS_STEPS virtual machine steps) with QueryCancelled.
+        """
+        expr = expr.strip()
+        key = None
+        if result_cache is not None:
+            key = (name, result_cache.generation, normalize_query(expr))
+            cached = result_cache.get(key)
+            if cached is not None:
+                return cached
+        spec = cached_parser(expr)
+        dtypes = self._dtypes_for(name)
+        fields = select_fields(list(dtypes), spec, base_cols, recent_field)
+        try:
+            sql, count_sql, params = self.compile(name, spec, fields, bang_field, recent_field)
+        except SqlUnsupported as e:
+            logger.info('SQL backend: %s...using pandas.', e)
+            return getattr(self.lib, name).querex(expr, cancel=cancel)
+        logger.debug('querex sql: %s %s', sql, params)
+        if cancel is not None:
+            self.con.set_progress_handler(cancel.is_set, PROGRESS_STEPS)
+        try:
+            df = pd.read_sql_query(sql, self.con, params=params, dtype={
+                c: 'Int64' for c in fields if dtypes[c].startswith('datetime')})
+            if spec['top'] > 0:
+                qx_unrestricted_len = self.con.execute(count_sql, params).fetchone()[0]
+            else:
+                qx_unrestricted_len = len(df)
+        except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+            if cancel is not None and cancel.is_set():
+                raise QueryCancelled('Query cancelled') from e
+            raise
+        finally:
+            if cancel is not None:
+                self.con.set_progress_handler(None, 0)
+        # positions in the pandas frame, as the pandas engine's index
+        df = df.set_index('_row')
+        df.index = df.index.astype(np.int64)
+        df.index.name = None
+        df = self._restore_dtypes(df, dtypes, self._categories.get(self.tables[name], {}))
+        df = decorate_result(df, expr, spec['top'], qx_unrestricted_len,
+                             null_is_empty=self.lib.compact_dtypes)
+        if key is not None:
+            result_cache.put(key, df)
+        return df
+
+    def target(self, name):
+        """Frame-like query target for the cli: columns and querex."""
+        return SqlTarget(self, name)
+
+
+class SqlTarget():
+    """Stand in for a library frame that answers querex from SQL."""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.name = name
+
+    @property
+    def columns(self):
+        return self.backend.columns(self.name)
+
+    def querex(self, expr, cancel=None):
+        lib = self.backend.lib
+        base_cols, bang_field, recent_field = lib.querex_settings[self.name]
+        return self.backend.querex(self.name, expr, base_cols, bang_field, recent_field,
+                                   result_cache=lib._result_cache, cancel=cancel)
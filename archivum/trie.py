@@ -97,3 +97,73 @@ class Trie:
 
         collect(node, prefix)
         return results
+
+    def keys(self):
+        """All keys, sorted."""
+        results = []
+        stack = [(self.root, '')]
+        while stack:
+            node, path = stack.pop()
+            if node.value is not None:
+                results.append(path)
+            # reversed so the smallest child is popped first
+            for char in sorted(node.children, reverse=True):
+                stack.append((node.children[char], path + char))
+        return results
+
+    def to_bytes(self):
+        """
+        Compact serialization: the sorted keys, front coded (see front_code).
+
+        Values are not kept; from_bytes sets each to its key, as insert does by
+        default.
+        """
+        return front_code(self.keys())
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Trie from to_bytes data, creating each node once."""
+        trie = cls()
+        # path[i] is the node at depth i along the previous key
+        path = [trie.root]
+        for shared, rest, key in _front_records(data):
+            del path[shared + 1:]
+            node = path[-1]
+            for char in rest:
+                node = node.children.setdefault(char, TrieNode())
+                path.append(node)
+            node.value = key
+        return trie
+
+
+def front_code(keys):
+    """
+    Sorted distinct strings keys front coded as bytes: each key is stored as
+    the length of the prefix it shares with the previous key and the rest.
+    """
+    records = []
+    previous = ''
+    for key in keys:
+        shared = 0
+        for a, b in zip(previous, key):
+            if a != b:
+                break
+            shared += 1
+        records.append(f'{shared},{key[shared:]}')
+        previous = key
+    return '\0'.join(records).encode()
+
+
+def _front_records(data):
+    """(shared length, rest, key) for each key of front coded data."""
+    key = ''
+    for record in bytes(data).decode().split('\0') if len(data) else []:
+        shared, _, rest = record.partition(',')
+        shared = int(shared)
+        key = key[:shared] + rest
+        yield shared, rest, key
+
+
+def front_decode(data):
+    """The keys of front coded data, see front_code."""
+    return [key for _, _, key in _front_records(data)]
@@ -0,0 +1,145 @@
+"""
+Trigram index to prefilter regex queries.
+
+Indexes the distinct values of a string column (see
+``querex.factorize_strings``) by their lowercase character trigrams. The
+literals every match of a regex must contain are extracted from the parsed
+pattern; only values containing all of their trigrams are candidates and the
+real regex runs on those alone. Patterns with no literal of three or more
+characters return no candidates and the caller scans every value.
+
+Matching is case insensitive, as in querex. Python ``re`` folds some
+non-ASCII characters onto ASCII letters (the Kelvin sign matches k), so
+values with any non-ASCII character are always candidates and literals stop
+at non-ASCII characters. The candidates are therefore always a superset of
+the matches and results never change.
+
+Postings are stored flat as numpy arrays: sorted trigram keys, offsets into
+one array of value ids, so even a large index is a handful of objects.
+"""
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:                                  # Python < 3.11
+    import sre_parse
+    import sre_constants
+import re
+
+import numpy as np
+import pandas as pd
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+if hasattr(sre_constants, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_constants.POSSESSIVE_REPEAT)
+
+
+def required_literals(pattern):
+    """
+    Return the literal strings that every match of regex pattern contains.
+
+    Only runs of plain (ASCII) literal characters in the top level sequence,
+    in groups and in repeats of at least one are used; alternations and
+    optional parts are skipped. Lowercased. Returns [] for invalid patterns.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, RecursionError):
+        return []
+    ans = []
+    _collect(parsed, ans)
+    return [i.lower() for i in ans]
+
+
+def _collect(items, ans):
+    run = []
+    for op, av in items:
+        if op is sre_constants.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        if run:
+            ans.append(''.join(run))
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            _collect(av[-1], ans)
+        elif op in _REPEATS and av[0] >= 1:
+            _collect(av[2], ans)
+    if run:
+        ans.append(''.join(run))
+
+
+def _trigram_keys(buf):
+    """Integer keys of the byte trigrams starting at each position of buf."""
+    b = buf.astype(np.int32)
+    return (b[:-2] << 16) | (b[1:-1] << 8) | b[2:]
+
+
+class TrigramIndex():
+    """Inverted index from lowercase trigrams to ids of distinct values."""
+
+    def __init__(self, values):
+        """
+        Index values, a sequence of strings (missing values allowed).
+
+        Value ids are positions in values, e.g. the uniques from pd.factorize.
+        """
+        s = pd.Series(values, dtype=object)
+        n = len(s)
+        ascii = s.map(lambda v: isinstance(v, str) and v.isascii()).to_numpy(dtype=bool)
+        self.n_values = n
+        # non-ASCII values may match ASCII literals case insensitively: always candidates
+        self.always = np.flatnonzero(~ascii & s.notna().to_numpy())
+        text = s[ascii].str.lower()
+        ids = np.flatnonzero(ascii)
+        # join the values with a separator and take every trigram that does
+        # not straddle two values
+        lengths = text.str.len().to_numpy(dtype=np.int64) + 1
+        buf = np.frombuffer(('\0'.join(text) + '\0').encode('ascii'), dtype=np.uint8)
+        owner = np.repeat(ids, lengths)
+        if len(buf) >= 3:
+            keys = _trigram_keys(buf)
+            ok = (buf[1:-1] != 0) & (buf[2:] != 0) & (buf[:-2] != 0)
+            pairs = (keys[ok].astype(np.int64) << 32) | owner[:-2][ok]
+            # sort and drop repeats, much faster than np.unique here
+            pairs.sort()
+            pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+        else:
+            pairs = np.array([], dtype=np.int64)
+        trigrams = (pairs >> 32).astype(np.int32)
+        self.ids = (pairs & 0xFFFFFFFF).astype(np.int32)
+        first = np.flatnonzero(np.diff(trigrams, prepend=-1))
+        self.trigrams = trigrams[first]
+        self.starts = np.append(first, len(self.ids))
+
+    def __len__(self):
+        return len(self.trigrams)
+
+    @property
+    def nbytes(self):
+        """Memory used by the postings."""
+        return self.ids.nbytes + self.trigrams.nbytes + self.starts.nbytes + self.always.nbytes
+
+    def postings(self, trigram):
+        """Sorted ids of values containing trigram (a three character string)."""
+        key = _trigram_keys(np.frombuffer(trigram.encode('ascii'), dtype=np.uint8))[0]
+        i = np.searchsorted(self.trigrams, key)
+        if i == len(self.trigrams) or self.trigrams[i] != key:
+            return self.ids[:0]
+        return self.ids[self.starts[i]:self.starts[i + 1]]
+
+    def candidates(self, pattern):
+        """
+        Sorted ids of values that can match regex pattern, or None to scan all values.
+        """
+        grams = {lit[i:i + 3] for lit in required_literals(pattern)
+                 for i in range(len(lit) - 2)}
+        if not grams:
+            return None
+        # shortest posting lists first keeps the intersections small
+        lists = sorted((self.postings(g) for g in grams), key=len)
+        ans = lists[0]
+        for p in lists[1:]:
+            if len(ans) == 0:
+                break
+            ans = np.intersect1d(ans, p, assume_unique=True)
+        return np.union1d(ans, self.always)
@@ -8,27 +8,31 @@ import unicodedata
 import numpy as np
 import pandas as pd
 
-from greater_tables import GT
-
 # the imported global formatter, set using make_fGT
 #
 fGT = None
 
 
+def GT(*args, **kwargs):
+    """greater_tables GT, imported on first use (it imports IPython, which is slow)."""
+    from greater_tables import GT
+    return GT(*args, **kwargs)
+
+
 def safe_int(s):
     """
     Safe format of s as a year for greater_tables.
 
     By default s may be interpreted as a float so str(x) give 2015.0
-    which is not wanted. Hence this function is needed.
+    which is not wanted. Hence this function is needed. Missing values
+    (nulls in compact frames) show as ''.
     """
+    if _is_missing(s):
+        return ''
     try:
         return f'{int(s)}'
-    except ValueError:
-        if s == '':
-            return ''
-        else:
-            return s
+    except (ValueError, TypeError):
+        return s
 
 
 def safe_file_size(s):
@@ -38,6 +42,8 @@ def safe_file_size(s):
     By default s may be interpreted as a float so str(x) give 2015.0
     which is not wanted. Hence this function is needed.
     """
+    if _is_missing(s):
+        return ''
     try:
         sz = int(s)
         if sz < 1 << 10:
@@ -52,11 +58,8 @@ def safe_file_size(s):
             return f'{sz >> 40:,d}TB'
         else:
             return f'{sz >> 50:,d}PB'
-    except ValueError:
-        if s == '':
-            return ''
-        else:
-            return s
+    except (ValueError, TypeError):
+        return s
 
 
 def default_formatter(x):
@@ -64,13 +67,26 @@ def default_formatter(x):
     For raw columns.
 
     The issue is that cols with ints and '' strings are not recognized as int by GT.
+    Missing values show as ''.
     """
-    if isinstance(x, int):
+    if isinstance(x, (int, np.integer)):
         return f'{x:d}'
+    elif _is_missing(x):
+        return ''
     else:
         return str(x)
 
 
+def _is_missing(x):
+    """True for '' and scalar nulls (None, NaN, NA, NaT)."""
+    if isinstance(x, str):
+        return x == ''
+    try:
+        return bool(pd.isna(x))
+    except (TypeError, ValueError):
+        return False
+
+
 def make_fGT(max_table_width=12, **kwargs):
     global fGT
     fGT = partial(GT,
@@ -0,0 +1,37 @@
+"""
+Memory of a library's frames as imported and in the compact schema.
+
+Prints schema.memory_report for ref_df, doc_df, ref_doc_df and the exploded
+database of an existing library (run it on a large one), then the totals.
+Compact libraries are converted back to plain frames first, so before is
+always the frame as imported.
+
+    python benchmarks/compact_memory.py library-name
+"""
+
+import sys
+
+import pandas as pd
+
+from archivum.library import Library
+from archivum.schema import memory_report, plain_frame
+
+FRAMES = ['ref_df', 'doc_df', 'ref_doc_df', 'database']
+
+
+def compact_memory(name):
+    """Dict frame name -> memory_report of library name's frame."""
+    lib = Library(name)
+    return {frame: memory_report(plain_frame(lib.load_columns(frame))) for frame in FRAMES}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__.strip().splitlines()[-1].strip())
+    pd.set_option('display.width', 120)
+    reports = compact_memory(sys.argv[1])
+    for frame, report in reports.items():
+        print(f'\n{frame}\n{report}')
+    totals = pd.DataFrame({frame: report.loc['total', ['before', 'after', 'ratio']]
+                           for frame, report in reports.items()}).T
+    print(f'\nMB\n{totals.assign(before=totals.before / 2**20, after=totals.after / 2**20)}')
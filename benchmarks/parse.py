@@ -0,0 +1,49 @@
+"""
+Parse latency of querex expressions: a fresh parser per query against the shared ones.
+
+Modes, each timed over QUEREX_TEST_CASES (error cases included) n times:
+
+    fresh earley    a new earley ArcParser for every query (the old behavior)
+    shared earley   one earley parser for the process
+    cached lalr     a new lalr ArcParser for every query, from the grammar cache
+    shared lalr     one lalr parser for the process (the default)
+
+    python benchmarks/parse.py [n]
+"""
+
+import sys
+import time
+
+from archivum.parser import QUEREX_TEST_CASES, ArcParser, ArcTransformer, get_parser
+
+
+def parse_benchmark(n=20, cases=None):
+    """Dict mode -> mean ms per parse over cases (default QUEREX_TEST_CASES) repeated n times."""
+    cases = QUEREX_TEST_CASES if cases is None else cases
+    modes = {
+        'fresh earley': lambda: ArcParser(parser_type='earley'),
+        'shared earley': lambda: get_parser('earley'),
+        'cached lalr': lambda: ArcParser(parser_type='lalr'),
+        'shared lalr': lambda: get_parser('lalr'),
+    }
+    # warm the shared parsers and the cache file so only parsing is timed
+    get_parser('earley')
+    get_parser('lalr')
+    ans = {}
+    for mode, make in modes.items():
+        start = time.perf_counter()
+        for _ in range(n):
+            for text in cases:
+                try:
+                    ArcTransformer().transform(make().parse(text))
+                except Exception:
+                    pass
+        ans[mode] = 1000 * (time.perf_counter() - start) / (n * len(cases))
+    return ans
+
+
+if __name__ == '__main__':
+    ans = parse_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    base = ans['fresh earley']
+    for mode, ms in ans.items():
+        print(f'{mode:<15s} {ms:9.3f} ms/parse {base / ms:8.1f}x')
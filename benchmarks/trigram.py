@@ -0,0 +1,109 @@
+"""
+Regex filter time with and without the trigram index on a synthetic database.
+
+The database is exploded like a real library (a reference once per author
+and document), n rows, about n / 4 distinct titles. Each pattern is timed as
+a full scan of the distinct values and through TrigramIndex.candidates, and
+the two results are checked to agree.
+
+    python benchmarks/trigram.py [n]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from archivum.querex import factorize_strings
+from archivum.trigram import TrigramIndex
+
+
+def synthetic_database(n=1_000_000, seed=0):
+    """
+    Synthetic exploded database with n rows of title, author, journal and path.
+
+    Values repeat as in a real library: a reference appears once per author
+    and document, so there are about n / 4 distinct titles.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(['risk', 'measure', 'capital', 'allocation', 'insurance', 'pricing',
+                      'coherent', 'spectral', 'distortion', 'optimal', 'reinsurance',
+                      'portfolio', 'theory', 'model', 'equilibrium', 'market', 'loss',
+                      'reserving', 'credibility', 'bayesian', 'copula', 'tail', 'value',
+                      'expected', 'shortfall', 'diversification', 'premium', 'principle',
+                      'catastrophe', 'bond', 'default', 'systemic', 'stochastic', 'order'])
+    surnames = np.array([f'{a}{b}' for a in ['Wang', 'Smith', 'Delbaen', 'Embrechts', 'Kusuoka',
+                                             'Artzner', 'Eber', 'Heath', 'Mildenhall', 'Major',
+                                             'Buhlmann', 'Gerber', 'Shiu', 'Denuit', 'Dhaene']
+                         for b in ['', 'son', 'er', 'ski', 'ova']])
+    initials = np.array(list('ABCDEFGHJKLMNPRSTW'))
+    n_refs = max(n // 4, 1)
+    title_words = rng.choice(words, size=(n_refs, 6))
+    titles = pd.Series([' '.join(t).capitalize() + f' {i}' for i, t in enumerate(title_words)])
+    authors = pd.Series(surnames[rng.integers(len(surnames), size=n_refs * 2)]).str.cat(
+        initials[rng.integers(len(initials), size=n_refs * 2)], sep=', ')
+    journals = np.array([f'{a} {b}' for a in ['Annals of', 'Journal of', 'Review of', 'Insurance:']
+                         for b in ['Finance', 'Risk', 'Actuarial Science', 'Probability',
+                               'Economics', 'Mathematics']])
+    ref = rng.integers(n_refs, size=n)
+    return pd.DataFrame({
+        'title': titles.iloc[ref].to_numpy(),
+        'author': authors.iloc[ref * 2 + rng.integers(2, size=n)].to_numpy(),
+        'journal': journals[ref % len(journals)],
+        'path': [f'/lib/{j[:4]}/{r:07d}.pdf' for j, r in zip(journals[ref % len(journals)], ref)],
+    }).astype('str')
+
+
+def trigram_benchmark(n=1_000_000, patterns=None, repeats=3):
+    """
+    Time regex filters with and without the trigram index on a synthetic database.
+
+    Returns a DataFrame with, for each (field, pattern), the full scan and
+    indexed times in ms (over distinct values, as querex evaluates them),
+    the candidate count and the number of matching rows. Also checks the two
+    agree.
+    """
+    if patterns is None:
+        patterns = [('title', 'Risk Measure'), ('title', 'capital allocation'),
+                    ('title', r'spectral\s+risk'), ('title', 'coherent.*pricing 1\\d'),
+                    ('author', 'Wang, R'), ('author', '^Delbaen'), ('journal', 'Annals'),
+                    ('path', r'Jour/00012\d\d'), ('title', r'[a-z]+ing'), ('title', 'risk|loss')]
+    db = synthetic_database(n)
+    ans = []
+    for field in sorted({f for f, _ in patterns}):
+        t = time.perf_counter()
+        codes, uniques = factorize_strings(db[field])
+        index = TrigramIndex(uniques)
+        build = time.perf_counter() - t
+        print(f'{field}: {len(uniques):,d} distinct values, {len(index):,d} trigrams, '
+              f'{index.nbytes / (1 << 20):.1f} MB, built in {build:.2f}s')
+        values = pd.Series(uniques)
+        for f, pattern in patterns:
+            if f != field:
+                continue
+            t = time.perf_counter()
+            for _ in range(repeats):
+                hit = values.str.contains(pattern, regex=True, case=False, na=False).to_numpy()
+            scan = (time.perf_counter() - t) / repeats
+            t = time.perf_counter()
+            for _ in range(repeats):
+                cand = index.candidates(pattern)
+                if cand is None:
+                    hit2 = values.str.contains(pattern, regex=True, case=False, na=False).to_numpy()
+                else:
+                    hit2 = np.zeros(len(values), dtype=bool)
+                    hit2[cand] = values.iloc[cand].str.contains(
+                        pattern, regex=True, case=False, na=False).to_numpy()
+            indexed = (time.perf_counter() - t) / repeats
+            assert np.array_equal(hit, hit2), (field, pattern)
+            ans.append([field, pattern, scan * 1000, indexed * 1000,
+                        -1 if cand is None else len(cand),
+                        int(np.append(hit, False)[codes].sum())])
+    return pd.DataFrame(ans, columns=['field', 'pattern', 'scan_ms', 'indexed_ms',
+                                      'candidates', 'rows'])
+
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 120)
+    print(trigram_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000))
@@ -0,0 +1,140 @@
+"""
+Shared fixtures: small synthetic libraries in a temporary application folder.
+
+XDG_DATA_HOME (LOCALAPPDATA on Windows) points at the folder before archivum
+is imported, so BASE_DIR, the cli and subprocesses find the libraries by
+name and the user's own libraries are never touched.
+"""
+
+import os
+from pathlib import Path
+import random
+import shutil
+import tempfile
+
+DATA_HOME = Path(tempfile.mkdtemp(prefix='archivum-tests-'))
+os.environ['XDG_DATA_HOME'] = str(DATA_HOME)
+os.environ['LOCALAPPDATA'] = str(DATA_HOME)
+# never hand commands to a daemon the user is running
+os.environ['ARCHIVUM_DAEMON'] = '0'
+
+import pandas as pd        # noqa: E402
+import pytest              # noqa: E402
+import yaml                # noqa: E402
+
+from archivum import APP_NAME, BASE_DIR     # noqa: E402
+
+SURNAMES = ['Wang', 'Delbaen', 'Tsanakas', 'Boonen', 'Mildenhall', 'Smith', 'Jones', 'Müller',
+            'Li', 'Kim']
+INITIALS = ['R', 'F', 'A', 'T', 'S', 'J', 'K', 'M']
+JOURNALS = ['Annals of Statistics', 'ASTIN Bulletin', 'Insurance: Mathematics and Economics',
+            'Journal of Risk', '']
+WORDS = ['Risk', 'Measure', 'Capital', 'Allocation', 'Pricing', 'Insurance', 'Spectral',
+         'Distortion', 'Theory']
+
+
+# querex expressions the engines are checked on, with QUEREX_TEST_CASES; any
+# test taking a query argument runs once per expression
+QUERIES = [
+    'top 5 select path, size order -size', 'order journal', 'order -type, journal',
+    'where year > "2020" order -journal, year', 'top 20 order publisher',
+    'title ~ /risk.*measure/ and ! Wang', 'where links == 1 order -mod', 'nope ~ x',
+    'where nope == 3', 'order nope', 'title ~ /(/', 'select *, -title where year == "1999"',
+    'top 0 recent', 'where year == "1800"', 'recent top 50 select name, size',
+    'where mod > "2024-05"', 'where size > 5000000.0 order -mod',
+    'where create <= "2019-01-02" and size > 1.0', 'name ~ /doc1\\d/', 'author ~ /ü/',
+    'title ~ /\\bRisk/', 'top 3 order -arc-citations', 'where arc-citations > 3',
+    'journal ~ /^$/', 'where journal == ""', 'where year == ""', 'recent where year < "2000"',
+    'top 10 order size', 'top 12 order year', 'top 12 order -year, tag',
+]
+
+
+def pytest_generate_tests(metafunc):
+    if 'query' in metafunc.fixturenames:
+        from archivum.parser import QUEREX_TEST_CASES
+        queries = list(dict.fromkeys(QUEREX_TEST_CASES + QUERIES))
+        metafunc.parametrize('query', queries)
+
+
+def write_library(name, n=600, seed=1, **config):
+    """
+    Write library name with n synthetic references, about 0.8 n documents and
+    their links to BASE_DIR, as an import would: every column a string (bar
+    arc-citations), '' for missing values. config entries are added to the
+    library config, e.g. compact_dtypes=False. Returns the config path.
+    """
+    rng = random.Random(seed)
+    refs = []
+    for i in range(n):
+        authors = ' and '.join(f'{rng.choice(SURNAMES)}, {rng.choice(INITIALS)}.'
+                               for _ in range(rng.randint(1, 4)))
+        refs.append({'tag': f'T{i:06d}', 'type': rng.choice(['article', 'book', 'misc']),
+                     'author': authors, 'title': '{' + ' '.join(rng.sample(WORDS, 4)) + '}',
+                     'journal': rng.choice(JOURNALS),
+                     'year': str(rng.randint(1990, 2025)) if rng.random() < .9 else '',
+                     'volume': str(rng.randint(1, 40)) if rng.random() < .7 else '',
+                     'publisher': rng.choice(['Springer', 'Wiley', '']), 'file': '',
+                     'arc-citations': rng.randint(0, 50), 'arc-source': 'mendeley',
+                     'mendeley-tags': rng.choice(['', 'risk', 'todo'])})
+    ref_df = pd.DataFrame(refs)
+    docs = []
+    for i in range(int(n * .8)):
+        # file times have nanoseconds
+        docs.append({'name': f'doc{i}.pdf', 'path': f'/lib/{rng.choice("abc")}/doc{i}.pdf',
+                     'mod': (pd.Timestamp('2020-01-01', tz='UTC')
+                             + pd.Timedelta(minutes=rng.randint(0, 2_000_000))
+                             + pd.Timedelta(rng.randrange(60 * 10**9), 'ns')),
+                     'create': (pd.Timestamp('2019-01-01', tz='UTC') + pd.Timedelta(minutes=i)
+                                + pd.Timedelta(rng.randrange(60 * 10**9), 'ns')),
+                     'access': pd.Timestamp('2024-01-01', tz='UTC'), 'node': i, 'links': 1,
+                     'size': rng.randint(1000, 10**7), 'suffix': 'pdf', 'hash': f'{i:032x}'})
+    doc_df = pd.DataFrame(docs)
+    links = [{'tag': f'T{rng.randrange(n):06d}', 'path': d['path']} for d in docs]
+    ref_doc_df = pd.DataFrame(links).drop_duplicates().reset_index(drop=True)
+    config = {'name': name, 'description': 'synthetic test library',
+              'columns': list(ref_df.columns), 'bibtex_file': str(BASE_DIR / f'{name}.bib'),
+              'pdf_dir_name': '/lib', 'full_text': False, 'text_dir_name': 'pdf-full-text',
+              'extractor': 'pdftotext', 'file_formats': ['*.pdf'], 'hash_files': True,
+              'hash_workers': 2, 'last_indexed': 0, 'timezone': 'UTC',
+              'tablefmt': 'mixed_grid', 'max_table_width': 120, **config}
+    config_path = BASE_DIR / f'{name}.{APP_NAME}-config'
+    config_path.write_text(yaml.safe_dump(config, sort_keys=False))
+    for frame, suffix in ((ref_df, 'ref'), (doc_df, 'doc'), (ref_doc_df, 'ref-doc')):
+        frame.to_feather(BASE_DIR / f'{name}.{APP_NAME}-{suffix}-feather')
+    return config_path
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(DATA_HOME, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def make_library():
+    """Factory: make_library(name, n=600, seed=1, **config) writes library name once, returns name."""
+    made = set()
+
+    def make(name, n=600, seed=1, **config):
+        if name not in made:
+            write_library(name, n, seed, **config)
+            made.add(name)
+        return name
+
+    return make
+
+
+@pytest.fixture(scope='session', params=['plain', 'compact'])
+def library_name(request, make_library):
+    """
+    Name of the shared synthetic library, plain or with compact dtypes (the
+    same data); tests run on both and must not edit it.
+    """
+    if request.param == 'compact':
+        return make_library('synth-compact', compact_dtypes=True)
+    return make_library('synth')
+
+
+@pytest.fixture(scope='session')
+def library(library_name):
+    """The shared synthetic library, opened once; tests must not edit it."""
+    from archivum.library import Library
+    return Library(library_name)
@@ -0,0 +1,80 @@
+"""The database and tpath caches are reused while their fingerprint matches and rebuilt after."""
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from archivum.library import Library
+
+KINDS = ['database', 'tpath']
+
+
+def _stamp(path):
+    with pa.OSFile(str(path)) as source:
+        return pa.ipc.open_file(source).schema.metadata[b'archivum-fingerprint'].decode()
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Kinds passed to each Library._build_caches call."""
+    calls = []
+    build = Library._build_caches
+
+    def counted(self, kinds=('database', 'tpath')):
+        calls.append(tuple(kinds))
+        return build(self, kinds)
+
+    monkeypatch.setattr(Library, '_build_caches', counted)
+    return calls
+
+
+def _fresh(name):
+    """Library name opened with no cache files: everything built from the feathers."""
+    lib = Library(name)
+    for kind in KINDS:
+        lib._cache_path(kind).unlink(missing_ok=True)
+    return Library(name)
+
+
+def test_cache_reused_when_stamp_matches(make_library, builds):
+    name = make_library('cache-reuse', n=200, restore_snapshot=False)
+    lib = _fresh(name)
+    lib.database
+    lib.doc_df
+    assert sorted(k for kinds in builds for k in kinds) == KINDS
+    for kind in KINDS:
+        assert _stamp(lib._cache_path(kind)) == lib.fingerprint()
+    mtimes = [lib._cache_path(kind).stat().st_mtime_ns for kind in KINDS]
+    builds.clear()
+    again = Library(name)
+    pd.testing.assert_frame_equal(again.database, lib.database)
+    assert again.doc_df.tpath.equals(lib.doc_df.tpath)
+    assert not builds
+    assert [lib._cache_path(kind).stat().st_mtime_ns for kind in KINDS] == mtimes
+
+
+def test_cache_rebuilt_after_feather_changes(make_library, builds):
+    name = make_library('cache-stale', n=200, restore_snapshot=False)
+    lib = Library(name)
+    lib.database
+    lib.doc_df
+    old = lib.fingerprint()
+    # a second author for the first reference and a moved document
+    ref_path, doc_path = lib._feather_path('ref_df'), lib._feather_path('doc_df')
+    ref, doc = pd.read_feather(ref_path), pd.read_feather(doc_path)
+    ref.loc[0, 'author'] = ref.loc[0, 'author'] + ' and Cache, S.'
+    doc.loc[0, 'path'] = '/lib/moved/doc0.pdf'
+    ref.to_feather(ref_path)
+    doc.to_feather(doc_path)
+    builds.clear()
+    lib = Library(name)
+    assert lib.fingerprint() != old
+    database, tpath = lib.database, lib.doc_df.tpath
+    assert sorted(k for kinds in builds for k in kinds) == KINDS
+    for kind in KINDS:
+        assert _stamp(lib._cache_path(kind)) == lib.fingerprint()
+    assert (database.author == 'Cache, S.').any()
+    assert tpath.iloc[0] == lib._tpath(['/lib/moved/doc0.pdf'])[0]
+    fresh = _fresh(name)
+    pd.testing.assert_frame_equal(database, fresh.database)
+    pd.testing.assert_series_equal(tpath, fresh.doc_df.tpath)
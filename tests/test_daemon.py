@@ -0,0 +1,33 @@
+"""Commands run through a daemon on a private socket print what they print locally."""
+
+import io
+import os
+import time
+
+import pytest
+
+from archivum import daemon
+
+pytestmark = pytest.mark.skipif(not daemon.available(), reason='no Unix domain sockets')
+
+IDLE_TIMEOUT = 3
+
+
+def test_daemon_roundtrip(make_library, tmp_path):
+    name = make_library('synth')
+    path = tmp_path / 'check.sock'
+    assert daemon.start(path, IDLE_TIMEOUT) is not None
+    commands = [['open-library', name], ['list-libraries'],
+                ['query-library', '--once', 'top 10 recent'],
+                ['query-library', '--once', 'top 5 ! /Wang/ order -year']]
+    for args in commands:
+        buffer = io.StringIO()
+        status = daemon._send({'args': args, 'cwd': os.getcwd()}, path, buffer)
+        local, code = daemon.run_command(args)
+        assert status['exit'] == code == 0
+        assert buffer.getvalue() == local
+    # the queries ran on the library: tags are T and six digits
+    assert 'T0' in local
+    # the daemon exits when idle
+    time.sleep(IDLE_TIMEOUT + 1)
+    assert not path.exists()
@@ -0,0 +1,61 @@
+"""Incremental edits patch the database to equal a full rebuild from the edited frames."""
+
+import pandas as pd
+import pytest
+
+from archivum.library import Library
+
+# (method, args, kwargs), applied in order to one library
+EDITS = [
+    ('add_references', ([{'tag': 'E000001', 'author': 'Edit, A. and Wang, R.',
+                          'title': '{Edited Risk}', 'year': '2024', 'journal': 'Journal of Risk'},
+                         {'tag': 'E000002', 'author': 'Edit, B.', 'title': '{Second}'}],), {}),
+    ('add_documents', ([{'path': '/lib/e/e1.pdf', 'name': 'e1.pdf', 'size': 1234},
+                        {'path': '/lib/e/e2.pdf', 'name': 'e2.pdf'}],), {}),
+    ('link', ('E000001', '/lib/e/e1.pdf'), {}),
+    ('link', ('E000001', '/lib/e/e2.pdf'), {}),
+    ('link', ('T000003', '/lib/e/e2.pdf'), {}),
+    ('update_reference', ('T000003',), {'author': 'Edit, C. and Edit, D. and Edit, E.'}),
+    ('update_reference', ('E000001',), {'tag': 'E000003', 'title': '{Renamed}'}),
+    ('update_document', ('/lib/e/e2.pdf',), {'path': '/lib/e/moved.pdf', 'size': 99}),
+    ('unlink', ('E000003', '/lib/e/e1.pdf'), {}),
+    ('remove_documents', (['/lib/e/moved.pdf'],), {}),
+    ('remove_references', (['T000005', 'E000002'],), {}),
+    # links may name a document before it is added
+    ('link', ('T000007', '/lib/e/later.pdf'), {}),
+    ('add_documents', ({'path': '/lib/e/later.pdf', 'name': 'later.pdf'},), {}),
+]
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'compact'])
+def lib(request, make_library):
+    """A library with its database loaded; journal off, so edits stay in memory."""
+    suffix = '-compact' if request.param else ''
+    lib = Library(make_library(f'edits{suffix}', n=200, compact_dtypes=request.param,
+                               journal=False))
+    lib.database
+    return lib
+
+
+@pytest.mark.parametrize('n', range(1, len(EDITS) + 1))
+def test_patched_database_equals_rebuilt(lib, n):
+    for method, args, kwargs in EDITS[:n]:
+        getattr(lib, method)(*args, **kwargs)
+    assert lib.is_dirty
+    pd.testing.assert_frame_equal(lib.database, lib.rebuilt_database())
+    # and the database property's own build from the edited frames, which
+    # takes every resident column (the edits made them all resident)
+    database = lib.database
+    lib._database = pd.DataFrame()
+    pd.testing.assert_frame_equal(database, lib.database[database.columns])
+
+
+def test_edits_reach_the_database(lib):
+    for method, args, kwargs in EDITS:
+        getattr(lib, method)(*args, **kwargs)
+    db = lib.database
+    assert set(db.loc[db.tag == 'E000003', 'author']) == {'Edit, A.', 'Wang, R.'}
+    assert not db.tag.isin(['E000001', 'E000002', 'T000005']).any()
+    assert set(db.loc[db.tag == 'T000003', 'author']) == {'Edit, C.', 'Edit, D.', 'Edit, E.'}
+    assert not db.path.isin(['/lib/e/e2.pdf', '/lib/e/moved.pdf', '/lib/e/e1.pdf']).any()
+    assert (db.loc[db.tag == 'T000007', 'path'] == '/lib/e/later.pdf').any()
@@ -0,0 +1,34 @@
+"""Federated querex over a plain and a compact library merges as one concatenated frame."""
+
+import pandas as pd
+import pytest
+
+from archivum.federated import Federation
+from archivum.library import Library
+from archivum.querex import querex_work
+
+QUERIES = ['top 6 recent', 'top 4 order -year', 'top 5 order year', 'order year, -title',
+           'top 8 order journal', 'top 7 ! /Wang/ order -year, tag', 'top 3']
+
+
+@pytest.fixture(scope='module')
+def federation(make_library):
+    # the same data, year Int16 in one and str in the other
+    return Federation([make_library('synth'), make_library('synth-compact', compact_dtypes=True)])
+
+
+@pytest.mark.parametrize('name', ['ref_df', 'database'])
+@pytest.mark.parametrize('expr', QUERIES)
+def test_federated_matches_concatenated(federation, name, expr):
+    frames = []
+    for lib, lib_name in zip(federation.libraries, federation.names):
+        df = lib.load_columns(name).assign(library=lib_name)
+        # as the merge compares them: numbers, '' missing
+        frames.append(df.assign(year=pd.to_numeric(df['year'], errors='coerce')))
+    base_cols, bang_field, recent_field = Library.querex_settings[name]
+    expected = querex_work(pd.concat(frames, ignore_index=True), expr,
+                           ['library'] + base_cols, bang_field, recent_field)
+    actual = federation.querex(expr, name)
+    assert (actual[['library', 'tag']].values.tolist()
+            == expected[['library', 'tag']].values.tolist())
+    assert actual.qx_unrestricted_len == expected.qx_unrestricted_len
@@ -0,0 +1,90 @@
+"""Journaled edits and compactions survive a process killed at any point."""
+
+import itertools
+
+import pandas as pd
+import pytest
+
+from archivum.library import FRAMES, Library
+
+EDITS = [
+    ('add_references', ([{'tag': 'J000001', 'author': 'Journal, A. and Wang, R.',
+                          'title': '{Durable}', 'year': '2023'}],), {}),
+    ('add_documents', ({'path': '/lib/j/j1.pdf', 'name': 'j1.pdf', 'size': 10},), {}),
+    ('link', ('J000001', '/lib/j/j1.pdf'), {}),
+    ('update_reference', ('T000002',), {'title': '{Retitled}', 'author': 'Journal, B.'}),
+    ('update_document', ('/lib/j/j1.pdf',), {'path': '/lib/j/moved.pdf'}),
+    ('remove_references', (['T000004'],), {}),
+]
+
+_names = itertools.count()
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'compact'])
+def edited(request, make_library):
+    """(library name, its frames after EDITS); each test gets a fresh library."""
+    suffix = '-compact' if request.param else ''
+    name = make_library(f'journal{next(_names)}{suffix}', n=200,
+                        compact_dtypes=request.param, restore_snapshot=False)
+    lib = Library(name)
+    for method, args, kwargs in EDITS:
+        getattr(lib, method)(*args, **kwargs)
+    assert lib._journal.n_records == len(EDITS)
+    return name, _frames(lib)
+
+
+def _frames(lib):
+    ans = {name: lib.load_columns(name) for name in FRAMES}
+    ans['database'] = lib.database[sorted(lib.database.columns)]
+    return ans
+
+
+def _assert_frames_equal(lib, expected):
+    actual = _frames(lib)
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(actual[name], df[actual[name].columns], obj=name)
+
+
+def test_journal_replayed_after_crash(edited):
+    name, expected = edited
+    lib = Library(name)
+    # killed mid-append: a partial last record
+    with lib._journal.path.open('ab') as f:
+        f.write(b'{"op": "remove_references", "args": [["T0000')
+    lib = Library(name)
+    _assert_frames_equal(lib, expected)
+    # the partial record is cut off before the next append
+    lib.link('T000001', '/lib/j/moved.pdf')
+    lib = Library(name)
+    assert lib._journal.n_records == len(EDITS) + 1
+    assert ((lib.ref_doc_df.tag == 'T000001') & (lib.ref_doc_df.path == '/lib/j/moved.pdf')).any()
+
+
+@pytest.mark.parametrize('stop', ['before_marker', 'after_marker'])
+def test_interrupted_compaction_recovers(edited, stop, monkeypatch):
+    name, expected = edited
+
+    def killed(*args):
+        raise KeyboardInterrupt('killed')
+
+    lib = Library(name)
+    if stop == 'before_marker':
+        # killed after writing the new feathers, before the marker: the
+        # journal still applies to the old ones
+        monkeypatch.setattr('archivum.library.os.replace', killed)
+    else:
+        monkeypatch.setattr(Library, '_finish_compaction', killed)
+    with pytest.raises(KeyboardInterrupt):
+        lib.compact()
+    monkeypatch.undo()
+    assert lib._journal.exists()
+    assert lib._compaction_marker().exists() == (stop == 'after_marker')
+    lib = Library(name)
+    assert not lib._compaction_marker().exists()
+    if stop == 'after_marker':
+        # finished on open: the edits are in the feathers, the journal is gone
+        assert not lib._journal.exists() and not lib.is_dirty
+    _assert_frames_equal(lib, expected)
+    # and a compaction from here writes the same frames
+    lib.compact()
+    _assert_frames_equal(Library(name), expected)
@@ -0,0 +1,48 @@
+"""Threads sharing a Library: preload, column loads and the cache thread handoff."""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from archivum.library import Library
+
+
+class SlowLibrary(Library):
+    """Reading _cache_thread yields to other threads, widening any check-then-use race."""
+
+    @property
+    def _cache_thread(self):
+        time.sleep(0.01)
+        return self.__dict__['_cache_thread']
+
+    @_cache_thread.setter
+    def _cache_thread(self, value):
+        self.__dict__['_cache_thread'] = value
+
+
+def test_cache_thread_handoff(library_name):
+    lib = SlowLibrary(library_name)
+    lib._cache_thread = threading.Thread(target=time.sleep, args=(0.01,))
+    lib._cache_thread.start()
+
+    def cached(i):
+        # staggered, so some check the thread while another clears it
+        time.sleep(0.004 * i)
+        return lib._cached('tpath')
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(cached, range(8)))
+    assert lib._cache_thread is None
+    assert all(len(df) == len(results[0]) for df in results)
+
+
+def test_load_columns_during_preload(library_name):
+    lib = Library(library_name)
+    lib.preload()
+    names = ['database', 'ref_df', 'doc_df', 'database']
+    with ThreadPoolExecutor(4) as pool:
+        frames = list(pool.map(lib.load_columns, names))
+    lib.wait_preload()
+    for name, df in zip(names, frames):
+        assert list(df.columns) == lib.columns(name)
+    assert len(lib.querex('top 5 select * order -year')) == 5
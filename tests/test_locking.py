@@ -0,0 +1,79 @@
+"""
+Writers and readers in separate processes on a copy of the shared library.
+
+Writers add references, documents and links (journaled, compacting now and
+then); readers repeatedly open the library and check every link has its
+reference and document and is in the database. No edit may be lost and no
+reader may see a half-applied edit.
+"""
+
+import multiprocessing
+import shutil
+import time
+
+import numpy as np
+
+from archivum.library import Library
+
+SECONDS = 2
+
+
+def _writer(config, writer, seconds, seed):
+    lib = Library(config)
+    rng = np.random.default_rng(seed)
+    pdf_dir = str(lib.pdf_dir_name)
+    i = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        tag = f'Stress{writer}x{i}'
+        path = f'{pdf_dir}/stress/{tag}.pdf'
+        # three edits: a consistent view has the link only with both ends
+        lib.add_references({'tag': tag, 'author': f'Stress, W{writer}', 'title': f'Stress {i}'})
+        lib.add_documents({'path': path, 'name': f'{tag}.pdf'})
+        lib.link(tag, path)
+        i += 1
+        if rng.random() < 0.1:
+            lib.compact()
+    return i
+
+
+def _reader(config, seconds):
+    end = time.time() + seconds
+    reads = 0
+    messages = []
+    while time.time() < end:
+        lib = Library(config)
+        try:
+            ref_doc = lib.ref_doc_df
+            stress = ref_doc[ref_doc.tag.str.startswith('Stress')]
+            bad_refs = set(stress.tag) - set(lib.ref_df.tag)
+            bad_docs = set(stress.path) - set(lib.doc_df.path)
+            # the database of the same generation
+            missing = set(stress.tag) - set(lib.database.tag)
+            if bad_refs or bad_docs or missing:
+                messages.append(f'{len(bad_refs)} links without reference, '
+                                f'{len(bad_docs)} without document, {len(missing)} not in database')
+        except Exception as e:
+            messages.append(f'{type(e).__name__}: {e}')
+        reads += 1
+    return reads, messages[:5]
+
+
+def test_concurrent_writers_and_readers(library, tmp_path):
+    config = tmp_path / library.config_path.name
+    shutil.copy(library.config_path, config)
+    for name in ('ref_df', 'doc_df', 'ref_doc_df'):
+        shutil.copy(library._feather_path(name), tmp_path / library._feather_path(name).name)
+    with config.open('a') as f:
+        # compact every few edits as well
+        f.write('\njournal_max_records: 25\n')
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(4) as pool:
+        w = [pool.apply_async(_writer, (str(config), i, SECONDS, i)) for i in range(2)]
+        r = [pool.apply_async(_reader, (str(config), SECONDS)) for _ in range(2)]
+        writes = sum(res.get() for res in w)
+        reads = [res.get() for res in r]
+    assert writes > 0
+    for n, messages in reads:
+        assert n > 0 and not messages
+    assert Library(str(config)).ref_df.tag.str.startswith('Stress').sum() == writes
@@ -0,0 +1,53 @@
+"""The normalized database model answers querex exactly as the exploded database."""
+
+import pandas as pd
+import pytest
+
+from archivum.library import Library
+
+
+@pytest.fixture(scope='module')
+def lib(library_name):
+    return Library(library_name)
+
+
+def _querex(target, lib, query):
+    # each target's own result, not one cached by the other
+    lib._result_cache.bump()
+    try:
+        return target.querex(query)
+    except Exception as e:
+        return type(e).__name__
+
+
+def test_normalized_matches_database(lib, query):
+    expected = _querex(lib.database, lib, query)
+    actual = _querex(lib.normalized, lib, query)
+    if isinstance(expected, str) or isinstance(actual, str):
+        assert actual == expected
+        return
+    pd.testing.assert_frame_equal(actual, expected)
+    assert actual.qx_unrestricted_len == expected.qx_unrestricted_len
+
+
+def test_normalized_smaller(lib):
+    db = lib.load_columns('database')
+    assert lib.normalized.nbytes < db.memory_usage(deep=True).sum()
+
+
+@pytest.mark.parametrize('expr', ['author ~ /Wang, R/', '! /^Delbaen/ order -year',
+                                  'author ~ /ü/ and title ~ /risk/', 'where author == "Li, K."',
+                                  'top 5 author ~ /Smith/ order -size'])
+def test_normalized_author_matches_via_bridge(library_name, expr, monkeypatch):
+    expected = Library(library_name).database.querex(expr)
+    lib = Library(library_name)
+    norm = lib.normalized
+    # rows key into the bridge, no per row ref or author
+    assert not hasattr(norm, 'author') and not hasattr(norm, 'ref')
+    assert len(norm.ref_author) < len(norm)
+    # the exploded frame and its columns are never built
+    monkeypatch.setattr(Library, '_database_column',
+                        lambda self, c: pytest.fail(f'exploded column {c} built'))
+    actual = norm.querex(expr)
+    assert lib._database.empty
+    pd.testing.assert_frame_equal(actual, expected)
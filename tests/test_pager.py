@@ -0,0 +1,53 @@
+"""Paging commands, and only the rows of the page shown are formatted."""
+
+import pytest
+
+from archivum.pager import ResultPager
+
+
+@pytest.fixture(scope='module')
+def result(library):
+    return library.database.querex('select *')
+
+
+def test_paging_commands(result):
+    pager = ResultPager(result, page_size=25)
+    assert pager.paged and pager.pages == -(-len(result) // 25)
+    assert pager.command('n') and pager.page == 1
+    assert pager.command('p') and pager.page == 0
+    assert not pager.prev()
+    assert pager.command('g 51') and pager.page == 2
+    assert pager.command('g end') and pager.page == pager.pages - 1
+    assert not pager.next()
+    assert not pager.command('g x') and not pager.command('top 5')
+    assert pager.footer().startswith(f'Rows {pager.start + 1:,d}-{len(result):,d} of')
+
+
+def test_render_formats_one_page(result):
+    pager = ResultPager(result, page_size=10)
+    pager.goto(3)
+    shown = []
+    page = pager.render(lambda df, caption: shown.append((df, caption)) or 'page')
+    assert page == 'page'
+    df, caption = shown[0]
+    assert df.equals(result.iloc[30:40]) and caption == result.gt_caption
+
+
+def test_render_fgt_first_page(result):
+    # the first page of the whole result, through the real formatter
+    text = ResultPager(result, page_size=5).render()
+    assert str(result.iloc[0]['tag']) in str(text)
+
+
+def test_footer_counts_rows_shown(library):
+    top = library.database.querex('top 30 order tag')
+    assert top.qx_unrestricted_len > 30
+    pager = ResultPager(top, page_size=25)
+    matches = f'({top.qx_unrestricted_len:,d} matches)'
+    assert pager.footer().startswith(f'Rows 1-25 of 30 {matches}, page 1 of 2.')
+    pager.next()
+    assert pager.footer().startswith('Rows 26-30 of 30 (')
+    # one page: no paging keys
+    assert ResultPager(top, page_size=50).footer() == f'Rows 1-30 of 30 {matches}'
+    empty = library.database.querex('where year == "1800"')
+    assert ResultPager(empty).footer() == 'Rows 0-0 of 0'
@@ -0,0 +1,43 @@
+"""Shared parsers, the LALR grammar and the query spec cache."""
+
+import pytest
+
+from archivum.parser import (QUEREX_TEST_CASES, ArcTransformer, cached_parser, get_parser,
+                             normalize_query, spec_cache_info)
+
+
+def _spec(parser_type, text):
+    try:
+        return ArcTransformer().transform(get_parser(parser_type).parse(text))
+    except Exception:
+        # the two report a bad query with different lark exceptions
+        return 'error'
+
+
+def test_parsers_shared():
+    assert get_parser('lalr') is get_parser('lalr')
+    assert get_parser('earley') is get_parser('earley')
+
+
+@pytest.mark.parametrize('text', QUEREX_TEST_CASES)
+def test_lalr_agrees_with_earley(text):
+    assert _spec('lalr', text) == _spec('earley', text)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('TOP 10  Recent', 'top 10 recent'),
+    ('select Top where x == "A  B"', 'select Top where x == "A  B"'),
+    ('order -Year', 'order -Year'),
+    ('  author ~ /Wang,  R/  ', 'author ~ /Wang,  R/'),
+])
+def test_normalize_query(text, expected):
+    assert normalize_query(text) == expected
+
+
+def test_cached_parser_hits_and_read_only():
+    spec = cached_parser('top 3 order -year')
+    hits = spec_cache_info().hits
+    assert cached_parser('TOP 3   order -year') is spec
+    assert spec_cache_info().hits == hits + 1
+    with pytest.raises(TypeError):
+        spec['top'] = 5
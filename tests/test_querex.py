@@ -0,0 +1,103 @@
+"""The pandas querex engine: cancellation and the result cache."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from archivum import querex
+from archivum.library import Library
+from archivum.querex import QueryCancelled, querex_work, where_mask
+
+WHERES = ['year > "2020"', 'year == "1999" and links == 1', 'journal == ""',
+          'size > 5000000.0']
+
+
+class CancelAfter(threading.Event):
+    """Event that reports set from the n-th check on."""
+
+    def __init__(self, n):
+        super().__init__()
+        self.n = n
+        self.checks = 0
+
+    def is_set(self):
+        self.checks += 1
+        return self.checks >= self.n
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(querex, 'CHUNK_SIZE', 64)
+
+
+@pytest.mark.parametrize('where', WHERES)
+def test_chunked_where_mask(library, small_chunks, where):
+    df = library.load_columns('database')
+    assert len(df) > 4 * querex.CHUNK_SIZE
+    np.testing.assert_array_equal(where_mask(df, where, threading.Event()),
+                                  where_mask(df, where))
+
+
+def test_where_cancelled_between_chunks(library, small_chunks):
+    df = library.load_columns('database')
+    cancel = CancelAfter(3)
+    with pytest.raises(QueryCancelled):
+        where_mask(df, 'year > "2020"', cancel)
+    assert cancel.checks == 3
+    base_cols, bang_field, recent_field = Library.querex_settings['database']
+    cancel = CancelAfter(3)
+    with pytest.raises(QueryCancelled):
+        querex_work(df, 'where year > "2020"', base_cols, bang_field, recent_field,
+                    cancel=cancel)
+    assert cancel.checks == 3
+
+
+def test_result_cache_hit_on_normalized_query(library_name):
+    lib = Library(library_name)
+    first = lib.ref_df.querex('top 5 order -year')
+    info = lib.result_cache_info
+    assert info['entries'] == 1 and info['misses'] == 1
+    # same normalized query: the cached frame itself
+    assert lib.ref_df.querex('  TOP 5   order -year ') is first
+    assert lib.result_cache_info['hits'] == info['hits'] + 1
+    # other frame, same query: a separate entry
+    assert lib.database.querex('top 5 order -year') is not first
+    assert lib.result_cache_info['entries'] == 2
+
+
+def test_result_cache_miss_after_invalidate(library_name):
+    lib = Library(library_name)
+    first = lib.ref_df.querex('top 5 order -year')
+    generation = lib.result_cache_info['generation']
+    lib.invalidate()
+    assert lib.result_cache_info['generation'] == generation + 1
+    assert lib.result_cache_info['entries'] == 0
+    misses = lib.result_cache_info['misses']
+    again = lib.ref_df.querex('top 5 order -year')
+    assert again is not first and lib.result_cache_info['misses'] == misses + 1
+    assert again.equals(first)
+
+
+def test_result_cache_evicts_within_budget(make_library):
+    lib = Library(make_library('cache-budget', n=200, result_cache_mb=0.05))
+    budget = lib.result_cache_info['max_bytes']
+    assert budget == int(0.05 * (1 << 20))
+    queries = [f'top {n} order tag' for n in range(20, 220, 20)]
+    for expr in queries:
+        lib.ref_df.querex(expr)
+        assert lib.result_cache_info['nbytes'] <= budget
+    info = lib.result_cache_info
+    assert 0 < info['entries'] < len(queries)
+    # the most recent results stay, the least recently used went first
+    hits = lib.result_cache_info['hits']
+    lib.ref_df.querex(queries[-1])
+    assert lib.result_cache_info['hits'] == hits + 1
+    misses = lib.result_cache_info['misses']
+    lib.ref_df.querex(queries[0])
+    assert lib.result_cache_info['misses'] == misses + 1
+    # a result larger than the whole budget is not cached
+    lib.invalidate()
+    big = lib.database.querex('select *')
+    assert big.memory_usage(deep=True).sum() > budget
+    assert lib.result_cache_info['entries'] == 0
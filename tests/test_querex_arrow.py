@@ -0,0 +1,42 @@
+"""The Arrow engine selects and orders the same rows as the pandas engine."""
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from archivum.library import Library
+from archivum.parser import cached_parser
+from archivum.querex import _pandas_positions
+from archivum.querex_arrow import ArrowUnsupported, arrow_positions
+
+
+@pytest.fixture(scope='module', params=['ref_df', 'doc_df', 'database'])
+def frame(request, library_name):
+    """(frame name, all its columns resident, the same as an Arrow table)."""
+    lib = Library(library_name)
+    df = lib.load_columns(request.param)
+    return request.param, df, lib.arrow_table(request.param)
+
+
+def test_arrow_positions(frame, query):
+    name, df, table = frame
+    _, bang_field, recent_field = Library.querex_settings[name]
+    try:
+        spec = cached_parser(query.strip())
+        expected = _pandas_positions(df, spec, bang_field, recent_field)
+    except Exception:
+        # what pandas rejects arrow rejects (or hands back to pandas)
+        with pytest.raises(Exception):
+            arrow_positions(table, cached_parser(query.strip()), bang_field, recent_field)
+        return
+    try:
+        actual = arrow_positions(table, spec, bang_field, recent_field)
+    except (ArrowUnsupported, pa.ArrowException) as e:
+        pytest.skip(f'arrow engine hands back to pandas: {e}')
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_arrow_sort_no_warnings(library, recwarn):
+    table = library.arrow_table('doc_df')
+    arrow_positions(table, cached_parser('order -mod, size'), 'name', 'mod')
+    assert not [w for w in recwarn if issubclass(w.category, FutureWarning)]
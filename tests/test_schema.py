@@ -0,0 +1,81 @@
+"""The compact schema: round trips, memory, and plain libraries query as before it."""
+
+import pandas as pd
+import pytest
+from pyarrow import feather
+
+from archivum.library import Library
+from archivum.schema import compact_frame, is_compact, memory_report, plain_frame
+
+
+@pytest.fixture(scope='module')
+def plain(make_library):
+    """A plain (compact_dtypes off) library; tests only read it."""
+    return Library(make_library('synth'))
+
+
+@pytest.mark.parametrize('name', ['ref_df', 'doc_df', 'ref_doc_df'])
+def test_plain_frame_round_trip(plain, name):
+    df = pd.read_feather(plain._feather_path(name))
+    pd.testing.assert_frame_equal(plain_frame(compact_frame(df)), df)
+
+
+def test_compact_smaller(plain):
+    df = pd.read_feather(plain._feather_path('ref_df'))
+    assert (compact_frame(df).memory_usage(deep=True).sum()
+            < df.memory_usage(deep=True).sum())
+
+
+@pytest.mark.parametrize('name', ['ref_df', 'doc_df', 'ref_doc_df', 'database'])
+def test_memory_report(plain, name):
+    df = plain.load_columns(name)
+    report = memory_report(df)
+    assert report.index.tolist() == ['Index', *df.columns, 'total']
+    assert report.loc['total', 'before'] == df.memory_usage(deep=True).sum()
+    assert report.loc['total', 'after'] == compact_frame(df).memory_usage(deep=True).sum()
+    assert report.loc[['Index', *df.columns], ['before', 'after']].sum().tolist() == \
+        report.loc['total', ['before', 'after']].tolist()
+    # keys are never compacted; ref_doc_df is only keys
+    for key in {'tag', 'path'} & set(df.columns):
+        assert report.loc[key, 'ratio'] == 1 and report.loc[key, 'compact_dtype'] == 'str'
+    if name == 'ref_doc_df':
+        assert report.loc['total', 'ratio'] == 1
+    else:
+        assert report.loc['total', 'after'] < report.loc['total', 'before']
+    if 'journal' in df.columns:
+        assert report.loc['journal', 'compact_dtype'] == 'category'
+        assert report.loc['journal', 'ratio'] < 0.5
+
+
+def test_missing_values_query_as_empty(plain):
+    n = (plain.load_columns('ref_df')['journal'] == '').sum()
+    assert n
+    assert len(plain.ref_df.querex('where journal == ""')) == n
+    assert len(plain.ref_df.querex('journal ~ /^$/')) == n
+    assert len(plain.ref_df.querex('where year == ""'))
+    # missing years are '' and sort first
+    ref = plain.load_columns('ref_df').set_index('tag')
+    tags = plain.ref_df.querex('top 3 order year')['tag']
+    assert ref.loc[tags, 'year'].eq('').all()
+
+
+def test_all_missing_columns_kept(plain):
+    # the smallest documents are the references without one
+    df = plain.database.querex('top 10 order size')
+    assert 'create' in df.columns and df['create'].isna().all()
+
+
+def test_plain_library_reads_compact_files(make_library):
+    name = make_library('migrated', n=200)
+    expected = {f: pd.read_feather(Library(name)._feather_path(f))
+                for f in ('ref_df', 'doc_df')}
+    lib = Library(name)
+    lib.rewrite_feathers(compact=True)
+    assert is_compact(feather.read_table(lib._feather_path('ref_df')).schema)
+    lib = Library(name)
+    assert not lib.compact_dtypes
+    pd.testing.assert_frame_equal(lib.load_columns('ref_df'), expected['ref_df'])
+    pd.testing.assert_frame_equal(lib.load_columns('doc_df').drop(columns='tpath'),
+                                  expected['doc_df'], check_like=True)
+    lib.rewrite_feathers()
+    assert not is_compact(feather.read_table(lib._feather_path('ref_df')).schema)
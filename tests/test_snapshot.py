@@ -0,0 +1,56 @@
+"""A library restored from its snapshot equals one built from the feathers; stale snapshots are ignored."""
+
+import pandas as pd
+import pytest
+
+from archivum.library import Library
+from archivum.trie import front_decode
+
+FRAMES = ['ref_df', 'doc_df', 'ref_doc_df', 'database']
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['plain', 'compact'])
+def names(request, make_library):
+    """(library with a snapshot, the same data never restored from one)."""
+    suffix = '-compact' if request.param else ''
+    name = make_library(f'snap{suffix}', n=200, compact_dtypes=request.param)
+    fresh = make_library(f'snap-fresh{suffix}', n=200, compact_dtypes=request.param,
+                         restore_snapshot=False)
+    Library(name).write_snapshot()
+    return name, fresh
+
+
+def test_restored_equals_fresh(names):
+    name, fresh = names
+    restored, built = Library(name), Library(fresh)
+    assert restored.snapshot_info()['restored']
+    assert restored._database.shape[0] and built._database.empty
+    for frame in FRAMES:
+        pd.testing.assert_frame_equal(restored.load_columns(frame), built.load_columns(frame))
+    assert restored.author_trie.to_bytes() == built.author_trie.to_bytes()
+    assert restored.tag_allocator.existing == built.tag_allocator.existing
+    pd.testing.assert_frame_equal(restored.database.querex('top 20 ! /Wang/ order -year'),
+                                  built.database.querex('top 20 ! /Wang/ order -year'))
+
+
+def test_snapshot_tags_are_the_reference_tags(names):
+    lib = Library(names[0])
+    assert front_decode(lib._snapshot.blob('tags')) == sorted(lib.ref_df.tag)
+    # not a second copy of the authors
+    assert lib._snapshot.blob('tags') != lib._snapshot.blob('trie')
+    assert lib.tag_allocator('T000001') != 'T000001'
+
+
+def test_stale_snapshot_ignored(make_library):
+    name = make_library('snap-stale', n=100)
+    lib = Library(name)
+    lib.write_snapshot()
+    assert Library(name).snapshot_info()['restored']
+    path = lib._feather_path('ref_df')
+    df = pd.read_feather(path)
+    df.loc[0, 'title'] = '{Changed Since The Snapshot}'
+    df.to_feather(path)
+    lib = Library(name)
+    assert not lib.snapshot_info()['current'] and not lib.snapshot_info()['restored']
+    assert lib.ref_df.title.iloc[0] == '{Changed Since The Snapshot}'
+    assert (lib.database.title == '{Changed Since The Snapshot}').any()
@@ -0,0 +1,43 @@
+"""The SQLite backend returns the same frames as the pandas engine."""
+
+import pandas as pd
+import pytest
+
+from archivum.library import Library
+
+
+@pytest.fixture(scope='module')
+def libraries(library_name):
+    """(pandas engine library, sqlite engine library), both the shared library."""
+    sql = Library(library_name)
+    sql.query_engine = 'sqlite'
+    sql.sqlite.path.unlink(missing_ok=True)
+    return Library(library_name), sql
+
+
+def _querex(lib, name, query):
+    try:
+        return lib.query_target(name).querex(query)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('name', ['ref_df', 'doc_df', 'ref_doc_df', 'database'])
+def test_sqlite_matches_pandas(libraries, name, query):
+    expected, actual = (_querex(lib, name, query) for lib in libraries)
+    if isinstance(expected, type) or isinstance(actual, type):
+        assert isinstance(expected, type) and isinstance(actual, type)
+        return
+    # values, dtypes and index (positions in the source frame)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    assert actual.qx_unrestricted_len == expected.qx_unrestricted_len
+    assert actual.gt_caption == expected.gt_caption
+
+
+def test_sqlite_timestamps_exact(libraries):
+    # create is null for references without a document
+    expected, actual = (lib.query_target('database').querex('select create, mod order tag')
+                        for lib in libraries)
+    assert expected['create'].isna().any()
+    assert (expected['create'].dropna().dt.nanosecond != 0).any()
+    pd.testing.assert_series_equal(actual['create'], expected['create'], check_exact=True)
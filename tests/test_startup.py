@@ -0,0 +1,62 @@
+"""
+Startup time of the command line interface.
+
+Commands import what they use when they run (see cli), so ``archivum
+--help``, ``list-libraries`` and ``rg`` never import pandas, pymupdf and
+friends. Each command runs in a fresh interpreter under ``python -X
+importtime``; the imports it triggers must stay within the budget and
+include no heavy module.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# ms of imports allowed for a command, beyond those of a bare interpreter
+STARTUP_BUDGET_MS = 150
+
+# modules the light commands must not import
+HEAVY_MODULES = ('pandas', 'pyarrow', 'numpy', 'pymupdf', 'pypdf', 'greater_tables',
+                 'IPython', 'prompt_toolkit', 'lark', 'rapidfuzz', 'tqdm')
+
+# rg without an open library only reports that
+LIGHT_COMMANDS = [['--help'], ['list-libraries'], ['rg', 'pattern']]
+
+
+def import_times(code):
+    """Run python code in a fresh interpreter with -X importtime; (module, cumulative µs, depth) in import order."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, env=os.environ.copy())
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    ans = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # names are indented two spaces a level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        ans.append((name.strip(), int(cumulative), depth))
+    return ans
+
+
+@pytest.fixture(scope='module')
+def bare():
+    """Modules a bare interpreter imports."""
+    return {name for name, *_ in import_times('pass')}
+
+
+@pytest.mark.parametrize('args', LIGHT_COMMANDS, ids=lambda args: args[0])
+def test_light_command_startup(bare, args):
+    code = f'from archivum.cli import entry; entry({args!r}, standalone_mode=False)'
+    # best of three, the first run may be reading files into the cache
+    best = None
+    for _ in range(3):
+        times = import_times(code)
+        import_ms = sum(cum for name, cum, depth in times
+                        if depth == 0 and name not in bare) / 1000
+        best = import_ms if best is None else min(best, import_ms)
+    loaded = {name.split('.')[0] for name, *_ in times}
+    assert not [m for m in HEAVY_MODULES if m in loaded]
+    assert best <= STARTUP_BUDGET_MS
@@ -0,0 +1,57 @@
+"""The trigram index never drops a match: candidates are a superset of the hits."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from archivum.querex import factorize_strings, querex_work
+from archivum.trigram import TrigramIndex, required_literals
+
+PATTERNS = [('title', 'Risk Measure'), ('title', 'capital allocation'),
+            ('title', r'spectral\s+risk'), ('title', 'measure.*pricing'),
+            ('title', r'[a-z]+ing'), ('title', 'risk|loss'), ('title', 'THEORY'),
+            ('author', 'Wang, R'), ('author', '^Delbaen'), ('author', 'müller'),
+            ('author', 'MÜLLER'), ('journal', 'Annals'), ('journal', '^$'),
+            ('path', r'doc1\d\.pdf'), ('path', r'doc(?:12|34)')]
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('Risk Measure', ['risk measure']), ('a|bcd', []), ('(abc)+def', ['abc', 'def']),
+    ('abc?d', ['ab', 'd']), ('x{2,}yz', ['x', 'yz']), ('(', [])])
+def test_required_literals(pattern, expected):
+    assert sorted(required_literals(pattern)) == sorted(expected)
+
+
+@pytest.fixture(scope='module')
+def indexes(library):
+    """field -> (codes, distinct values, TrigramIndex) over the database."""
+    db = library.load_columns('database')
+    ans = {}
+    for field in {f for f, _ in PATTERNS}:
+        codes, uniques = factorize_strings(db[field].astype('str'))
+        ans[field] = codes, uniques, TrigramIndex(uniques)
+    return ans
+
+
+@pytest.mark.parametrize('field, pattern', PATTERNS)
+def test_candidates_cover_matches(indexes, field, pattern):
+    _, uniques, index = indexes[field]
+    values = pd.Series(uniques)
+    hit = values.str.contains(pattern, regex=True, case=False, na=False).to_numpy(dtype=bool)
+    cand = index.candidates(pattern)
+    if cand is None:
+        return
+    assert set(np.flatnonzero(hit)) <= set(cand)
+
+
+def test_querex_same_with_index(library, indexes):
+    db = library.load_columns('database')
+    base_cols, bang_field, recent_field = library.querex_settings['database']
+    for field, pattern in PATTERNS:
+        query = f'{field} ~ /{pattern}/'
+        expected = querex_work(db, query, base_cols, bang_field, recent_field,
+                               value_codes=lambda f: indexes[f][:2] if f in indexes else None)
+        actual = querex_work(db, query, base_cols, bang_field, recent_field,
+                             value_codes=lambda f: indexes[f][:2] if f in indexes else None,
+                             trigram_index=lambda f: indexes[f][2] if f in indexes else None)
+        pd.testing.assert_frame_equal(actual, expected)